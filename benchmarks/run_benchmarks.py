@@ -0,0 +1,242 @@
+import argparse
+import contextlib
+import json
+import os
+import platform
+import random
+import shutil
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+# --- Benchmark suite ---
+#
+# python benchmarks/run_benchmarks.py --sizes 1000 10000 100000 --output results.json
+#
+# Generates a synthetic bank per size (see synth.py), points a throwaway HOME
+# at it and times the TaskNotebook hot paths. Runs under the Qt offscreen
+# platform; without PyQt6 the widget timings are skipped and the Qt-free
+# Notebook core is measured instead. Results are written as JSON so runs can
+# be diffed.
+
+ROOT = Path(__file__).resolve().parent.parent
+WORKSPACE = Path(tempfile.mkdtemp(prefix="ers_bench_"))
+os.environ["HOME"] = os.environ["USERPROFILE"] = str(WORKSPACE)
+os.environ.setdefault("QT_QPA_PLATFORM", "offscreen")
+sys.path.insert(0, str(ROOT))
+sys.path.insert(0, str(ROOT / "benchmarks"))
+
+from model import Catalog  # noqa: E402
+from notebook import Notebook, SETTINGS_FILE  # noqa: E402
+from sqlite_store import SqliteStore  # noqa: E402
+from storage import migrate_subjects, problem_record, subject_record  # noqa: E402
+from synth import generate  # noqa: E402
+
+try:
+    from PyQt6.QtWidgets import QApplication
+    import main
+except ImportError:
+    QApplication = None
+
+
+# Typing "洛必达法则 信心<=2" one character at a time, plus a tag filter.
+SEARCH_KEYSTROKES = ["洛", "洛必", "洛必达", "洛必达法", "洛必达法则", "洛必达法则 信心<=2", "#微积分 c>=4", "P1-"]
+
+
+def measure(fn, repeat, setup=None):
+    samples = []
+    for _ in range(repeat):
+        if setup is not None:
+            setup()
+        start = time.perf_counter()
+        fn()
+        samples.append((time.perf_counter() - start) * 1000)
+    return samples
+
+
+def summarize(size, operation, samples, **extra):
+    result = {
+        "problems": size,
+        "operation": operation,
+        "runs": len(samples),
+        "min_ms": round(min(samples), 3),
+        "median_ms": round(statistics.median(samples), 3),
+        "mean_ms": round(statistics.fmean(samples), 3),
+        "max_ms": round(max(samples), 3)
+    }
+    result.update(extra)
+    print(f"{size:>8} {operation:<36} median {result['median_ms']:>10.3f} ms", file=sys.stderr)
+    return result
+
+
+def bench_size(size, args, app):
+    work = WORKSPACE / f"bank_{size}"
+    data_file, notes_dir = generate(work, args.subjects, size, args.history, args.legacy_fraction, args.seed)
+    pristine = work / "tasks.pristine.json"
+    shutil.copyfile(data_file, pristine)
+    SETTINGS_FILE.parent.mkdir(parents=True, exist_ok=True)
+    with open(SETTINGS_FILE, "w", encoding="utf-8") as f:
+        json.dump({"data_file": str(data_file), "notes_dir": str(notes_dir)}, f, ensure_ascii=False)
+
+    if app is not None:
+        nb = main.TaskNotebook()
+        # The window loads on a thread of its own (and warms the search index
+        # after that); let it finish so the timings below do not race it.
+        nb.load_thread.join()
+        app.processEvents()
+    else:
+        nb = Notebook()
+        nb.load_settings()
+        nb.load_subjects()
+
+    def restore():
+        shutil.copyfile(pristine, data_file)
+        journal = Path(str(data_file) + ".journal")
+        if journal.exists():
+            journal.unlink()
+
+    results = [
+        summarize(size, "load_subjects (with migration)",
+                  measure(nb.load_subjects, args.repeat, setup=restore), legacy_fraction=args.legacy_fraction),
+        summarize(size, "load_subjects (migrated)", measure(nb.load_subjects, args.repeat)),
+        summarize(size, "save_subjects", measure(nb.save_subjects, args.repeat),
+                  bytes_written=os.path.getsize(data_file)),
+    ]
+    due = []
+    results.append(summarize(size, "load_daily_problems: due scan",
+                             measure(lambda: due.append(nb.daily_problems()), args.repeat),
+                             due=len(nb.daily_problems())))
+    if app is not None:
+        def build_widgets():
+            nb.review_model.set_entries(list(due[-1]))
+            nb.update_overview()
+            nb.review_view.grab()
+        results.append(summarize(size, "load_daily_problems: widgets", measure(build_widgets, args.repeat)))
+    results.append(summarize(size, "calculate_ers (all subjects)",
+                             measure(lambda: [nb.calculate_ers(s) for s in nb.subjects], args.repeat)))
+
+    results.append(summarize(size, "search index build", measure(
+        nb.search_index.ensure_built, args.repeat, setup=lambda: nb.search_index.reset(nb.subjects))))
+    keystrokes = iter(SEARCH_KEYSTROKES * args.repeat)
+    results.append(summarize(size, "search (per keystroke)",
+                             measure(lambda: nb.search(next(keystrokes)), len(SEARCH_KEYSTROKES) * args.repeat)))
+
+    rng = random.Random(args.seed)
+    pairs = [(p, s) for s in nb.subjects for p in s.problems.values()]
+    sample = rng.sample(pairs, min(args.sample, len(pairs)))
+    adjust = iter(sample * args.repeat)
+
+    def adjust_one():
+        problem, subject = next(adjust)
+        nb.adjust_problem_review_interval(problem, rng.randint(1, 5), subject)
+    results.append(summarize(size, "adjust_problem_review_interval",
+                             measure(adjust_one, len(sample) * args.repeat)))
+
+    removals = iter(rng.sample(pairs, min(args.sample, len(pairs))))
+
+    def remove_one():
+        problem, subject = next(removals)
+        nb.remove_problem_from_daily_note(problem.description, subject.daily_note)
+        nb.note_index.apply_removals()
+    results.append(summarize(size, "remove_problem_from_daily_note",
+                             measure(remove_one, min(args.sample, len(pairs)))))
+
+    results.append(bench_sqlite_round_trip(size, args, work, nb.subjects))
+
+    nb.shutdown()
+    if app is not None:
+        nb.close()
+        nb.deleteLater()
+        app.processEvents()
+    if not args.keep:
+        shutil.rmtree(work, ignore_errors=True)
+    return results
+
+
+def problem_rows(subjects):
+    return [(s.name, p.description, p.confidence, p.subjects, p.skills, p.next_review, p.completed_reviews.tolist())
+            for s in subjects for p in s.problems.values()]
+
+
+def bench_sqlite_round_trip(size, args, work, subjects):
+    # A new .db that has only ever been appended to (no full save) must load
+    # back exactly what was written.
+    db_file = work / "tasks.db"
+    store = SqliteStore(db_file)
+    store.append(*(record for subject in subjects
+                   for record in [subject_record(subject)] + [problem_record(subject, p)
+                                                              for p in subject.problems.values()]))
+    store.close()
+    loaded = []
+
+    def load_db():
+        reader = SqliteStore(db_file)
+        try:
+            data = reader.load()
+            migrate_subjects(data, reader.schema_version)
+        finally:
+            reader.close()
+        loaded.append(Catalog.from_dicts(data))
+    result = summarize(size, "sqlite load (fresh, appended)", measure(load_db, args.repeat))
+    if problem_rows(loaded[-1]) != problem_rows(subjects):
+        raise RuntimeError("SQLite 往返校验失败：新建数据库读回的题目与写入的不一致")
+    return result
+
+
+def git_revision():
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], cwd=ROOT, capture_output=True,
+                              text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def main_cli():
+    parser = argparse.ArgumentParser(description="ERS 管理器性能测试")
+    parser.add_argument("--sizes", type=int, nargs="+", default=[1000, 10000, 100000])
+    parser.add_argument("--subjects", type=int, default=10)
+    parser.add_argument("--history", type=int, default=6)
+    parser.add_argument("--legacy-fraction", type=float, default=0.1)
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument("--sample", type=int, default=200, help="逐题操作的抽样数量")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--output", help="结果 JSON 文件（默认输出到标准输出）")
+    parser.add_argument("--keep", action="store_true", help="保留生成的数据")
+    args = parser.parse_args()
+
+    app = QApplication(sys.argv[:1]) if QApplication is not None else None
+    if app is None:
+        print("未安装 PyQt6，跳过界面相关测试", file=sys.stderr)
+    results = []
+    try:
+        # The app logs load/migration timings with print(); keep stdout for JSON.
+        with contextlib.redirect_stdout(sys.stderr):
+            for size in args.sizes:
+                results.extend(bench_size(size, args, app))
+    finally:
+        if not args.keep:
+            shutil.rmtree(WORKSPACE, ignore_errors=True)
+    report = {
+        "meta": {
+            "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S"),
+            "git_revision": git_revision(),
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "qt": app is not None,
+            "args": vars(args)
+        },
+        "results": results
+    }
+    text = json.dumps(report, ensure_ascii=False, indent=2)
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            f.write(text)
+    else:
+        print(text)
+
+
+if __name__ == '__main__':
+    main_cli()
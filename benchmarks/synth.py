@@ -0,0 +1,102 @@
+import argparse
+import json
+import random
+from datetime import date, timedelta
+from pathlib import Path
+
+# --- Synthetic data sets for benchmarks ---
+#
+# python benchmarks/synth.py out_dir --subjects 10 --problems 1000
+#
+# Writes out_dir/tasks.json and out_dir/notes/daily_notes/*.md in the same
+# layout the app produces. A --legacy-fraction of problems use the old
+# tags/mastery_level fields and text dates, in which case the file is written
+# as a bare list (schema v0) so loading it exercises the full migration.
+# Otherwise it is written at schema v2 with day ordinals.
+
+TOPICS = ["微积分", "线性代数", "概率论", "极限", "词汇", "语法", "阅读", "力学"]
+SKILLS = ["洛必达法则", "换元法", "分部积分", "特征值", "泰勒展开", "长难句", "定积分", "受力分析"]
+
+
+def _day(today, offset):
+    return (today + timedelta(days=offset)).strftime("%Y-%m-%d")
+
+
+def make_problem(rng, today, name, history, legacy):
+    subjects = rng.sample(TOPICS, rng.randint(1, 2))
+    skills = rng.sample(SKILLS, rng.randint(0, 2))
+    reviews = rng.randint(0, history)
+    problem = {
+        "description": name,
+        "review_dates": [_day(today, rng.randint(-30, 60))],
+        "completed_reviews": [{"date": _day(today, -rng.randint(1, 365))} for _ in range(reviews)]
+    }
+    if legacy:
+        problem["mastery_level"] = rng.randint(1, 5)
+        problem["tags"] = [f"{s}-{k}" for s, k in zip(subjects, skills)] + subjects[len(skills):]
+    else:
+        problem["confidence"] = rng.randint(1, 5)
+        problem["subjects"] = subjects
+        problem["skills"] = skills
+    return problem
+
+
+def _to_ordinals(problem):
+    problem["review_dates"] = [date.fromisoformat(d).toordinal() for d in problem["review_dates"]]
+    problem["completed_reviews"] = [date.fromisoformat(r["date"]).toordinal() for r in problem["completed_reviews"]]
+
+
+def generate(out_dir, subjects=10, problems=1000, history=6, legacy_fraction=0.0, seed=0):
+    rng = random.Random(seed)
+    today = date.today()
+    out_dir = Path(out_dir)
+    notes_dir = out_dir / "notes" / "daily_notes"
+    notes_dir.mkdir(parents=True, exist_ok=True)
+    per_subject = max(1, problems // subjects)
+    data = []
+    for s in range(subjects):
+        created = _day(today, -rng.randint(0, 365))
+        note_path = notes_dir / f"{created}.md"
+        subject = {
+            "name": f"主题{s}",
+            "created": created,
+            "daily_note": str(note_path),
+            "practice_exam_scores": [rng.randint(40, 100) for _ in range(rng.randint(0, 6))],
+            "ers_score": 0,
+            "problems": [make_problem(rng, today, f"P{s}-{i}", history, rng.random() < legacy_fraction)
+                         for i in range(per_subject)],
+            "concepts": []
+        }
+        data.append(subject)
+        with open(note_path, "a", encoding="utf-8") as f:
+            if f.tell() == 0:
+                f.write(f"# Daily Note - {created}\n")
+            for problem in subject["problems"]:
+                f.write(f"\n### 题目: {problem['description']}\n主题: {', '.join(problem.get('subjects', []))}\n"
+                        f"技巧: {', '.join(problem.get('skills', []))}\n图片解析: [待补充图片]\n"
+                        f"心得: [待补充技巧或心得]\n")
+    if legacy_fraction > 0:
+        payload = data
+    else:
+        for subject in data:
+            for problem in subject["problems"]:
+                _to_ordinals(problem)
+        payload = {"schema_version": 2, "subjects": data}
+    data_file = out_dir / "tasks.json"
+    with open(data_file, "w", encoding="utf-8") as f:
+        json.dump(payload, f, ensure_ascii=False, indent=2)
+    return data_file, out_dir / "notes"
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="生成用于性能测试的合成题库")
+    parser.add_argument("out_dir")
+    parser.add_argument("--subjects", type=int, default=10)
+    parser.add_argument("--problems", type=int, default=1000, help="题目总数")
+    parser.add_argument("--history", type=int, default=6, help="每题最多复习记录数")
+    parser.add_argument("--legacy-fraction", type=float, default=0.0, help="旧格式题目比例")
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+    data_file, notes_dir = generate(args.out_dir, args.subjects, args.problems, args.history,
+                                    args.legacy_fraction, args.seed)
+    print(f"已生成 {data_file} 和 {notes_dir}")
@@ -0,0 +1,68 @@
+import argparse
+import csv
+import json
+import sys
+import time
+from pathlib import Path
+
+from notebook import Notebook
+
+# --- Headless bulk import ---
+#
+# python bulk_import.py mistakes.csv scores.jsonl
+#
+# Each row is either a problem (description, subject, tags in the same
+# "主题,主题-技巧,技巧" format as 快速录题) or an exam score (subject, score).
+# CSV files need a header row with those column names; JSONL files hold one
+# object per line. Every input file is applied as one batch; a file that
+# fails to parse is skipped whole, so its rows are parsed into memory before
+# any is applied (see Notebook.import_entries).
+
+
+def read_entries(path):
+    path = Path(path)
+    if path.suffix.lower() in (".jsonl", ".ndjson"):
+        with open(path, "r", encoding="utf-8") as f:
+            for line in f:
+                line = line.strip()
+                if line:
+                    yield json.loads(line)
+    else:
+        with open(path, "r", encoding="utf-8-sig", newline="") as f:
+            yield from csv.DictReader(f)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="批量导入错题和模考成绩（无需启动界面）")
+    parser.add_argument("files", nargs="+", help="CSV 或 JSONL 文件")
+    parser.add_argument("--data-file", help="任务数据文件路径（默认读取设置）")
+    parser.add_argument("--notes-dir", help="笔记文件夹路径（默认读取设置）")
+    args = parser.parse_args(argv)
+
+    notebook = Notebook()
+    notebook.load_settings()
+    if args.data_file:
+        notebook.data_file = args.data_file
+    if args.notes_dir:
+        notebook.notes_dir = args.notes_dir
+    notebook.load_subjects()
+    try:
+        for path in args.files:
+            started = time.perf_counter()
+            try:
+                stats = notebook.import_entries(read_entries(path))
+            except (OSError, ValueError, csv.Error) as e:
+                print(f"{path}: 导入失败: {e}")
+                continue
+            elapsed = time.perf_counter() - started
+            rows = stats["problems"] + stats["scores"] + stats["skipped"]
+            rate = rows / elapsed if elapsed > 0 else float("inf")
+            print(f"{path}: 题目 {stats['problems']}，成绩 {stats['scores']}，跳过 {stats['skipped']}，"
+                  f"用时 {elapsed * 1000:.1f} ms（{rate:.0f} 行/秒）")
+    finally:
+        notebook.shutdown()
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
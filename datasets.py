@@ -0,0 +1,64 @@
+from collections import OrderedDict
+
+# --- Profiles and the dataset cache ---
+#
+# A profile is a named (data file, notes folder) pair. Switching profiles
+# parks the loaded data set (model, indexes, store and sync state) in a small
+# LRU cache instead of dropping it, so flipping back skips parsing and index
+# builds. The cache is bounded by entry count and by an estimated memory
+# footprint; evicted data sets close their store. Whether a cached data set
+# is still current is decided by the caller from the files' (mtime, size)
+# stamps (see Notebook.switch_profile).
+
+DEFAULT_PROFILE = "默认"
+CACHED_DATASETS = 3
+DATASET_CACHE_MB = 256
+# Measured with tracemalloc on a synthetic bank: model plus due, search and
+# ERS indexes come to about 1.1 KB per problem.
+BYTES_PER_PROBLEM = 1200
+
+DATASET_ATTRIBUTES = ("store", "subjects", "due_index", "aggregates", "search_index", "note_index", "baseline",
+                      "stamps", "ers_history", "vault")
+
+
+class Dataset:
+    __slots__ = DATASET_ATTRIBUTES + ("size",)
+
+    def __init__(self, **parts):
+        for name in DATASET_ATTRIBUTES:
+            setattr(self, name, parts[name])
+        self.size = BYTES_PER_PROBLEM * self.aggregates.total_problems
+
+    def close(self):
+        if self.store is not None:
+            self.store.close()
+
+
+class DatasetCache:
+    def __init__(self, capacity=CACHED_DATASETS, memory_cap=DATASET_CACHE_MB << 20):
+        self.capacity = capacity
+        self.memory_cap = memory_cap
+        self.entries = OrderedDict()
+
+    @property
+    def size(self):
+        return sum(dataset.size for dataset in self.entries.values())
+
+    def put(self, key, dataset):
+        replaced = self.entries.get(key)
+        if replaced is not None and replaced is not dataset:
+            replaced.close()
+        self.entries[key] = dataset
+        self.entries.move_to_end(key)
+        size = self.size
+        while self.entries and (len(self.entries) > self.capacity or size > self.memory_cap):
+            _, evicted = self.entries.popitem(last=False)
+            size -= evicted.size
+            evicted.close()
+
+    def take(self, key):
+        return self.entries.pop(key, None)
+
+    def clear(self):
+        while self.entries:
+            self.entries.popitem()[1].close()
@@ -0,0 +1,35 @@
+from array import array
+from datetime import date
+
+# --- Day ordinals ---
+#
+# Review dates are held as proleptic Gregorian day numbers (date.toordinal()),
+# so scheduling is integer addition and due checks are integer comparisons.
+# Review history is an array('I') of day numbers per problem. Text dates are
+# produced only for display, note files and exports.
+
+DATE_FORMAT = "%Y-%m-%d"
+HISTORY_TYPECODE = "I"
+
+
+def today():
+    return date.today().toordinal()
+
+
+def to_day(text):
+    return date.fromisoformat(text).toordinal()
+
+
+def to_text(day):
+    return date.fromordinal(day).isoformat()
+
+
+def history(days=()):
+    return array(HISTORY_TYPECODE, days)
+
+
+def json_default(obj):
+    # json.dump hook: review histories are written as plain lists of ints.
+    if isinstance(obj, array):
+        return obj.tolist()
+    raise TypeError(f"Object of type {type(obj).__name__} is not JSON serializable")
@@ -0,0 +1,701 @@
+import json
+from pathlib import Path
+from PyQt6.QtWidgets import (QDialog, QWidget, QVBoxLayout, QHBoxLayout, QLabel, QLineEdit, QPushButton,
+                             QListWidget, QListWidgetItem, QFileDialog, QMessageBox, QCheckBox,
+                             QTableWidget, QTableWidgetItem, QPlainTextEdit, QHeaderView, QComboBox)
+from PyQt6.QtCore import Qt, QUrl, QPointF, QRectF
+from PyQt6.QtGui import QIcon, QFont, QColor, QDesktopServices, QPainter, QPen, QPolygonF
+import days
+import metrics
+from datasets import DEFAULT_PROFILE
+from notebook import DEFAULT_CONFIG_DIR, SETTINGS_FILE
+from storage import is_sqlite_path
+
+# Dialogs are imported on first use so they stay off the startup path.
+
+
+class SettingsDialog(QDialog):
+    FORMATS = [("json", "JSON（可读，体积最大）"), ("binary", "紧凑二进制"), ("gzip", "gzip 压缩"),
+               ("zstd", "zstd 压缩（需安装 zstandard，否则使用 gzip）")]
+
+    def __init__(self, parent=None):
+        super().__init__(parent)
+        self.setWindowTitle("设置")
+        self.setWindowIcon(QIcon("icon.png"))
+        self.initUI()
+
+    def initUI(self):
+        layout = QVBoxLayout()
+        self.profile_label = QLabel("配置名称（输入新名称即另存为新配置）:")
+        self.profile_edit = QLineEdit(self.parent().profile)
+        layout.addWidget(self.profile_label)
+        layout.addWidget(self.profile_edit)
+        self.json_label = QLabel("任务JSON文件路径:")
+        self.json_edit = QLineEdit(self.parent().data_file)
+        self.json_browse = QPushButton("浏览")
+        self.json_browse.clicked.connect(self.browse_json)
+        json_layout = QHBoxLayout()
+        json_layout.addWidget(self.json_edit)
+        json_layout.addWidget(self.json_browse)
+        layout.addWidget(self.json_label)
+        layout.addLayout(json_layout)
+        self.notes_label = QLabel("笔记文件夹路径:")
+        self.notes_edit = QLineEdit(self.parent().notes_dir)
+        self.notes_browse = QPushButton("浏览")
+        self.notes_browse.clicked.connect(self.browse_notes)
+        notes_layout = QHBoxLayout()
+        notes_layout.addWidget(self.notes_edit)
+        notes_layout.addWidget(self.notes_browse)
+        layout.addWidget(self.notes_label)
+        layout.addLayout(notes_layout)
+        self.capacity_label = QLabel("每日复习上限（0 表示不限）:")
+        self.capacity_edit = QLineEdit(str(self.parent().daily_capacity))
+        self.capacity_edit.setPlaceholderText("例: 40")
+        layout.addWidget(self.capacity_label)
+        layout.addWidget(self.capacity_edit)
+        self.format_label = QLabel("数据文件格式（SQLite 数据库不适用）:")
+        self.format_combo = QComboBox()
+        for name, label in self.FORMATS:
+            self.format_combo.addItem(label, name)
+        self.format_combo.setCurrentIndex(max(0, self.format_combo.findData(self.parent().snapshot_format)))
+        self.export_button = QPushButton("导出 JSON")
+        self.export_button.clicked.connect(self.export_json)
+        format_layout = QHBoxLayout()
+        format_layout.addWidget(self.format_combo, 1)
+        format_layout.addWidget(self.export_button)
+        layout.addWidget(self.format_label)
+        layout.addLayout(format_layout)
+        button_layout = QHBoxLayout()
+        self.save_button = QPushButton("保存")
+        self.save_button.clicked.connect(self.save_settings)
+        self.cancel_button = QPushButton("取消")
+        self.cancel_button.clicked.connect(self.reject)
+        button_layout.addWidget(self.save_button)
+        button_layout.addWidget(self.cancel_button)
+        layout.addLayout(button_layout)
+        self.setLayout(layout)
+
+    def browse_json(self):
+        file_path, _ = QFileDialog.getSaveFileName(self, "选择数据文件", str(self.parent().data_file),
+                                                   "JSON Files (*.json);;SQLite Database (*.db *.sqlite *.sqlite3);;All Files (*)")
+        if file_path:
+            self.json_edit.setText(file_path)
+
+    def export_json(self):
+        file_path, _ = QFileDialog.getSaveFileName(self, "导出 JSON", str(Path(self.parent().data_file).with_suffix(
+            ".export.json")), "JSON Files (*.json)")
+        if not file_path:
+            return
+        try:
+            self.parent().export_json(file_path)
+            QMessageBox.information(self, "提示", f"已导出到 {file_path}")
+        except Exception as e:
+            QMessageBox.warning(self, "错误", f"导出失败: {e}")
+
+    def browse_notes(self):
+        dir_path = QFileDialog.getExistingDirectory(self, "选择笔记文件夹", str(self.parent().notes_dir))
+        if dir_path:
+            self.notes_edit.setText(dir_path)
+
+    def save_settings(self):
+        try:
+            capacity = int(self.capacity_edit.text().strip() or 0)
+            if capacity < 0:
+                raise ValueError
+        except ValueError:
+            QMessageBox.warning(self, "错误", "每日复习上限必须是非负整数。")
+            return
+        try:
+            # Keep keys this dialog does not edit (e.g. load_tolerance).
+            settings = {}
+            if SETTINGS_FILE.exists():
+                with open(SETTINGS_FILE, "r", encoding="utf-8") as f:
+                    settings = json.load(f)
+            settings.update(data_file=self.json_edit.text(), notes_dir=self.notes_edit.text(),
+                            daily_capacity=capacity, snapshot_format=self.format_combo.currentData())
+            if not DEFAULT_CONFIG_DIR.exists():
+                DEFAULT_CONFIG_DIR.mkdir(parents=True)
+            with open(SETTINGS_FILE, "w", encoding="utf-8") as f:
+                json.dump(settings, f, ensure_ascii=False, indent=2)
+            self.parent().daily_capacity = capacity
+            self.parent().snapshot_format = self.format_combo.currentData()
+            self.offer_sqlite_import(self.parent().data_file, self.json_edit.text())
+            profile = self.profile_edit.text().strip() or DEFAULT_PROFILE
+            if profile != self.parent().profile:
+                self.parent().profiles[profile] = {"data_file": self.json_edit.text(),
+                                                   "notes_dir": self.notes_edit.text()}
+                self.parent().switch_profile(profile)
+            else:
+                self.parent().data_file = self.json_edit.text()
+                self.parent().notes_dir = self.notes_edit.text()
+                self.parent().save_profiles()
+                # Off the GUI thread as at startup; on_data_loaded refreshes
+                # the list and the watched paths.
+                self.parent().start_background_load()
+            self.accept()
+        except Exception as e:
+            print(f"保存设置失败: {e}")
+
+    def offer_sqlite_import(self, old_file, new_file):
+        if not is_sqlite_path(new_file) or is_sqlite_path(old_file):
+            return
+        if Path(new_file).exists() or not Path(old_file).exists():
+            return
+        reply = QMessageBox.question(self, "导入数据", f"是否将当前JSON数据导入新的SQLite数据库？\n{new_file}",
+                                     QMessageBox.StandardButton.Yes | QMessageBox.StandardButton.No)
+        if reply == QMessageBox.StandardButton.Yes:
+            from sqlite_store import import_json
+            self.parent().persistence.flush()
+            import_json(old_file, new_file)
+
+
+class QuickAddDialog(QDialog):
+    def __init__(self, subjects, parent=None):
+        super().__init__(parent)
+        self.subjects = subjects
+        self.setWindowTitle("快速录题")
+        self.setWindowIcon(QIcon("icon.png"))
+        self.setModal(True)
+        self.initUI()
+
+    def initUI(self):
+        layout = QVBoxLayout()
+        self.code_label = QLabel("题目编号:")
+        self.code_edit = QLineEdit()
+        self.code_edit.setPlaceholderText("例: P301-15")
+        layout.addWidget(self.code_label)
+        layout.addWidget(self.code_edit)
+
+        self.subject_label = QLabel("学习主题:")
+        self.subject_combo = QLineEdit()
+        self.subject_combo.setPlaceholderText("输入或选择主题")
+        layout.addWidget(self.subject_label)
+        layout.addWidget(self.subject_combo)
+
+        self.tags_label = QLabel("主题与技巧（可选）:")
+        self.tags_edit = QLineEdit()
+        self.tags_edit.setPlaceholderText("例: 微积分,极限-洛必达法则,换元法")
+        layout.addWidget(self.tags_label)
+        layout.addWidget(self.tags_edit)
+
+        button_layout = QHBoxLayout()
+        self.add_button = QPushButton("添加并记录")
+        self.add_button.clicked.connect(self.accept)
+        self.cancel_button = QPushButton("取消")
+        self.cancel_button.clicked.connect(self.reject)
+        button_layout.addWidget(self.add_button)
+        button_layout.addWidget(self.cancel_button)
+        layout.addLayout(button_layout)
+        self.setLayout(layout)
+
+    def get_data(self):
+        return {
+            "description": self.code_edit.text().strip(),
+            "subject": self.subject_combo.text().strip(),
+            "tags": self.tags_edit.text().strip()
+        }
+
+
+class TrendChart(QWidget):
+    # ERS, mastery and exam scores (all 0-100) over a day range, drawn from
+    # history buckets; values carry forward between buckets.
+    MARGINS = (36, 28, 12, 24)
+    SERIES = (("ERS", "#90EE90"), ("掌握率", "#00C4B4"), ("模考", "#FF69B4"))
+
+    def __init__(self, parent=None):
+        super().__init__(parent)
+        self.first = self.last = None
+        self.buckets = []
+        self.setMinimumSize(480, 260)
+
+    def set_data(self, first, last, buckets):
+        self.first, self.last, self.buckets = first, last, buckets
+        self.update()
+
+    def paintEvent(self, event):
+        painter = QPainter(self)
+        painter.setRenderHint(QPainter.RenderHint.Antialiasing)
+        painter.fillRect(self.rect(), QColor("#2D2D2D"))
+        left, top, right, bottom = self.MARGINS
+        plot = QRectF(left, top, self.width() - left - right, self.height() - top - bottom)
+        painter.setPen(QColor("#AAAAAA"))
+        for value in (0, 25, 50, 75, 100):
+            y = plot.bottom() - plot.height() * value / 100
+            painter.setPen(QPen(QColor("#444444"), 1))
+            painter.drawLine(QPointF(plot.left(), y), QPointF(plot.right(), y))
+            painter.setPen(QColor("#AAAAAA"))
+            painter.drawText(QRectF(0, y - 8, left - 6, 16), Qt.AlignmentFlag.AlignRight, str(value))
+        x = 8
+        for name, color in self.SERIES:
+            painter.setPen(QColor(color))
+            painter.drawText(QPointF(left + x, 18), f"● {name}")
+            x += 24 + painter.fontMetrics().horizontalAdvance(name)
+        if self.first is None or not self.buckets:
+            painter.setPen(QColor("#AAAAAA"))
+            painter.drawText(plot, Qt.AlignmentFlag.AlignCenter, "暂无历史数据")
+            return
+        painter.setPen(QColor("#AAAAAA"))
+        painter.drawText(QRectF(plot.left(), plot.bottom() + 4, 100, 16), Qt.AlignmentFlag.AlignLeft,
+                         days.to_text(self.first))
+        painter.drawText(QRectF(plot.right() - 100, plot.bottom() + 4, 100, 16), Qt.AlignmentFlag.AlignRight,
+                         days.to_text(self.last))
+        span = max(self.last - self.first, 1)
+
+        def point(day, value):
+            return QPointF(plot.left() + plot.width() * (max(day, self.first) - self.first) / span,
+                           plot.bottom() - plot.height() * min(max(value, 0), 100) / 100)
+
+        band = [point(b.day, b.ers_max) for b in self.buckets] + [point(b.day, b.ers_min)
+                                                                    for b in reversed(self.buckets)]
+        painter.setPen(Qt.PenStyle.NoPen)
+        painter.setBrush(QColor(144, 238, 144, 50))
+        painter.drawPolygon(QPolygonF(band))
+        painter.setBrush(Qt.BrushStyle.NoBrush)
+        for attribute, (_, color) in zip(("ers", "mastery"), self.SERIES):
+            points = []
+            for bucket in self.buckets:
+                value = getattr(bucket, attribute)
+                if points:
+                    points.append(QPointF(point(bucket.day, 0).x(), points[-1].y()))
+                points.append(point(bucket.day, value))
+            points.append(QPointF(plot.right(), points[-1].y()))
+            painter.setPen(QPen(QColor(color), 2))
+            painter.drawPolyline(QPolygonF(points))
+        painter.setPen(Qt.PenStyle.NoPen)
+        painter.setBrush(QColor(self.SERIES[2][1]))
+        for bucket in self.buckets:
+            if bucket.day < self.first:
+                continue
+            for score in bucket.scores:
+                painter.drawEllipse(point(bucket.day, score), 3.5, 3.5)
+
+
+class SubjectOverviewDialog(QDialog):
+    RANGES = (("近 30 天", 30), ("近 90 天", 90), ("近一年", 365), ("全部", None))
+    # Longer ranges are drawn from the weekly buckets.
+    DAILY_LIMIT = 90
+
+    def __init__(self, subjects, subject_trend, parent=None):
+        super().__init__(parent)
+        self.subjects = subjects
+        self.subject_names = [subject.name for subject in subjects]
+        self.subject_trend = subject_trend
+        self.setWindowTitle("学习主题概览")
+        self.setWindowIcon(QIcon("icon.png"))
+        self.setModal(True)
+        self.resize(1000, 480)
+        self.initUI()
+
+    def initUI(self):
+        layout = QVBoxLayout()
+        content_layout = QHBoxLayout()
+        list_layout = QVBoxLayout()
+        self.subject_list = QListWidget()
+        self.populate_subject_list()
+        self.subject_list.currentRowChanged.connect(self.show_trend)
+        list_layout.addWidget(QLabel("学习主题列表："))
+        list_layout.addWidget(self.subject_list)
+        content_layout.addLayout(list_layout, 2)
+
+        trend_layout = QVBoxLayout()
+        range_layout = QHBoxLayout()
+        self.trend_label = QLabel("趋势")
+        self.range_combo = QComboBox()
+        for label, length in self.RANGES:
+            self.range_combo.addItem(label, length)
+        self.range_combo.setCurrentIndex(1)
+        self.range_combo.currentIndexChanged.connect(lambda: self.show_trend(self.subject_list.currentRow()))
+        range_layout.addWidget(self.trend_label, 1)
+        range_layout.addWidget(self.range_combo)
+        trend_layout.addLayout(range_layout)
+        self.chart = TrendChart()
+        trend_layout.addWidget(self.chart, 1)
+        content_layout.addLayout(trend_layout, 3)
+        layout.addLayout(content_layout, 1)
+
+        self.close_button = QPushButton("关闭")
+        self.close_button.clicked.connect(self.reject)
+        layout.addWidget(self.close_button)
+        self.setLayout(layout)
+        if self.subject_names:
+            self.subject_list.setCurrentRow(0)
+
+    def populate_subject_list(self):
+        self.subject_list.clear()
+        for idx, subject in enumerate(self.subjects):
+            item = QListWidgetItem(
+                f"{subject.name} (ERS: {subject.ers_score:.1f}%, 题目: {len(subject.problems)}, 概念: {len(subject.concepts)})")
+            item.setData(Qt.ItemDataRole.UserRole, idx)
+            self.subject_list.addItem(item)
+
+    def show_trend(self, row):
+        if not 0 <= row < len(self.subject_names):
+            self.chart.set_data(None, None, [])
+            return
+        name = self.subject_names[row]
+        length = self.range_combo.currentData()
+        weekly = length is None or length > self.DAILY_LIMIT
+        first, last, buckets = self.subject_trend(name, length, weekly)
+        self.trend_label.setText(f"{name} · {'按周' if weekly else '按日'}")
+        self.chart.set_data(first, last, buckets)
+
+
+class ExamScoreDialog(QDialog):
+    def __init__(self, subjects, parent=None):
+        super().__init__(parent)
+        self.subjects = subjects
+        self.setWindowTitle("录入模考成绩")
+        self.setWindowIcon(QIcon("icon.png"))
+        self.setModal(True)
+        self.initUI()
+
+    def initUI(self):
+        layout = QVBoxLayout()
+        self.subject_label = QLabel("学习主题:")
+        self.subject_combo = QLineEdit()
+        self.subject_combo.setPlaceholderText("输入或选择主题")
+        layout.addWidget(self.subject_label)
+        layout.addWidget(self.subject_combo)
+
+        self.score_label = QLabel("分数（0-100）:")
+        self.score_edit = QLineEdit()
+        self.score_edit.setPlaceholderText("例: 85")
+        layout.addWidget(self.score_label)
+        layout.addWidget(self.score_edit)
+
+        button_layout = QHBoxLayout()
+        self.add_button = QPushButton("添加")
+        self.add_button.clicked.connect(self.accept)
+        self.cancel_button = QPushButton("取消")
+        self.cancel_button.clicked.connect(self.reject)
+        button_layout.addWidget(self.add_button)
+        button_layout.addWidget(self.cancel_button)
+        layout.addLayout(button_layout)
+        self.setLayout(layout)
+
+    def get_data(self):
+        return {
+            "subject": self.subject_combo.text().strip(),
+            "score": self.score_edit.text().strip()
+        }
+
+
+class ReviewSessionDialog(QDialog):
+    KEY_RATINGS = {Qt.Key.Key_1: 1, Qt.Key.Key_2: 2, Qt.Key.Key_3: 3, Qt.Key.Key_4: 4, Qt.Key.Key_5: 5}
+
+    def __init__(self, session, parent=None):
+        super().__init__(parent)
+        self.session = session
+        self.setWindowTitle("复习模式")
+        self.setWindowIcon(QIcon("icon.png"))
+        self.setModal(True)
+        self.resize(700, 360)
+        self.initUI()
+        self.show_current()
+
+    def initUI(self):
+        layout = QVBoxLayout()
+        self.progress_label = QLabel()
+        self.progress_label.setStyleSheet("color: #AAAAAA; font-size: 11pt;")
+        layout.addWidget(self.progress_label)
+        self.description_label = QLabel()
+        self.description_label.setStyleSheet("color: #FFFFFF; font-size: 22pt; font-weight: bold;")
+        self.description_label.setWordWrap(True)
+        layout.addWidget(self.description_label)
+        self.detail_label = QLabel()
+        self.detail_label.setStyleSheet("color: #CCCCCC; font-size: 12pt;")
+        self.detail_label.setWordWrap(True)
+        layout.addWidget(self.detail_label, 1)
+        hint = QLabel("按 1-5 评分，D 删除，Backspace 撤销，Enter 保存并退出")
+        hint.setStyleSheet("color: #888888; font-size: 10pt;")
+        layout.addWidget(hint)
+
+        button_layout = QHBoxLayout()
+        self.rating_buttons = []
+        for level in range(1, 6):
+            button = QPushButton(str(level))
+            button.setFocusPolicy(Qt.FocusPolicy.NoFocus)
+            button.clicked.connect(lambda checked=False, level=level: self.rate(level))
+            button_layout.addWidget(button)
+            self.rating_buttons.append(button)
+        self.delete_button = QPushButton("删除")
+        self.delete_button.clicked.connect(self.delete)
+        self.undo_button = QPushButton("撤销")
+        self.undo_button.clicked.connect(self.undo)
+        self.finish_button = QPushButton("保存并退出")
+        self.finish_button.clicked.connect(self.accept)
+        for button in (self.delete_button, self.undo_button, self.finish_button):
+            button.setFocusPolicy(Qt.FocusPolicy.NoFocus)
+            button_layout.addWidget(button)
+        layout.addLayout(button_layout)
+        self.setLayout(layout)
+
+    def keyPressEvent(self, event):
+        key = event.key()
+        if key in self.KEY_RATINGS:
+            self.rate(self.KEY_RATINGS[key])
+        elif key in (Qt.Key.Key_D, Qt.Key.Key_Delete):
+            self.delete()
+        elif key in (Qt.Key.Key_Backspace, Qt.Key.Key_Z):
+            self.undo()
+        elif key in (Qt.Key.Key_Return, Qt.Key.Key_Enter, Qt.Key.Key_Escape):
+            self.accept()
+        else:
+            super().keyPressEvent(event)
+
+    def rate(self, level):
+        self.session.rate(level)
+        self.show_current()
+
+    def delete(self):
+        self.session.delete()
+        self.show_current()
+
+    def undo(self):
+        self.session.undo()
+        self.show_current()
+
+    def show_current(self):
+        session = self.session
+        rated, deleted = session.counts()
+        self.progress_label.setText(f"第 {min(session.position + 1, len(session))} / {len(session)} 题 · "
+                                    f"待保存: 评分 {rated}，删除 {deleted} · 已保存 {session.committed}")
+        entry = session.current()
+        for button in self.rating_buttons + [self.delete_button]:
+            button.setEnabled(entry is not None)
+        self.undo_button.setEnabled(bool(session.pending))
+        if entry is None:
+            self.description_label.setText("本轮复习完成 🎉")
+            self.detail_label.setText("按 Enter 保存并退出，或按 Backspace 撤销上一题。")
+            return
+        problem, subject = entry
+        review_date = days.to_text(problem.next_review) if problem.next_review is not None else "-"
+        self.description_label.setText(problem.description)
+        self.detail_label.setText(f"学习主题: {subject.name}\n主题: {', '.join(problem.subjects)}\n"
+                                  f"技巧: {', '.join(problem.skills)}\n当前信心: {problem.confidence}/5 · "
+                                  f"计划复习: {review_date} · 已复习 {len(problem.completed_reviews)} 次")
+
+    def done(self, result):
+        # Closing in any way keeps what was rated.
+        self.session.commit()
+        super().done(result)
+
+
+class UnfinishedNotesDialog(QDialog):
+    COLUMNS = ["题目", "学习主题", "笔记", "待补充"]
+
+    def __init__(self, parent=None):
+        super().__init__(parent)
+        self.setWindowTitle("待补充笔记")
+        self.setWindowIcon(QIcon("icon.png"))
+        self.setModal(True)
+        self.resize(800, 500)
+        self.initUI()
+        self.refresh()
+
+    def initUI(self):
+        layout = QVBoxLayout()
+        self.summary_label = QLabel()
+        layout.addWidget(self.summary_label)
+        self.table = QTableWidget(0, len(self.COLUMNS))
+        self.table.setHorizontalHeaderLabels(self.COLUMNS)
+        self.table.horizontalHeader().setSectionResizeMode(QHeaderView.ResizeMode.ResizeToContents)
+        self.table.horizontalHeader().setStretchLastSection(True)
+        self.table.verticalHeader().hide()
+        self.table.setEditTriggers(QTableWidget.EditTrigger.NoEditTriggers)
+        self.table.cellDoubleClicked.connect(self.open_note)
+        layout.addWidget(self.table, 1)
+
+        button_layout = QHBoxLayout()
+        self.rescan_button = QPushButton("重新扫描")
+        self.rescan_button.clicked.connect(self.rescan)
+        self.close_button = QPushButton("关闭")
+        self.close_button.clicked.connect(self.reject)
+        button_layout.addWidget(self.rescan_button)
+        button_layout.addWidget(self.close_button)
+        layout.addLayout(button_layout)
+        self.setLayout(layout)
+
+    def refresh(self):
+        entries = self.parent().unfinished_notes()
+        self.notes = []
+        self.table.setRowCount(len(entries))
+        for row, (problem, subject, section) in enumerate(entries):
+            missing = [name for name, pending in (("图片解析", section.image_pending), ("心得", section.insight_pending))
+                       if pending]
+            values = [problem.description, subject.name, section.note, "、".join(missing)]
+            for column, value in enumerate(values):
+                self.table.setItem(row, column, QTableWidgetItem(value))
+            self.notes.append(section.note)
+        scanning = "（正在扫描…）" if self.parent().vault_scanning else ""
+        self.summary_label.setText(f"{len(entries)} 道题目的笔记尚未补充{scanning}，双击打开笔记")
+
+    def rescan(self):
+        self.parent().start_vault_scan()
+        self.refresh()
+
+    def open_note(self, row, column):
+        path = self.parent().vault_root() / self.notes[row]
+        if not QDesktopServices.openUrl(QUrl.fromLocalFile(str(path))):
+            QMessageBox.warning(self, "错误", f"无法打开笔记: {path}")
+
+
+def daily_counts(cumulative):
+    return [count - previous for count, previous in zip(cumulative, [0] + cumulative[:-1])]
+
+
+class ForecastDialog(QDialog):
+    WINDOWS = (30, 90)
+    SUMMARY_DAYS = (7, 30, 90)
+    # Days with more than this multiple of the window's average are marked.
+    PEAK_FACTOR = 1.5
+
+    def __init__(self, forecast, rebalance_backlog, parent=None):
+        super().__init__(parent)
+        self.forecast = forecast
+        self.rebalance_backlog = rebalance_backlog
+        self.setWindowTitle("复习预测")
+        self.setWindowIcon(QIcon("icon.png"))
+        self.setModal(True)
+        self.resize(900, 600)
+        self.initUI()
+        self.refresh()
+
+    def initUI(self):
+        layout = QVBoxLayout()
+        top_layout = QHBoxLayout()
+        self.window_combo = QComboBox()
+        for length in self.WINDOWS:
+            self.window_combo.addItem(f"未来 {length} 天", length)
+        self.window_combo.currentIndexChanged.connect(self.refresh)
+        self.summary_label = QLabel()
+        top_layout.addWidget(self.window_combo)
+        top_layout.addWidget(self.summary_label, 1)
+        layout.addLayout(top_layout)
+
+        self.table = QTableWidget()
+        self.table.horizontalHeader().setSectionResizeMode(QHeaderView.ResizeMode.ResizeToContents)
+        self.table.verticalHeader().hide()
+        layout.addWidget(self.table, 1)
+
+        button_layout = QHBoxLayout()
+        self.rebalance_button = QPushButton("分散积压")
+        self.rebalance_button.setToolTip("今日到期题目超过每日上限时，把多出的题目按信心从低到高顺延到之后有空余的日子")
+        self.rebalance_button.clicked.connect(self.rebalance)
+        self.close_button = QPushButton("关闭")
+        self.close_button.clicked.connect(self.reject)
+        button_layout.addWidget(self.rebalance_button)
+        button_layout.addWidget(self.close_button)
+        layout.addLayout(button_layout)
+        self.setLayout(layout)
+
+    def rebalance(self):
+        moved = self.rebalance_backlog()
+        if moved:
+            QMessageBox.information(self, "提示", f"已将 {moved} 道积压题目顺延到之后的日子。")
+        else:
+            QMessageBox.information(self, "提示", "今日到期题目未超过每日上限，无需分散。")
+        self.refresh()
+
+    def refresh(self):
+        length = self.window_combo.currentData()
+        total, rows = self.forecast(length)
+        per_day = daily_counts(total)
+        subjects = [daily_counts(counts) for _, counts in rows]
+        peak = self.PEAK_FACTOR * total[-1] / length
+        today = days.today()
+        headers = ["日期", "合计", "累计"] + [name for name, _ in rows]
+        self.table.clear()
+        self.table.setColumnCount(len(headers))
+        self.table.setRowCount(length)
+        self.table.setHorizontalHeaderLabels(headers)
+        for offset in range(length):
+            label = days.to_text(today + offset) + ("（含逾期）" if offset == 0 else "")
+            values = [label, per_day[offset], total[offset]] + [counts[offset] for counts in subjects]
+            for column, value in enumerate(values):
+                item = QTableWidgetItem(str(value))
+                if per_day[offset] > peak > 0:
+                    item.setBackground(QColor("#5A2E2E"))
+                self.table.setItem(offset, column, item)
+        self.summary_label.setText("，".join(f"{n} 天内共 {total[n - 1]} 道" for n in self.SUMMARY_DAYS
+                                            if n <= length))
+
+
+class DiagnosticsDialog(QDialog):
+    COLUMNS = ["操作", "次数", "平均 ms", "p50", "p90", "p99", "最大", "分布", "计数"]
+
+    def __init__(self, parent=None):
+        super().__init__(parent)
+        self.setWindowTitle("性能诊断")
+        self.setWindowIcon(QIcon("icon.png"))
+        self.setModal(True)
+        self.resize(900, 500)
+        self.initUI()
+        self.refresh()
+
+    def initUI(self):
+        layout = QVBoxLayout()
+        self.enabled_check = QCheckBox("启用计时（记录最近 %d 次）" % metrics.HISTORY)
+        self.enabled_check.setChecked(metrics.enabled())
+        self.enabled_check.toggled.connect(metrics.set_enabled)
+        layout.addWidget(self.enabled_check)
+
+        self.table = QTableWidget(0, len(self.COLUMNS))
+        self.table.setHorizontalHeaderLabels(self.COLUMNS)
+        self.table.horizontalHeader().setSectionResizeMode(QHeaderView.ResizeMode.ResizeToContents)
+        self.table.horizontalHeader().setStretchLastSection(True)
+        self.table.verticalHeader().hide()
+        layout.addWidget(self.table, 1)
+
+        layout.addWidget(QLabel("单次操作分析（cProfile）："))
+        self.profile_view = QPlainTextEdit()
+        self.profile_view.setReadOnly(True)
+        self.profile_view.setFont(QFont("Consolas", 9))
+        self.profile_view.setPlaceholderText("点击“分析下一次操作”，关闭本窗口后执行一次评分、录题或录入成绩，再回来查看。")
+        layout.addWidget(self.profile_view, 1)
+
+        button_layout = QHBoxLayout()
+        self.refresh_button = QPushButton("刷新")
+        self.refresh_button.clicked.connect(self.refresh)
+        self.reset_button = QPushButton("清空")
+        self.reset_button.clicked.connect(self.reset)
+        self.dump_button = QPushButton("导出 JSON")
+        self.dump_button.clicked.connect(self.dump)
+        self.profile_button = QPushButton("分析下一次操作")
+        self.profile_button.clicked.connect(self.arm_profile)
+        self.close_button = QPushButton("关闭")
+        self.close_button.clicked.connect(self.reject)
+        for button in (self.refresh_button, self.reset_button, self.dump_button, self.profile_button,
+                       self.close_button):
+            button_layout.addWidget(button)
+        layout.addLayout(button_layout)
+        self.setLayout(layout)
+
+    def refresh(self):
+        summary = metrics.snapshot()
+        self.table.setRowCount(len(summary))
+        for row, (name, stats) in enumerate(summary.items()):
+            histogram = " ".join(f"{bucket}:{count}" for bucket, count in stats["histogram"].items() if count)
+            counters = ", ".join(f"{key}={value}" for key, value in stats["counters"].items())
+            values = [name, stats["calls"], stats["mean_ms"], stats["p50_ms"], stats["p90_ms"], stats["p99_ms"],
+                      stats["max_ms"], histogram, counters]
+            for column, value in enumerate(values):
+                self.table.setItem(row, column, QTableWidgetItem(str(value)))
+        self.profile_view.setPlainText(metrics.profile_report())
+
+    def reset(self):
+        metrics.reset()
+        self.refresh()
+
+    def dump(self):
+        file_path, _ = QFileDialog.getSaveFileName(self, "导出诊断数据", str(DEFAULT_CONFIG_DIR / "metrics.json"),
+                                                   "JSON Files (*.json)")
+        if file_path:
+            try:
+                metrics.dump(file_path)
+            except OSError as e:
+                QMessageBox.warning(self, "错误", f"导出失败: {e}")
+
+    def arm_profile(self):
+        metrics.profile_next_action()
+        self.profile_view.setPlainText("已就绪：下一次操作将被分析。")
@@ -0,0 +1,210 @@
+import json
+import os
+import threading
+from bisect import bisect_left, bisect_right, insort
+from pathlib import Path
+
+import metrics
+
+# --- ERS history ---
+#
+# ERS and mastery are overwritten in place and exam scores carry no dates, so
+# their history is kept in "<data_file>.history" instead. The file holds
+# per-subject daily buckets (closing ERS and mastery, the day's ERS range and
+# the exam scores entered that day), one JSON line each. Updates touch the
+# bucket in memory and are appended after each persistence batch; a bucket
+# written twice is simply read back last-wins, and load() rewrites the file
+# once superseded lines dominate. Weekly buckets are rolled up from at most
+# seven daily ones whenever a day changes, so a chart over a year reads about
+# 52 buckets instead of replaying a year of states.
+
+HISTORY_SUFFIX = ".history"
+WEEK = 7
+# Rewrite the file when it holds this many lines per live bucket.
+COMPACT_RATIO = 2
+
+
+def week_start(day):
+    # Day ordinal 1 (0001-01-01) is a Monday.
+    return day - (day - 1) % WEEK
+
+
+class Bucket:
+    __slots__ = ("day", "ers", "ers_min", "ers_max", "mastery", "scores")
+
+    def __init__(self, day, ers, mastery, ers_min=None, ers_max=None, scores=()):
+        self.day = day
+        self.ers = ers
+        self.mastery = mastery
+        self.ers_min = ers if ers_min is None else ers_min
+        self.ers_max = ers if ers_max is None else ers_max
+        self.scores = list(scores)
+
+    def update(self, ers, mastery):
+        self.ers = ers
+        self.mastery = mastery
+        self.ers_min = min(self.ers_min, ers)
+        self.ers_max = max(self.ers_max, ers)
+
+    def to_record(self, name):
+        return {"subject": name, "day": self.day, "ers": self.ers, "mastery": self.mastery,
+                "ers_min": self.ers_min, "ers_max": self.ers_max, "scores": self.scores}
+
+    @classmethod
+    def from_record(cls, record):
+        return cls(record["day"], record["ers"], record["mastery"], record.get("ers_min"), record.get("ers_max"),
+                   record.get("scores", ()))
+
+
+def roll_up(day, buckets):
+    # One bucket for the week starting at `day` from its daily buckets (in
+    # day order): closing values of the last day, range and scores of all.
+    last = buckets[-1]
+    week = Bucket(day, last.ers, last.mastery, min(b.ers_min for b in buckets), max(b.ers_max for b in buckets))
+    for bucket in buckets:
+        week.scores.extend(bucket.scores)
+    return week
+
+
+class SubjectHistory:
+    __slots__ = ("days", "daily", "weeks", "weekly")
+
+    def __init__(self):
+        self.days = []
+        self.daily = {}
+        self.weeks = []
+        self.weekly = {}
+
+    def put(self, bucket):
+        if bucket.day not in self.daily:
+            insort(self.days, bucket.day)
+        self.daily[bucket.day] = bucket
+        self.refresh_week(week_start(bucket.day))
+
+    def rebuild(self):
+        self.days = sorted(self.daily)
+        self.weeks, self.weekly = [], {}
+        lo = 0
+        while lo < len(self.days):
+            start = week_start(self.days[lo])
+            hi = bisect_left(self.days, start + WEEK, lo)
+            self.weeks.append(start)
+            self.weekly[start] = roll_up(start, [self.daily[d] for d in self.days[lo:hi]])
+            lo = hi
+
+    def refresh_week(self, start):
+        lo = bisect_left(self.days, start)
+        hi = bisect_left(self.days, start + WEEK, lo)
+        if start not in self.weekly:
+            insort(self.weeks, start)
+        self.weekly[start] = roll_up(start, [self.daily[d] for d in self.days[lo:hi]])
+
+    def last(self):
+        return self.daily[self.days[-1]] if self.days else None
+
+    def series(self, first, last, weekly=False):
+        # Buckets from `first` to `last`, led by the one before `first` (if
+        # any) so a chart knows the values the range starts with.
+        keys, buckets = (self.weeks, self.weekly) if weekly else (self.days, self.daily)
+        if weekly:
+            first = week_start(first)
+        lo = bisect_left(keys, first)
+        if lo > 0 and (lo == len(keys) or keys[lo] > first):
+            lo -= 1
+        return [buckets[d] for d in keys[lo:bisect_right(keys, last)]]
+
+
+class ErsHistory:
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.path = None
+        self.subjects = {}
+        self.pending = {}
+
+    def load(self, data_file):
+        path = Path(str(data_file) + HISTORY_SUFFIX)
+        subjects, lines = {}, 0
+        with metrics.span("history_load") as span:
+            if path.exists():
+                with open(path, "rb") as f:
+                    for line in f:
+                        try:
+                            record = json.loads(line)
+                            bucket = Bucket.from_record(record)
+                        except (ValueError, KeyError):
+                            # A torn last line from a crash mid-append.
+                            continue
+                        subjects.setdefault(record["subject"], SubjectHistory()).daily[bucket.day] = bucket
+                        lines += 1
+            for history in subjects.values():
+                history.rebuild()
+            buckets = sum(len(h.daily) for h in subjects.values())
+            span.count("buckets", buckets)
+        with self.lock:
+            self.path, self.subjects, self.pending = path, subjects, {}
+        if lines > COMPACT_RATIO * buckets:
+            self.compact()
+
+    def record(self, name, day, ers, mastery):
+        # Returns True when the subject's closing values changed.
+        with self.lock:
+            history = self.subjects.setdefault(name, SubjectHistory())
+            last = history.last()
+            if last is not None and (last.ers, last.mastery) == (ers, mastery):
+                return False
+            bucket = history.daily.get(day)
+            if bucket is None:
+                bucket = Bucket(day, ers, mastery)
+            else:
+                bucket.update(ers, mastery)
+            history.put(bucket)
+            self.pending[name, day] = bucket
+            return True
+
+    def add_score(self, name, day, score, ers, mastery):
+        with self.lock:
+            history = self.subjects.setdefault(name, SubjectHistory())
+            bucket = history.daily.get(day)
+            if bucket is None:
+                bucket = Bucket(day, ers, mastery)
+            bucket.scores.append(score)
+            history.put(bucket)
+            self.pending[name, day] = bucket
+
+    def flush(self):
+        # Runs after each persistence batch (and on shutdown).
+        with self.lock:
+            if not self.pending or self.path is None:
+                return
+            data = "".join(json.dumps(bucket.to_record(name), ensure_ascii=False) + "\n"
+                           for (name, _), bucket in self.pending.items())
+            self.pending = {}
+            path = self.path
+        try:
+            with open(path, "ab") as f:
+                f.write(data.encode("utf-8"))
+        except OSError as e:
+            print(f"写入 ERS 历史失败: {e}")
+
+    def compact(self):
+        with self.lock:
+            data = "".join(json.dumps(bucket.to_record(name), ensure_ascii=False) + "\n"
+                           for name, history in self.subjects.items() for bucket in history.daily.values())
+            path = self.path
+        tmp_file = path.with_name(path.name + ".tmp")
+        try:
+            with open(tmp_file, "wb") as f:
+                f.write(data.encode("utf-8"))
+            os.replace(tmp_file, path)
+        except OSError as e:
+            print(f"压缩 ERS 历史失败: {e}")
+
+    def series(self, name, first, last, weekly=False):
+        with self.lock:
+            history = self.subjects.get(name)
+            return history.series(first, last, weekly) if history is not None else []
+
+    def first_day(self, name):
+        with self.lock:
+            history = self.subjects.get(name)
+            return history.days[0] if history is not None and history.days else None
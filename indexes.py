@@ -0,0 +1,341 @@
+import os
+from array import array
+from bisect import bisect_right, insort
+from collections import deque
+from itertools import accumulate
+
+import days
+
+# --- In-memory indexes over the subject list ---
+
+ERS_WINDOW = 3
+FORECAST_HORIZON = 400
+FORECAST_TYPECODE = "I"
+VERIFY_AGGREGATES = os.environ.get("ERS_VERIFY_AGGREGATES") == "1"
+
+
+def compute_ers(subject):
+    problems = subject.problems.values()
+    total_problems = len(problems)
+    if total_problems == 0:
+        return 0
+    confident_problems = sum(1 for p in problems if p.confidence >= 4)
+    percentage_confident = confident_problems / total_problems
+    scores = subject.practice_exam_scores[-ERS_WINDOW:]
+    avg_score = sum(scores) / len(scores) / 100.0 if scores else 0.0
+    return round(avg_score * percentage_confident * 100, 2)
+
+
+class LoadTree:
+    # Min segment tree over per-day loads for capacity-aware scheduling. A
+    # leaf holds load << bits | slot, so one integer min() finds the lightest
+    # day and, among equals, the earliest; reviewing early is the safer miss.
+
+    def __init__(self, loads):
+        self.bits = len(loads).bit_length()
+        self.size = 1 << max(len(loads) - 1, 1).bit_length()
+        empty = 1 << 62
+        tree = [empty] * (2 * self.size)
+        tree[self.size:self.size + len(loads)] = [load << self.bits | slot for slot, load in enumerate(loads)]
+        for i in range(self.size - 1, 0, -1):
+            tree[i] = min(tree[2 * i], tree[2 * i + 1])
+        self.tree = tree
+
+    def update(self, slot, load):
+        tree = self.tree
+        i = slot + self.size
+        tree[i] = load << self.bits | slot
+        i >>= 1
+        while i:
+            tree[i] = min(tree[2 * i], tree[2 * i + 1])
+            i >>= 1
+
+    def argmin(self, lo, hi):
+        # Lightest slot in lo..hi inclusive.
+        tree = self.tree
+        best = 1 << 62
+        lo += self.size
+        hi += self.size + 1
+        while lo < hi:
+            if lo & 1:
+                best = min(best, tree[lo])
+                lo += 1
+            if hi & 1:
+                hi -= 1
+                best = min(best, tree[hi])
+            lo >>= 1
+            hi >>= 1
+        return best & ((1 << self.bits) - 1)
+
+
+class DueForecast:
+    # Due counts per day for every subject and in total (key None). Each is an
+    # array of slots over [origin, origin + horizon); slot 0 collects earlier
+    # days and the last slot later ones. Updates touch one slot per key;
+    # prefix sums are recomputed only for changed keys, when read.
+
+    def __init__(self, horizon=FORECAST_HORIZON):
+        self.horizon = horizon
+        self.origin = 0
+        self.counts = {}
+        self.prefix = {}
+        self.tree = None
+
+    def reset(self, origin):
+        self.origin = origin
+        self.counts.clear()
+        self.prefix.clear()
+        self.tree = None
+
+    def covers(self, today, length):
+        return self.origin <= today and today + length <= self.origin + self.horizon
+
+    def _slot(self, day):
+        return min(max(day - self.origin + 1, 0), self.horizon + 1)
+
+    def add(self, day, subject_name, delta=1):
+        slot = self._slot(day)
+        for key in (None, subject_name):
+            counts = self.counts.get(key)
+            if counts is None:
+                counts = self.counts[key] = array(FORECAST_TYPECODE, [0]) * (self.horizon + 2)
+            counts[slot] += delta
+            self.prefix.pop(key, None)
+        if self.tree is not None:
+            self.tree.update(slot, self.counts[None][slot])
+
+    def load_at(self, day):
+        # Total due on `day` exactly; 0 outside the horizon.
+        counts = self.counts.get(None)
+        if counts is None or not self.origin <= day < self.origin + self.horizon:
+            return 0
+        return counts[day - self.origin + 1]
+
+    def least_loaded(self, lo, hi, ideal, capacity):
+        # `ideal` while it has room, else the lightest day in lo..hi. The
+        # tree is built on first use, so it costs nothing with no capacity set.
+        if lo <= ideal <= hi and self.load_at(ideal) < capacity:
+            return ideal
+        if self.tree is None:
+            self.tree = LoadTree(self.counts.get(None) or array(FORECAST_TYPECODE, [0]) * (self.horizon + 2))
+        return self.origin + self.tree.argmin(self._slot(lo), self._slot(hi)) - 1
+
+    def cumulative(self, subject_name, today, length):
+        # Problems due on or before each of today .. today + length - 1.
+        prefix = self.prefix.get(subject_name)
+        if prefix is None:
+            counts = self.counts.get(subject_name)
+            if counts is None:
+                return [0] * length
+            prefix = self.prefix[subject_name] = array(FORECAST_TYPECODE, accumulate(counts))
+        start = self._slot(today)
+        return prefix[start:start + length].tolist()
+
+
+class DueIndex:
+    # Problems bucketed by next review day (a day ordinal, see days.py), with
+    # per-day counts kept alongside for the forecast view.
+
+    def __init__(self):
+        self._buckets = {}
+        self._days = []
+        self._where = {}
+        self.forecast = DueForecast()
+
+    def __len__(self):
+        return len(self._where)
+
+    def build(self, subjects):
+        self._buckets.clear()
+        self._days.clear()
+        self._where.clear()
+        self.forecast.reset(days.today())
+        for subject in subjects:
+            for problem in subject.problems.values():
+                self.add(problem, subject)
+
+    def add(self, problem, subject):
+        self._file(problem, subject, problem.next_review)
+
+    def _file(self, problem, subject, day):
+        if id(problem) in self._where:
+            self.remove(problem)
+        if day is None:
+            return
+        bucket = self._buckets.get(day)
+        if bucket is None:
+            bucket = self._buckets[day] = {}
+            insort(self._days, day)
+        bucket[id(problem)] = (problem, subject)
+        self._where[id(problem)] = day
+        self.forecast.add(day, subject.name)
+
+    def remove(self, problem):
+        day = self._where.pop(id(problem), None)
+        if day is None:
+            return
+        bucket = self._buckets[day]
+        _, subject = bucket.pop(id(problem))
+        self.forecast.add(day, subject.name, -1)
+        if not bucket:
+            del self._buckets[day]
+            del self._days[bisect_right(self._days, day) - 1]
+
+    def update(self, problem, subject):
+        self.add(problem, subject)
+
+    def place(self, problem, subject, ideal, tolerance, capacity, earliest):
+        # Capacity-aware scheduling: files `problem` on `ideal` if that day has
+        # room, else on the least-loaded day within `tolerance` of it (never
+        # before `earliest`). Returns the day; the caller stores it on the
+        # problem.
+        lo, hi = max(earliest, ideal - tolerance), ideal + tolerance
+        day = ideal
+        if lo <= hi:
+            self.remove(problem)
+            self._cover(lo, hi - lo + 1)
+            day = self.forecast.least_loaded(lo, hi, ideal, capacity)
+        self._file(problem, subject, day)
+        return day
+
+    def load_at(self, day):
+        self._cover(day, 1)
+        return self.forecast.load_at(day)
+
+    def _cover(self, first, length):
+        today = days.today()
+        if not self.forecast.covers(first, length) and self.forecast.origin != today:
+            self._rebase(today)
+
+    def due(self, today):
+        due = []
+        for day in self._days[:bisect_right(self._days, today)]:
+            due.extend(self._buckets[day].values())
+        return due
+
+    def due_counts(self, today, length, subject_name=None):
+        # Cumulative due counts for the next `length` days, overdue included.
+        if not self.forecast.covers(today, length):
+            self._rebase(today)
+        return self.forecast.cumulative(subject_name, today, length)
+
+    def _rebase(self, today):
+        # The app has been open long enough for the window to drift off the
+        # arrays; re-centre them on today.
+        self.forecast.reset(today)
+        for day, bucket in self._buckets.items():
+            for _, subject in bucket.values():
+                self.forecast.add(day, subject.name)
+
+
+class SubjectStats:
+    def __init__(self):
+        self.total = 0
+        self.confident = 0
+        self.recent_scores = deque(maxlen=ERS_WINDOW)
+        self.recent_sum = 0
+
+    def add_score(self, score):
+        if len(self.recent_scores) == ERS_WINDOW:
+            self.recent_sum -= self.recent_scores[0]
+        self.recent_scores.append(score)
+        self.recent_sum += score
+
+    def mastery(self):
+        return round(self.confident / self.total * 100, 2) if self.total else 0
+
+    def ers(self):
+        if self.total == 0:
+            return 0
+        percentage_confident = self.confident / self.total
+        avg_score = self.recent_sum / len(self.recent_scores) / 100.0 if self.recent_scores else 0.0
+        return round(avg_score * percentage_confident * 100, 2)
+
+
+class ErsAggregates:
+    # Running per-subject counters behind calculate_ers plus the global numbers
+    # shown on the overview cards. Every update is O(1); verify() cross-checks
+    # against a full recompute.
+
+    def __init__(self):
+        self.stats = {}
+        self.total_problems = 0
+        self.ers_sum = 0.0
+
+    def build(self, subjects):
+        self.stats.clear()
+        self.total_problems = 0
+        self.ers_sum = 0.0
+        for subject in subjects:
+            self.add_subject(subject)
+
+    def add_subject(self, subject):
+        stats = self.stats[subject.name] = SubjectStats()
+        for score in subject.practice_exam_scores[-ERS_WINDOW:]:
+            stats.add_score(score)
+        for problem in subject.problems.values():
+            self.add_problem(subject, problem)
+        # The stored score may predate changes made elsewhere; the counters
+        # are the source of truth from here on.
+        subject.ers_score = stats.ers()
+        self.ers_sum += subject.ers_score
+
+    def remove_subject(self, subject):
+        stats = self.stats.pop(subject.name, None)
+        if stats is not None:
+            self.total_problems -= stats.total
+            self.ers_sum -= subject.ers_score
+
+    def add_problem(self, subject, problem):
+        stats = self.stats[subject.name]
+        stats.total += 1
+        if problem.confidence >= 4:
+            stats.confident += 1
+        self.total_problems += 1
+
+    def remove_problem(self, subject, problem):
+        stats = self.stats[subject.name]
+        stats.total -= 1
+        if problem.confidence >= 4:
+            stats.confident -= 1
+        self.total_problems -= 1
+
+    def change_confidence(self, subject, old_confidence, new_confidence):
+        self.stats[subject.name].confident += (new_confidence >= 4) - (old_confidence >= 4)
+
+    def add_score(self, subject, score):
+        self.stats[subject.name].add_score(score)
+
+    def subject_ers(self, subject):
+        return self.stats[subject.name].ers()
+
+    def set_ers(self, subject, ers_score):
+        self.ers_sum += ers_score - subject.ers_score
+        subject.ers_score = ers_score
+
+    def average_ers(self):
+        return self.ers_sum / len(self.stats) if self.stats else 0
+
+    def verify(self, subjects):
+        mismatches = []
+        for subject in subjects:
+            stats = self.stats.get(subject.name)
+            if stats is None:
+                mismatches.append(f"{subject.name}: 缺少统计")
+                continue
+            problems = subject.problems.values()
+            confident = sum(1 for p in problems if p.confidence >= 4)
+            if (stats.total, stats.confident) != (len(problems), confident):
+                mismatches.append(f"{subject.name}: 题目 {stats.total}/{len(problems)}, "
+                                  f"高信心 {stats.confident}/{confident}")
+            if stats.ers() != compute_ers(subject):
+                mismatches.append(f"{subject.name}: ERS {stats.ers()}/{compute_ers(subject)}")
+            if subject.ers_score != stats.ers():
+                mismatches.append(f"{subject.name}: 已存 ERS {subject.ers_score}/{stats.ers()}")
+        total_problems = sum(len(s.problems) for s in subjects)
+        if self.total_problems != total_problems:
+            mismatches.append(f"题库总数 {self.total_problems}/{total_problems}")
+        ers_sum = sum(s.ers_score for s in subjects)
+        if abs(self.ers_sum - ers_sum) > 1e-6 or len(self.stats) != len(subjects):
+            mismatches.append(f"ERS合计 {self.ers_sum:.2f}/{ers_sum:.2f}")
+        return mismatches
@@ -1,24 +1,23 @@
+import time
+
+STARTED = time.perf_counter()
+
 import sys
-import json
-import os
 import subprocess
+import threading
 from pathlib import Path
-from datetime import datetime, timedelta
-from PyQt6.QtWidgets import (QApplication, QWidget, QVBoxLayout, QHBoxLayout,
-                             QLabel, QLineEdit, QPushButton, QDialog, QListWidget,
-                             QListWidgetItem, QFileDialog, QInputDialog, QGridLayout,
-                             QMessageBox)
-from PyQt6.QtCore import Qt
-from PyQt6.QtGui import QIcon
-import random
+from PyQt6.QtWidgets import (QApplication, QWidget, QVBoxLayout, QHBoxLayout, QLabel, QPushButton, QLineEdit,
+                             QComboBox, QGridLayout, QMessageBox, QListView, QStyledItemDelegate, QAbstractItemView)
+from PyQt6.QtCore import (Qt, QAbstractListModel, QModelIndex, QRect, QRectF, QSize, QEvent,
+                          QTimer, QFileSystemWatcher, pyqtSignal)
+from PyQt6.QtGui import QIcon, QPainter, QColor, QFont
+import days
+import metrics
+from indexes import VERIFY_AGGREGATES
+from notebook import Notebook
 
 # --- Global Constants and Styles ---
 
-DEFAULT_CONFIG_DIR = Path.home() / ".task_notebook"
-DEFAULT_DATA_FILE = DEFAULT_CONFIG_DIR / "tasks.json"
-DEFAULT_NOTES_DIR = r"C:\Users\HuoZihang\Desktop\笔记"
-SETTINGS_FILE = DEFAULT_CONFIG_DIR / "settings.json"
-
 CARD_STYLE = """
     QWidget {
         background-color: #2D2D2D;
@@ -60,6 +59,10 @@ APP_STYLE = """
     }
 """
 
+CONFIDENCE_ROLE = Qt.ItemDataRole.UserRole + 1
+# Sync clients write in several steps; wait for the burst to settle.
+WATCH_DEBOUNCE_MS = 500
+
 ENCOURAGE_MESSAGES = [
     "今天的复习任务已完成！继续保持，明天见 💪",
     "没有题目要复习，棒棒哒，明天再接再厉！",
@@ -67,250 +70,153 @@ ENCOURAGE_MESSAGES = [
 ]
 
 
-class SettingsDialog(QDialog):
+class ReviewListModel(QAbstractListModel):
     def __init__(self, parent=None):
         super().__init__(parent)
-        self.setWindowTitle("设置")
-        self.setWindowIcon(QIcon("icon.png"))
-        self.initUI()
-
-    def initUI(self):
-        layout = QVBoxLayout()
-        self.json_label = QLabel("任务JSON文件路径:")
-        self.json_edit = QLineEdit(self.parent().data_file)
-        self.json_browse = QPushButton("浏览")
-        self.json_browse.clicked.connect(self.browse_json)
-        json_layout = QHBoxLayout()
-        json_layout.addWidget(self.json_edit)
-        json_layout.addWidget(self.json_browse)
-        layout.addWidget(self.json_label)
-        layout.addLayout(json_layout)
-        self.notes_label = QLabel("笔记文件夹路径:")
-        self.notes_edit = QLineEdit(self.parent().notes_dir)
-        self.notes_browse = QPushButton("浏览")
-        self.notes_browse.clicked.connect(self.browse_notes)
-        notes_layout = QHBoxLayout()
-        notes_layout.addWidget(self.notes_edit)
-        notes_layout.addWidget(self.notes_browse)
-        layout.addWidget(self.notes_label)
-        layout.addLayout(notes_layout)
-        button_layout = QHBoxLayout()
-        self.save_button = QPushButton("保存")
-        self.save_button.clicked.connect(self.save_settings)
-        self.cancel_button = QPushButton("取消")
-        self.cancel_button.clicked.connect(self.reject)
-        button_layout.addWidget(self.save_button)
-        button_layout.addWidget(self.cancel_button)
-        layout.addLayout(button_layout)
-        self.setLayout(layout)
-
-    def browse_json(self):
-        file_path, _ = QFileDialog.getSaveFileName(self, "选择JSON文件", str(self.parent().data_file),
-                                                   "JSON Files (*.json)")
-        if file_path:
-            self.json_edit.setText(file_path)
-
-    def browse_notes(self):
-        dir_path = QFileDialog.getExistingDirectory(self, "选择笔记文件夹", str(self.parent().notes_dir))
-        if dir_path:
-            self.notes_edit.setText(dir_path)
-
-    def save_settings(self):
-        settings = {"data_file": self.json_edit.text(), "notes_dir": self.notes_edit.text()}
-        try:
-            if not DEFAULT_CONFIG_DIR.exists():
-                DEFAULT_CONFIG_DIR.mkdir(parents=True)
-            with open(SETTINGS_FILE, "w", encoding="utf-8") as f:
-                json.dump(settings, f, ensure_ascii=False, indent=2)
-            self.parent().data_file = self.json_edit.text()
-            self.parent().notes_dir = self.notes_edit.text()
-            self.parent().load_subjects()
-            self.parent().load_daily_problems()
-            self.accept()
-        except Exception as e:
-            print(f"保存设置失败: {e}")
-
-
-class QuickAddDialog(QDialog):
-    def __init__(self, subjects, parent=None):
-        super().__init__(parent)
-        self.subjects = subjects
-        self.setWindowTitle("快速录题")
-        self.setWindowIcon(QIcon("icon.png"))
-        self.setModal(True)
-        self.initUI()
-
-    def initUI(self):
-        layout = QVBoxLayout()
-        self.code_label = QLabel("题目编号:")
-        self.code_edit = QLineEdit()
-        self.code_edit.setPlaceholderText("例: P301-15")
-        layout.addWidget(self.code_label)
-        layout.addWidget(self.code_edit)
-
-        self.subject_label = QLabel("学习主题:")
-        self.subject_combo = QLineEdit()
-        self.subject_combo.setPlaceholderText("输入或选择主题")
-        layout.addWidget(self.subject_label)
-        layout.addWidget(self.subject_combo)
-
-        self.tags_label = QLabel("主题与技巧（可选）:")
-        self.tags_edit = QLineEdit()
-        self.tags_edit.setPlaceholderText("例: 微积分,极限-洛必达法则,换元法")
-        layout.addWidget(self.tags_label)
-        layout.addWidget(self.tags_edit)
-
-        button_layout = QHBoxLayout()
-        self.add_button = QPushButton("添加并记录")
-        self.add_button.clicked.connect(self.accept)
-        self.cancel_button = QPushButton("取消")
-        self.cancel_button.clicked.connect(self.reject)
-        button_layout.addWidget(self.add_button)
-        button_layout.addWidget(self.cancel_button)
-        layout.addLayout(button_layout)
-        self.setLayout(layout)
-
-    def get_data(self):
-        return {
-            "description": self.code_edit.text().strip(),
-            "subject": self.subject_combo.text().strip(),
-            "tags": self.tags_edit.text().strip()
-        }
-
-
-class SubjectOverviewDialog(QDialog):
-    def __init__(self, subjects, parent=None):
-        super().__init__(parent)
-        self.subjects = subjects
-        self.setWindowTitle("学习主题概览")
-        self.setWindowIcon(QIcon("icon.png"))
-        self.setModal(True)
-        self.initUI()
+        self.entries = []
+
+    def rowCount(self, parent=QModelIndex()):
+        return 0 if parent.isValid() else len(self.entries)
+
+    def data(self, index, role=Qt.ItemDataRole.DisplayRole):
+        if not index.isValid():
+            return None
+        problem, subject = self.entries[index.row()]
+        if role == Qt.ItemDataRole.DisplayRole:
+            subjects = ", ".join(problem.subjects)
+            skills = ", ".join(problem.skills)
+            review_date = days.to_text(problem.next_review) if problem.next_review is not None else ""
+            return f"{problem.description} (信心: {problem.confidence}/5, 主题: {subjects}, 技巧: {skills}) ➜ {review_date}"
+        if role == CONFIDENCE_ROLE:
+            return problem.confidence
+        if role == Qt.ItemDataRole.UserRole:
+            return problem, subject
+        return None
+
+    def set_entries(self, entries):
+        self.beginResetModel()
+        self.entries = entries
+        self.endResetModel()
+
+    def row_of(self, problem):
+        return next((row for row, (p, _) in enumerate(self.entries) if p is problem), -1)
+
+    def remove_row(self, row):
+        self.beginRemoveRows(QModelIndex(), row, row)
+        del self.entries[row]
+        self.endRemoveRows()
+
+    def refresh_row(self, row):
+        index = self.index(row)
+        self.dataChanged.emit(index, index)
+
+
+class ConfidenceDelegate(QStyledItemDelegate):
+    # (subject name, description, level): the row may be gone or hold another
+    # problem by the time a queued click is handled.
+    rating_clicked = pyqtSignal(str, str, int)
+
+    ROW_HEIGHT = 52
+    DOT_SIZE = 30
+    DOT_SPACING = 6
 
-    def initUI(self):
-        layout = QVBoxLayout()
-        self.subject_list = QListWidget()
-        self.populate_subject_list()
-        layout.addWidget(QLabel("学习主题列表："))
-        layout.addWidget(self.subject_list)
-        self.close_button = QPushButton("关闭")
-        self.close_button.clicked.connect(self.reject)
-        layout.addWidget(self.close_button)
-        self.setLayout(layout)
-
-    def populate_subject_list(self):
-        self.subject_list.clear()
-        for idx, subject in enumerate(self.subjects):
-            item = QListWidgetItem(
-                f"{subject['name']} (ERS: {subject['ers_score']:.1f}%, 题目: {len(subject['problems'])}, 概念: {len(subject['concepts'])})")
-            item.setData(Qt.ItemDataRole.UserRole, idx)
-            self.subject_list.addItem(item)
-
-
-class ExamScoreDialog(QDialog):
-    def __init__(self, subjects, parent=None):
-        super().__init__(parent)
-        self.subjects = subjects
-        self.setWindowTitle("录入模考成绩")
-        self.setWindowIcon(QIcon("icon.png"))
-        self.setModal(True)
-        self.initUI()
-
-    def initUI(self):
-        layout = QVBoxLayout()
-        self.subject_label = QLabel("学习主题:")
-        self.subject_combo = QLineEdit()
-        self.subject_combo.setPlaceholderText("输入或选择主题")
-        layout.addWidget(self.subject_label)
-        layout.addWidget(self.subject_combo)
-
-        self.score_label = QLabel("分数（0-100）:")
-        self.score_edit = QLineEdit()
-        self.score_edit.setPlaceholderText("例: 85")
-        layout.addWidget(self.score_label)
-        layout.addWidget(self.score_edit)
-
-        button_layout = QHBoxLayout()
-        self.add_button = QPushButton("添加")
-        self.add_button.clicked.connect(self.accept)
-        self.cancel_button = QPushButton("取消")
-        self.cancel_button.clicked.connect(self.reject)
-        button_layout.addWidget(self.add_button)
-        button_layout.addWidget(self.cancel_button)
-        layout.addLayout(button_layout)
-        self.setLayout(layout)
-
-    def get_data(self):
-        return {
-            "subject": self.subject_combo.text().strip(),
-            "score": self.score_edit.text().strip()
-        }
-
-
-class ProblemCard(QWidget):
-    def __init__(self, problem, subject, parent=None):
+    def __init__(self, parent=None):
         super().__init__(parent)
-        self.problem = problem
-        self.subject = subject
-        self.parent_widget = parent
-        self.initUI()
-
-    def initUI(self):
-        layout = QHBoxLayout(self)
-        confidence = self.problem.get("confidence", 0)
-        subjects = ", ".join(self.problem.get("subjects", []))
-        skills = ", ".join(self.problem.get("skills", []))
-        review_date = self.problem.get("review_dates", [""])[0]
-        color = "#FF6347" if confidence <= 2 else "#FFD700" if confidence == 3 else "#90EE90"
-        label = QLabel(
-            f"{self.problem['description']} (信心: {confidence}/5, 主题: {subjects}, 技巧: {skills}) ➜ {review_date}")
-        label.setStyleSheet(f"color: {color}; font-size: 12pt;")
-        layout.addWidget(label)
-        layout.addStretch()
-        for level in range(1, 6):
-            btn = QPushButton(str(level))
-            btn.setFixedSize(30, 30)
-            btn.setStyleSheet(f"""
-                QPushButton {{
-                    background-color: {'#007BFF' if level <= confidence else '#444444'};
-                    color: white;
-                    border-radius: 15px;
-                    font-size: 10pt;
-                }}
-                QPushButton:hover {{
-                    background-color: #0056b3;
-                }}
-            """)
-            btn.clicked.connect(lambda _, l=level: self.update_confidence(l))
-            layout.addWidget(btn)
-        self.setStyleSheet(CARD_STYLE)
-
-    def update_confidence(self, new_confidence):
-        self.problem["confidence"] = new_confidence
-        self.parent_widget.adjust_problem_review_interval(self.problem, new_confidence, self.subject)
-        self.parent_widget.save_subjects()
-        self.parent_widget.load_daily_problems()
-        if new_confidence >= 4:
-            reply = QMessageBox.question(self, "建议删除",
-                                         f"题目 '{self.problem['description']}' 信心已达 {new_confidence}，建议删除以避免题海战术，是否删除？",
-                                         QMessageBox.StandardButton.Yes | QMessageBox.StandardButton.No)
-            if reply == QMessageBox.StandardButton.Yes:
-                self.subject["problems"].remove(self.problem)
-                self.parent_widget.remove_problem_from_daily_note(self.problem["description"],
-                                                                  self.subject["daily_note"])
-                self.parent_widget.save_subjects()
-                self.parent_widget.load_daily_problems()
-
-
-class TaskNotebook(QWidget):
-    def __init__(self):
+        self.hover = (-1, 0)
+
+    def sizeHint(self, option, index):
+        return QSize(option.rect.width(), self.ROW_HEIGHT)
+
+    def dot_rects(self, rect):
+        card = rect.adjusted(5, 5, -5, -5)
+        x = card.right() - 8 - 5 * self.DOT_SIZE - 4 * self.DOT_SPACING
+        y = card.center().y() - self.DOT_SIZE // 2
+        return [QRect(x + i * (self.DOT_SIZE + self.DOT_SPACING), y, self.DOT_SIZE, self.DOT_SIZE)
+                for i in range(5)]
+
+    def level_at(self, rect, pos):
+        for level, dot in enumerate(self.dot_rects(rect), 1):
+            if dot.contains(pos):
+                return level
+        return 0
+
+    def paint(self, painter, option, index):
+        painter.save()
+        painter.setRenderHint(QPainter.RenderHint.Antialiasing)
+        card = option.rect.adjusted(5, 5, -5, -5)
+        painter.setPen(Qt.PenStyle.NoPen)
+        painter.setBrush(QColor("#2D2D2D"))
+        painter.drawRoundedRect(QRectF(card), 8, 8)
+
+        confidence = index.data(CONFIDENCE_ROLE)
+        dots = self.dot_rects(option.rect)
+        text_rect = QRect(card.left() + 8, card.top(), dots[0].left() - card.left() - 16, card.height())
+        font = QFont(option.font)
+        font.setPointSize(12)
+        painter.setFont(font)
+        painter.setPen(QColor("#FF6347" if confidence <= 2 else "#FFD700" if confidence == 3 else "#90EE90"))
+        text = painter.fontMetrics().elidedText(index.data(), Qt.TextElideMode.ElideRight, text_rect.width())
+        painter.drawText(text_rect, Qt.AlignmentFlag.AlignVCenter | Qt.AlignmentFlag.AlignLeft, text)
+
+        font.setPointSize(10)
+        painter.setFont(font)
+        for level, dot in enumerate(dots, 1):
+            if self.hover == (index.row(), level):
+                color = "#0056b3"
+            else:
+                color = "#007BFF" if level <= confidence else "#444444"
+            painter.setPen(Qt.PenStyle.NoPen)
+            painter.setBrush(QColor(color))
+            painter.drawEllipse(dot)
+            painter.setPen(QColor("#FFFFFF"))
+            painter.drawText(dot, Qt.AlignmentFlag.AlignCenter, str(level))
+        painter.restore()
+
+    def editorEvent(self, event, model, option, index):
+        if event.type() == QEvent.Type.MouseMove:
+            hover = (index.row(), self.level_at(option.rect, event.position().toPoint()))
+            if hover != self.hover:
+                self.hover = hover
+                self.parent().viewport().update()
+        elif (event.type() == QEvent.Type.MouseButtonRelease
+              and event.button() == Qt.MouseButton.LeftButton):
+            level = self.level_at(option.rect, event.position().toPoint())
+            if level:
+                problem, subject = index.data(Qt.ItemDataRole.UserRole)
+                self.rating_clicked.emit(subject.name, problem.description, level)
+                return True
+        return super().editorEvent(event, model, option, index)
+
+
+class TaskNotebook(Notebook, QWidget):
+    data_loaded = pyqtSignal(object)
+    external_changes = pyqtSignal(object)
+    vault_scanned = pyqtSignal(object)
+
+    def __init__(self, startup_profile=False):
         super().__init__()
-        self.subjects = []
-        self.data_file = str(DEFAULT_DATA_FILE)
-        self.notes_dir = str(DEFAULT_NOTES_DIR)
+        self.startup_profile = startup_profile
+        self.first_paint = None
+        self.sync_running = False
+        self.sync_again = False
+        self.vault_scanning = False
+        self.load_thread = None
+        self.loading = False
+        self.notes_dialog = None
+        QApplication.instance().aboutToQuit.connect(self.shutdown)
+        self.data_loaded.connect(self.on_data_loaded)
+        self.external_changes.connect(self.on_external_changes)
+        self.vault_scanned.connect(self.on_vault_scanned)
+        self.watcher = QFileSystemWatcher(self)
+        self.watcher.fileChanged.connect(self.on_path_changed)
+        self.watcher.directoryChanged.connect(self.on_path_changed)
+        self.sync_timer = QTimer(self)
+        self.sync_timer.setSingleShot(True)
+        self.sync_timer.setInterval(WATCH_DEBOUNCE_MS)
+        self.sync_timer.timeout.connect(self.check_external_changes)
         self.load_settings()
-        self.load_subjects()
         self.initUI()
+        self.start_background_load()
 
     def initUI(self):
         self.main_v_layout = QVBoxLayout(self)
@@ -322,21 +228,44 @@ class TaskNotebook(QWidget):
         subtitle = QLabel("今日复习 · 智能提醒")
         subtitle.setStyleSheet("color: #AAAAAA; font-size: 12pt;")
         header_layout.addWidget(title)
-        header_layout.addWidget(subtitle)
+        subtitle_layout = QHBoxLayout()
+        subtitle_layout.addWidget(subtitle)
+        subtitle_layout.addStretch(1)
+        self.profile_combo = QComboBox()
+        self.profile_combo.setToolTip("切换考试配置（数据文件与笔记文件夹），可在设置中新建")
+        self.populate_profiles()
+        self.profile_combo.currentIndexChanged.connect(self.on_profile_selected)
+        subtitle_layout.addWidget(self.profile_combo)
+        header_layout.addLayout(subtitle_layout)
 
         button_layout = QHBoxLayout()
         self.quick_add_btn = QPushButton("快速录题")
         self.quick_add_btn.clicked.connect(self.show_quick_add)
+        self.review_session_btn = QPushButton("复习模式")
+        self.review_session_btn.clicked.connect(self.start_review_session)
         self.view_subjects_btn = QPushButton("查看所有主题")
         self.view_subjects_btn.clicked.connect(self.view_all_subjects)
         self.exam_score_btn = QPushButton("模考成绩")
         self.exam_score_btn.clicked.connect(self.show_exam_score)
+        self.forecast_btn = QPushButton("复习预测")
+        self.forecast_btn.clicked.connect(self.show_forecast)
+        self.diagnostics_btn = QPushButton("性能诊断")
+        self.diagnostics_btn.clicked.connect(self.show_diagnostics)
+        self.settings_btn = QPushButton("设置")
+        self.settings_btn.clicked.connect(self.show_settings)
         self.open_obsidian_btn = QPushButton("打开Obsidian笔记")
         self.open_obsidian_btn.clicked.connect(self.open_obsidian_notes)
+        self.unfinished_notes_btn = QPushButton("待补充笔记")
+        self.unfinished_notes_btn.clicked.connect(self.show_unfinished_notes)
         button_layout.addWidget(self.quick_add_btn)
+        button_layout.addWidget(self.review_session_btn)
         button_layout.addWidget(self.view_subjects_btn)
         button_layout.addWidget(self.exam_score_btn)
+        button_layout.addWidget(self.forecast_btn)
+        button_layout.addWidget(self.diagnostics_btn)
+        button_layout.addWidget(self.settings_btn)
         button_layout.addWidget(self.open_obsidian_btn)
+        button_layout.addWidget(self.unfinished_notes_btn)
         header_layout.addLayout(button_layout)
         self.main_v_layout.addLayout(header_layout)
 
@@ -387,187 +316,324 @@ class TaskNotebook(QWidget):
         self.main_v_layout.addLayout(overview_layout)
 
         # Today's Revision
+        list_header = QHBoxLayout()
         self.daily_label = QLabel("今日复习计划")
         self.daily_label.setStyleSheet("color: #FFFFFF; font-size: 16pt; font-weight: bold;")
-        self.main_v_layout.addWidget(self.daily_label)
-        self.problem_list_container = QWidget()
-        self.problem_list_layout = QVBoxLayout(self.problem_list_container)
-        self.problem_list_layout.setAlignment(Qt.AlignmentFlag.AlignTop)
-        self.main_v_layout.addWidget(self.problem_list_container)
-        self.main_v_layout.addStretch()
+        self.search_edit = QLineEdit()
+        self.search_edit.setPlaceholderText("搜索题目、主题或技巧，如: 洛必达法则 信心<=2")
+        self.search_edit.setClearButtonEnabled(True)
+        self.search_edit.setMinimumWidth(320)
+        self.search_edit.textChanged.connect(self.on_search_changed)
+        list_header.addWidget(self.daily_label)
+        list_header.addStretch(1)
+        list_header.addWidget(self.search_edit)
+        self.main_v_layout.addLayout(list_header)
+        self.review_model = ReviewListModel(self)
+        self.review_view = QListView()
+        self.review_view.setModel(self.review_model)
+        self.review_delegate = ConfidenceDelegate(self.review_view)
+        self.review_delegate.rating_clicked.connect(self.rate_problem, Qt.ConnectionType.QueuedConnection)
+        self.review_view.setItemDelegate(self.review_delegate)
+        self.review_view.setUniformItemSizes(True)
+        self.review_view.setMouseTracking(True)
+        self.review_view.setSelectionMode(QAbstractItemView.SelectionMode.NoSelection)
+        self.review_view.setVerticalScrollMode(QAbstractItemView.ScrollMode.ScrollPerPixel)
+        self.review_view.setStyleSheet("QListView { border: none; }")
+        self.main_v_layout.addWidget(self.review_view, 1)
+        self.encourage_label = QLabel()
+        self.encourage_label.setStyleSheet(
+            "color: #90EE90; font-size: 16pt; font-weight: bold; text-align: center; padding: 50px;")
+        self.encourage_label.setAlignment(Qt.AlignmentFlag.AlignTop)
+        self.encourage_label.hide()
+        self.main_v_layout.addWidget(self.encourage_label, 1)
 
         self.setWindowTitle("火腿肠ERS管理器")
         self.setWindowIcon(QIcon("icon.png"))
         self.setStyleSheet(APP_STYLE)
         self.resize(900, 600)
         self.show()
-        self.load_daily_problems()
 
-    def load_subjects(self):
+    def paintEvent(self, event):
+        super().paintEvent(event)
+        if self.first_paint is None:
+            self.first_paint = time.perf_counter()
+
+    def set_loading(self, loading):
+        for widget in (self.quick_add_btn, self.review_session_btn, self.view_subjects_btn, self.exam_score_btn,
+                       self.forecast_btn, self.settings_btn, self.unfinished_notes_btn, self.profile_combo,
+                       self.search_edit):
+            widget.setEnabled(not loading)
+        if loading:
+            for label in (self.tasks_count, self.ers_count, self.total_count):
+                label.setText("…")
+            self.review_view.hide()
+            self.encourage_label.setText("正在加载题库…")
+            self.encourage_label.show()
+        else:
+            self.encourage_label.hide()
+
+    def start_background_load(self):
+        # Paint the shell first; parse, migrate and build the due list off the
+        # GUI thread, then hand the result back through data_loaded.
+        # Nothing else may touch the data set until data_loaded; syncs that
+        # come up meanwhile are deferred to then.
+        self.loading = True
+        self.sync_timer.stop()
+        self.set_loading(True)
+        self.load_thread = threading.Thread(target=self._load_in_background, name="load", daemon=True)
+        self.load_thread.start()
+
+    def _load_in_background(self):
+        self.load_subjects()
+        self.data_loaded.emit(self.daily_problems())
+        # Warm the search index while the user looks at the due list.
+        self.search_index.ensure_built()
+
+    def on_data_loaded(self, daily_problems):
+        self.loading = False
+        self.set_loading(False)
+        self.show_daily_problems(daily_problems)
+        self.watch_paths()
+        self.start_vault_scan()
+        if self.sync_again and not self.sync_running:
+            self.sync_again = False
+            self.sync_timer.start()
+        if self.startup_profile:
+            QTimer.singleShot(0, self.report_startup)
+
+    def report_startup(self):
+        ready = time.perf_counter()
+        first_paint = self.first_paint if self.first_paint is not None else ready
+        print(f"启动分析: 首次绘制 {(first_paint - STARTED) * 1000:.1f} ms，"
+              f"可交互 {(ready - STARTED) * 1000:.1f} ms")
+
+    @metrics.action("load_daily_problems")
+    def load_daily_problems(self):
+        if self.searching():
+            self.on_search_changed(self.search_edit.text())
+        else:
+            self.show_daily_problems(self.daily_problems())
+
+    def searching(self):
+        return bool(self.search_edit.text().strip())
+
+    def on_search_changed(self, text):
+        if not text.strip():
+            self.daily_label.setText("今日复习计划")
+            self.load_daily_problems()
+            return
+        total, results = self.search(text)
+        self.review_model.set_entries(results)
+        shown = f"，显示前 {len(results)} 道" if total > len(results) else ""
+        self.daily_label.setText(f"搜索结果（{total} 道{shown}）")
+        self.update_overview()
+
+    def watch_paths(self):
+        # The data file and its journal are watched through their folder too:
+        # atomic replaces drop the file watch, and the journal comes and goes.
+        data_file = Path(self.data_file)
+        notes_dir = Path(self.notes_dir) / "daily_notes"
+        paths = [str(data_file.parent), str(notes_dir)]
+        paths += [str(path) for path in (self.store.files if self.store is not None else ())]
+        paths += [s.daily_note for s in self.subjects if s.daily_note]
+        paths = [path for path in dict.fromkeys(paths) if Path(path).exists()]
+        stale = set(self.watcher.files() + self.watcher.directories()).difference(paths)
+        if stale:
+            self.watcher.removePaths(list(stale))
+        missing = set(paths).difference(self.watcher.files() + self.watcher.directories())
+        if missing:
+            self.watcher.addPaths(list(missing))
+
+    def on_path_changed(self, path):
+        notes_dir = Path(self.notes_dir) / "daily_notes"
+        if Path(path).parent == notes_dir:
+            self.note_index.invalidate(path)
+            self.vault.invalidate(notes_dir, path)
+        elif Path(path) != notes_dir:
+            self.sync_timer.start()
+        self.watch_paths()
+
+    def check_external_changes(self):
+        if self.sync_running or self.loading:
+            self.sync_again = True
+            return
+        self.sync_running = True
+        threading.Thread(target=self._read_external_in_background, name="sync", daemon=True).start()
+
+    def _read_external_in_background(self):
         try:
-            if not Path(self.data_file).exists():
-                with open(self.data_file, 'w', encoding="utf-8") as f:
-                    json.dump([], f)
-            with open(self.data_file, "r", encoding="utf-8") as f:
-                self.subjects = json.load(f)
-            modified = False
-            for subject in self.subjects:
-                if 'practice_exam_scores' not in subject:
-                    subject['practice_exam_scores'] = []
-                    modified = True
-                if 'ers_score' not in subject:
-                    subject['ers_score'] = 0
-                    modified = True
-                if 'daily_note' not in subject:
-                    subject['daily_note'] = ""
-                    modified = True
-                if 'problems' not in subject:
-                    subject['problems'] = []
-                    modified = True
-                if 'concepts' not in subject:
-                    subject['concepts'] = []
-                    modified = True
-                for problem in subject.get("problems", []):
-                    if 'review_dates' not in problem:
-                        problem['review_dates'] = [(datetime.now() + timedelta(days=1)).strftime("%Y-%m-%d")]
-                        modified = True
-                    if 'completed_reviews' not in problem:
-                        problem['completed_reviews'] = []
-                        modified = True
-                    if 'confidence' not in problem:
-                        problem['confidence'] = problem.get('mastery_level', 1)
-                        if 'mastery_level' in problem:
-                            del problem['mastery_level']
-                        modified = True
-                    if 'subjects' not in problem or 'skills' not in problem:
-                        if 'tags' in problem:
-                            subjects, skills = [], []
-                            for tag in problem['tags']:
-                                if '-' in tag:
-                                    sub, sk = tag.split('-', 1)
-                                    subjects.append(sub.strip())
-                                    skills.append(sk.strip())
-                                else:
-                                    subjects.append(tag.strip())
-                            problem['subjects'] = subjects
-                            problem['skills'] = skills
-                            del problem['tags']
-                            modified = True
-                        else:
-                            problem['subjects'] = []
-                            problem['skills'] = []
-                            modified = True
-                for concept in subject.get("concepts", []):
-                    if 'subjects' not in concept or 'skills' not in concept:
-                        if 'tags' in concept:
-                            subjects, skills = [], []
-                            for tag in concept['tags']:
-                                if '-' in tag:
-                                    sub, sk = tag.split('-', 1)
-                                    subjects.append(sub.strip())
-                                    skills.append(sk.strip())
-                                else:
-                                    subjects.append(tag.strip())
-                            concept['subjects'] = subjects
-                            concept['skills'] = skills
-                            del concept['tags']
-                            modified = True
-                        else:
-                            concept['subjects'] = []
-                            concept['skills'] = []
-                            modified = True
-            if modified:
-                print("数据模型已更新，正在保存...")
-                self.save_subjects()
+            changes = self.read_external_changes()
         except Exception as e:
-            print(f"加载或迁移主题数据时出错: {e}")
-            self.subjects = []
+            # Usually a file caught mid-sync; the final write fires again.
+            print(f"读取外部修改失败: {e}")
+            changes = None
+        self.external_changes.emit(changes)
+
+    def on_external_changes(self, changes):
+        self.sync_running = False
+        if self.loading:
+            # Read before a reload started; on_data_loaded checks again.
+            self.sync_again = True
+            return
+        # A settings change may have switched data files while this was read.
+        if changes is not None and self.store is not None and set(changes.found) <= set(map(str, self.store.files)):
+            stats = self.merge_external(changes)
+            if stats["applied"] or stats["merged"]:
+                print(f"已同步外部修改: 更新 {stats['applied']} 道题目，合并 {stats['merged']} 道两边都修改过的题目")
+                self.load_daily_problems()
+            else:
+                self.update_overview()
+        if self.sync_again:
+            self.sync_again = False
+            self.sync_timer.start()
+
+    def start_vault_scan(self):
+        if self.vault_scanning:
+            return
+        self.vault_scanning = True
+        threading.Thread(target=self._scan_vault_in_background, name="vault", daemon=True).start()
 
-    def save_subjects(self):
+    def _scan_vault_in_background(self):
+        vault = self.vault
         try:
-            with open(self.data_file, "w", encoding="utf-8") as f:
-                json.dump(self.subjects, f, ensure_ascii=False, indent=2)
+            stats = self.scan_vault()
         except Exception as e:
-            print(f"保存主题数据失败: {e}")
+            print(f"扫描笔记失败: {e}")
+            stats = None
+        self.vault_scanned.emit((vault, stats))
+
+    def on_vault_scanned(self, result):
+        vault, stats = result
+        self.vault_scanning = False
+        if vault is not self.vault:
+            # The profile was switched during the scan.
+            self.start_vault_scan()
+            return
+        if stats is not None and stats["parsed"]:
+            print(f"已索引笔记: {stats['notes']} 篇（重新解析 {stats['parsed']} 篇），"
+                  f"{stats['incomplete']} 个题目待补充")
+        if self.notes_dialog is not None:
+            self.notes_dialog.refresh()
+
+    def populate_profiles(self):
+        self.profile_combo.blockSignals(True)
+        self.profile_combo.clear()
+        self.profile_combo.addItems(list(self.profiles))
+        self.profile_combo.setCurrentText(self.profile)
+        self.profile_combo.blockSignals(False)
+
+    def on_profile_selected(self, index):
+        name = self.profile_combo.itemText(index)
+        if name and name != self.profile:
+            self.switch_profile(name)
+
+    @metrics.action("switch_profile")
+    def switch_profile(self, name):
+        # A cached data set only needs the review list rebuilt; otherwise load
+        # in the background as at startup.
+        # A pending sync belongs to the old data set.
+        self.sync_timer.stop()
+        hit = self.activate_profile(name)
+        self.save_profiles()
+        self.populate_profiles()
+        if hit:
+            self.load_daily_problems()
+            self.watch_paths()
+            self.start_vault_scan()
+        else:
+            self.start_background_load()
+
+    def show_daily_problems(self, daily_problems):
+        with metrics.span("load_daily_problems") as span:
+            self.review_model.set_entries(daily_problems)
+            self.update_overview()
+            span.count("cards_built", len(daily_problems))
+
+    def update_overview(self):
+        rows = self.review_model.rowCount()
+        if self.searching():
+            due_count = len(self.due_index.due(days.today()))
+            self.encourage_label.setText("没有匹配的题目")
+        else:
+            due_count = rows
+            if rows == 0 and self.encourage_label.text() not in ENCOURAGE_MESSAGES:
+                import random
+                self.encourage_label.setText(random.choice(ENCOURAGE_MESSAGES))
+        self.review_view.setVisible(rows > 0)
+        self.encourage_label.setVisible(rows == 0)
 
-    def load_daily_problems(self):
-        while self.problem_list_layout.count():
-            child = self.problem_list_layout.takeAt(0)
-            if child.widget():
-                child.widget().deleteLater()
-        today = datetime.now().date()
-        daily_problems = []
-        for subject in self.subjects:
-            for problem in subject.get("problems", []):
-                if problem.get("review_dates"):
-                    review_date = datetime.strptime(problem["review_dates"][0], "%Y-%m-%d").date()
-                    if review_date <= today:
-                        daily_problems.append((problem, subject))
-        daily_problems.sort(key=lambda x: x[0].get("confidence", 0))
-        for problem, subject in daily_problems:
-            card = ProblemCard(problem, subject, self)
-            self.problem_list_layout.addWidget(card)
+        # Update Overview Cards
+        self.tasks_count.setText(str(due_count))
+        self.total_count.setText(str(self.aggregates.total_problems))
+        self.ers_count.setText(f"{self.aggregates.average_ers():.1f}")
+        if VERIFY_AGGREGATES:
+            for mismatch in self.aggregates.verify(self.subjects):
+                print(f"统计校验不一致: {mismatch}")
+
+    @metrics.action("rate_problem")
+    def rate_problem(self, subject_name, description, new_confidence):
+        subject = self.find_subject(subject_name)
+        problem = subject.problems.get(description) if subject is not None else None
+        if problem is None:
+            # Deleted by a sync merge or a reload before the click arrived.
+            return
+        self.review_problem(problem, subject, new_confidence)
+        row = self.review_model.row_of(problem)
+        if row >= 0:
+            if self.searching() or problem.next_review <= days.today():
+                self.review_model.refresh_row(row)
+            else:
+                self.review_model.remove_row(row)
+        self.update_overview()
+        if new_confidence >= 4:
+            reply = QMessageBox.question(self, "建议删除",
+                                         f"题目 '{problem.description}' 信心已达 {new_confidence}，建议删除以避免题海战术，是否删除？",
+                                         QMessageBox.StandardButton.Yes | QMessageBox.StandardButton.No)
+            # The dialog runs its own event loop, so a merge may have replaced it.
+            if reply == QMessageBox.StandardButton.Yes and subject.problems.get(description) is problem:
+                self.delete_problem(problem, subject)
+
+    def start_review_session(self):
+        from dialogs import ReviewSessionDialog
+        from session import ReviewSession
+        daily_problems = self.daily_problems()
         if not daily_problems:
-            encourage_label = QLabel(random.choice(ENCOURAGE_MESSAGES))
-            encourage_label.setStyleSheet(
-                "color: #90EE90; font-size: 16pt; font-weight: bold; text-align: center; padding: 50px;")
-            self.problem_list_layout.addWidget(encourage_label)
-        self.problem_list_layout.addStretch()
+            QMessageBox.information(self, "提示", "今天没有需要复习的题目。")
+            return
+        dialog = ReviewSessionDialog(ReviewSession(self, daily_problems), self)
+        dialog.exec()
+        self.load_daily_problems()
 
-        # Update Overview Cards
-        self.tasks_count.setText(str(len(daily_problems)))
-        total_problems = sum(len(s['problems']) for s in self.subjects)
-        self.total_count.setText(str(total_problems))
-        avg_ers = sum(s['ers_score'] for s in self.subjects) / len(self.subjects) if self.subjects else 0
-        self.ers_count.setText(f"{avg_ers:.1f}")
+    @metrics.action("commit_reviews")
+    def commit_reviews(self, reviews):
+        return super().commit_reviews(reviews)
 
     def show_quick_add(self):
-        dialog = QuickAddDialog([s['name'] for s in self.subjects], self)
+        from dialogs import QuickAddDialog
+        dialog = QuickAddDialog([s.name for s in self.subjects], self)
         if dialog.exec():
             data = dialog.get_data()
             if data['description'] and data['subject']:
                 self.add_problem(data['description'], data['subject'], data['tags'])
 
+    @metrics.action("add_problem")
     def add_problem(self, description, subject_name, tags):
-        subjects, skills = [], []
-        if tags and '-' in tags:
-            subject_part, skill_part = tags.split('-', 1)
-            subjects = [s.strip() for s in subject_part.split(',') if s.strip()]
-            skills = [s.strip() for s in skill_part.split(',') if s.strip()]
-        elif tags:
-            subjects = [s.strip() for s in tags.split(',') if s.strip()]
-
-        today_str = datetime.now().strftime("%Y-%m-%d")
-        subject = next((s for s in self.subjects if s['name'] == subject_name), None)
-        if not subject:
-            daily_note_path = self.create_daily_note(today_str, subject_name)
-            subject = {
-                "name": subject_name,
-                "created": today_str,
-                "daily_note": str(daily_note_path) if daily_note_path else "",
-                "practice_exam_scores": [],
-                "ers_score": 0,
-                "problems": [],
-                "concepts": []
-            }
-            self.subjects.append(subject)
-        new_problem = {
-            "description": description,
-            "confidence": 1,
-            "subjects": subjects,
-            "skills": skills,
-            "review_dates": [(datetime.now() + timedelta(days=1)).strftime("%Y-%m-%d")],
-            "completed_reviews": [{"date": today_str}]
-        }
-        subject["problems"].append(new_problem)
-        self.update_daily_note_problem(description, subjects, skills, subject["daily_note"])
-        subject["ers_score"] = self.calculate_ers(subject)
-        self.save_subjects()
-        self.load_daily_problems()
+        problem, subject = super().add_problem(description, subject_name, tags)
+        self.update_overview()
         QMessageBox.information(self, "提示", f"题目 '{description}' 已添加，请在Obsidian打开今日笔记补充解析。")
+        return problem, subject
+
+    @metrics.action("delete_problem")
+    def delete_problem(self, problem, subject):
+        super().delete_problem(problem, subject)
+        row = self.review_model.row_of(problem)
+        if row >= 0:
+            self.review_model.remove_row(row)
+        self.update_overview()
 
     def show_exam_score(self):
-        dialog = ExamScoreDialog([s['name'] for s in self.subjects], self)
+        from dialogs import ExamScoreDialog
+        dialog = ExamScoreDialog([s.name for s in self.subjects], self)
         if dialog.exec():
             data = dialog.get_data()
             if data['subject'] and data['score']:
@@ -580,109 +646,60 @@ class TaskNotebook(QWidget):
                 except ValueError:
                     QMessageBox.warning(self, "错误", "请输入有效的数字分数。")
 
+    @metrics.action("add_exam_score")
     def add_exam_score(self, subject_name, score):
-        subject = next((s for s in self.subjects if s['name'] == subject_name), None)
+        subject = super().add_exam_score(subject_name, score)
         if subject:
-            subject["practice_exam_scores"].append(score)
-            subject["ers_score"] = self.calculate_ers(subject)
-            self.save_subjects()
             self.load_daily_problems()
+        return subject
 
-    def calculate_ers(self, subject):
-        problems = subject.get("problems", [])
-        total_problems = len(problems)
-        if total_problems == 0:
-            return 0
-        confident_problems = sum(1 for p in problems if p.get('confidence', 0) >= 4)
-        percentage_confident = confident_problems / total_problems
-        scores = subject.get("practice_exam_scores", [])[-3:]
-        avg_score = sum(scores) / len(scores) / 100.0 if scores else 0.0
-        return round(avg_score * percentage_confident * 100, 2)
-
-    def adjust_problem_review_interval(self, problem, confidence, subject):
-        base_intervals = [1, 2, 4, 7, 15, 30, 60]
-        review_index = len(problem.get("completed_reviews", []))
-        interval_days = base_intervals[min(review_index, len(base_intervals) - 1)]
-        ers = subject.get('ers_score', 0)
-        if ers > 0:
-            ers_factor = min(1.5, max(0.5, 100 / ers))
-            interval_days *= ers_factor
-        if confidence >= 4:
-            interval_days *= 1.5
-        elif confidence <= 2:
-            interval_days *= 0.7
-        interval_days = max(1, int(round(interval_days)))
-        last_date = datetime.now()
-        next_date = last_date + timedelta(days=interval_days)
-        problem["review_dates"] = [next_date.strftime("%Y-%m-%d")]
-        problem["completed_reviews"].append({"date": last_date.strftime("%Y-%m-%d")})
+    @metrics.action("rebalance_backlog")
+    def rebalance_backlog(self):
+        moved = super().rebalance_backlog()
+        if moved:
+            self.load_daily_problems()
+        return moved
 
     def view_all_subjects(self):
-        dialog = SubjectOverviewDialog(self.subjects, self)
+        from dialogs import SubjectOverviewDialog
+        dialog = SubjectOverviewDialog(self.subjects, self.subject_trend, self)
         dialog.exec()
 
-    def open_obsidian_notes(self):
-        notes_dir = Path(self.notes_dir) / "daily_notes"
-        try:
-            subprocess.run(['explorer', str(notes_dir)], shell=True)  # Windows
-        except Exception as e:
-            QMessageBox.warning(self, "错误", f"无法打开笔记目录: {e}\n请手动打开 {notes_dir}")
+    def show_forecast(self):
+        from dialogs import ForecastDialog
+        dialog = ForecastDialog(self.forecast, self.rebalance_backlog, self)
+        dialog.exec()
 
-    def update_daily_note_problem(self, description, subjects, skills, note_path):
-        note_path = Path(note_path) if note_path else self.create_daily_note(datetime.now().strftime("%Y-%m-%d"),
-                                                                             "Default")
-        try:
-            with open(note_path, "a", encoding="utf-8") as f:
-                f.write(
-                    f"\n### 题目: {description}\n主题: {', '.join(subjects)}\n技巧: {', '.join(skills)}\n图片解析: [待补充图片]\n心得: [待补充技巧或心得]\n")
-        except Exception as e:
-            print(f"更新笔记中的题目失败: {e}")
+    def show_settings(self):
+        from dialogs import SettingsDialog
+        dialog = SettingsDialog(self)
+        dialog.exec()
 
-    def remove_problem_from_daily_note(self, description, note_path):
-        if not note_path or not Path(note_path).exists():
-            return
-        try:
-            with open(note_path, "r", encoding="utf-8") as f:
-                content = f.read()
-            import re
-            pattern = rf"\n### 题目: {re.escape(description)}\n.*?\n心得:.*?(?=\n###|\Z)"
-            new_content = re.sub(pattern, "", content, flags=re.DOTALL)
-            with open(note_path, "w", encoding="utf-8") as f:
-                f.write(new_content)
-        except Exception as e:
-            print(f"从笔记中移除题目失败: {e}")
-
-    def create_daily_note(self, date_str, subject_name):
-        notes_dir_path = Path(self.notes_dir) / "daily_notes"
-        if not notes_dir_path.is_dir():
-            return ""
-        notes_dir_path.mkdir(parents=True, exist_ok=True)
-        daily_note_file_path = notes_dir_path / f"{date_str}.md"
-        content = f"# Daily Note - {date_str}\n"
+    def show_diagnostics(self):
+        from dialogs import DiagnosticsDialog
+        dialog = DiagnosticsDialog(self)
+        dialog.exec()
+
+    def show_unfinished_notes(self):
+        from dialogs import UnfinishedNotesDialog
+        self.notes_dialog = UnfinishedNotesDialog(self)
+        # Show the cached result at once; the rescan only re-reads changed notes.
+        self.start_vault_scan()
+        self.notes_dialog.refresh()
         try:
-            if not os.access(notes_dir_path, os.W_OK):
-                print(f"笔记目录不可写: {notes_dir_path}")
-                return ""
-            if not daily_note_file_path.exists():
-                with open(daily_note_file_path, "w", encoding="utf-8") as f:
-                    f.write(content)
-            return daily_note_file_path
-        except Exception as e:
-            print(f"创建笔记失败: {e}")
-            return ""
+            self.notes_dialog.exec()
+        finally:
+            self.notes_dialog = None
 
-    def load_settings(self):
+    def open_obsidian_notes(self):
+        notes_dir = Path(self.notes_dir) / "daily_notes"
         try:
-            if SETTINGS_FILE.exists():
-                with open(SETTINGS_FILE, "r", encoding="utf-8") as f:
-                    settings = json.load(f)
-                self.data_file = settings.get("data_file", str(DEFAULT_DATA_FILE))
-                self.notes_dir = settings.get("notes_dir", str(DEFAULT_NOTES_DIR))
+            subprocess.run(['explorer', str(notes_dir)], shell=True)  # Windows
         except Exception as e:
-            print(f"加载设置失败: {e}")
+            QMessageBox.warning(self, "错误", f"无法打开笔记目录: {e}\n请手动打开 {notes_dir}")
 
 
 if __name__ == '__main__':
     app = QApplication(sys.argv)
-    window = TaskNotebook()
+    window = TaskNotebook(startup_profile="--startup-profile" in sys.argv)
     sys.exit(app.exec())
\ No newline at end of file
@@ -0,0 +1,194 @@
+import cProfile
+import functools
+import io
+import json
+import os
+import pstats
+import threading
+import time
+from collections import deque
+
+# --- Hot-path instrumentation ---
+#
+# span("save_subjects") times a block and lets it attach counters (bytes
+# written, problems scanned, ...). Samples go into a rolling window per
+# operation that the diagnostics dialog summarizes as percentiles and a
+# latency histogram. Disabled by default; while disabled span() hands out a
+# shared no-op object, so the cost is one flag check. ERS_METRICS=1 turns it on
+# from startup.
+
+HISTORY = 512
+BUCKETS_MS = (0.1, 1, 10, 100, 1000)
+
+
+class Metric:
+    def __init__(self, name):
+        self.name = name
+        self.samples = deque(maxlen=HISTORY)
+        self.calls = 0
+        self.counters = {}
+
+    def add(self, elapsed_ms, counts):
+        self.samples.append(elapsed_ms)
+        self.calls += 1
+        for key, value in counts.items():
+            self.counters[key] = self.counters.get(key, 0) + value
+
+    def summary(self):
+        ordered = sorted(self.samples)
+        n = len(ordered)
+
+        def pct(p):
+            return round(ordered[min(n - 1, int(p * n))], 3) if n else 0.0
+
+        histogram, lower = {}, 0
+        for edge in BUCKETS_MS:
+            histogram[f"<{edge}ms"] = sum(1 for s in ordered if lower <= s < edge)
+            lower = edge
+        histogram[f">={BUCKETS_MS[-1]}ms"] = sum(1 for s in ordered if s >= BUCKETS_MS[-1])
+        return {
+            "calls": self.calls,
+            "window": n,
+            "mean_ms": round(sum(ordered) / n, 3) if n else 0.0,
+            "p50_ms": pct(0.5),
+            "p90_ms": pct(0.9),
+            "p99_ms": pct(0.99),
+            "max_ms": round(ordered[-1], 3) if n else 0.0,
+            "last_ms": round(self.samples[-1], 3) if n else 0.0,
+            "histogram": histogram,
+            "counters": dict(self.counters)
+        }
+
+
+class Span:
+    __slots__ = ("name", "counts", "started")
+
+    def __init__(self, name):
+        self.name = name
+        self.counts = {}
+
+    def __bool__(self):
+        return True
+
+    def __enter__(self):
+        self.started = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc):
+        record(self.name, (time.perf_counter() - self.started) * 1000, self.counts)
+        return False
+
+    def count(self, key, value=1):
+        self.counts[key] = self.counts.get(key, 0) + value
+
+
+class _NullSpan:
+    __slots__ = ()
+
+    def __bool__(self):
+        return False
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+    def count(self, key, value=1):
+        pass
+
+
+NULL_SPAN = _NullSpan()
+
+_lock = threading.Lock()
+_metrics = {}
+_enabled = os.environ.get("ERS_METRICS") == "1"
+_profile_armed = False
+last_profile = None
+
+
+def enabled():
+    return _enabled
+
+
+def set_enabled(on):
+    global _enabled
+    _enabled = bool(on)
+
+
+def span(name):
+    return Span(name) if _enabled else NULL_SPAN
+
+
+def record(name, elapsed_ms, counts=None):
+    with _lock:
+        metric = _metrics.get(name)
+        if metric is None:
+            metric = _metrics[name] = Metric(name)
+        metric.add(elapsed_ms, counts or {})
+
+
+def timed(name):
+    def decorate(fn):
+        @functools.wraps(fn)
+        def wrapper(*args, **kwargs):
+            if not _enabled:
+                return fn(*args, **kwargs)
+            with Span(name):
+                return fn(*args, **kwargs)
+        return wrapper
+    return decorate
+
+
+def snapshot():
+    with _lock:
+        return {name: metric.summary() for name, metric in sorted(_metrics.items())}
+
+
+def reset():
+    with _lock:
+        _metrics.clear()
+
+
+def dump(path):
+    report = {"timestamp": time.strftime("%Y-%m-%dT%H:%M:%S"), "enabled": _enabled, "metrics": snapshot()}
+    with open(path, "w", encoding="utf-8") as f:
+        json.dump(report, f, ensure_ascii=False, indent=2)
+
+
+# --- One-shot profiling ---
+#
+# profile_next_action() arms cProfile for the next function decorated with
+# action(); the result is kept in last_profile as (name, pstats.Stats).
+
+
+def profile_next_action():
+    global _profile_armed
+    _profile_armed = True
+
+
+def action(name):
+    def decorate(fn):
+        @functools.wraps(fn)
+        def wrapper(*args, **kwargs):
+            global _profile_armed, last_profile
+            if not _profile_armed:
+                return fn(*args, **kwargs)
+            _profile_armed = False
+            profiler = cProfile.Profile()
+            try:
+                return profiler.runcall(fn, *args, **kwargs)
+            finally:
+                last_profile = (name, pstats.Stats(profiler))
+        return wrapper
+    return decorate
+
+
+def profile_report(limit=30):
+    if last_profile is None:
+        return ""
+    name, stats = last_profile
+    out = io.StringIO()
+    stats.stream = out
+    stats.sort_stats("cumulative").print_stats(limit)
+    return f"{name}\n{out.getvalue()}"
@@ -0,0 +1,161 @@
+import sys
+from array import array
+
+from days import history
+
+# --- In-memory domain model ---
+#
+# Stores, migrations and journal records work on plain dicts (storage.py);
+# between load and save the app works on these slotted objects instead. A
+# Subject keeps its problems in a dict keyed by description and the Catalog
+# keeps subjects by name, so lookups and removals do not scan the bank.
+# Unknown keys are carried in `extra` so they survive a round trip.
+
+PROBLEM_KEYS = frozenset(("description", "confidence", "subjects", "skills", "review_dates", "completed_reviews"))
+SUBJECT_KEYS = frozenset(("name", "created", "daily_note", "practice_exam_scores", "ers_score", "problems",
+                          "concepts"))
+CONCEPT_KEYS = frozenset(("subjects", "skills"))
+
+
+def _tags(values):
+    # Topic and skill names repeat across thousands of problems; share them.
+    return tuple(map(sys.intern, values))
+
+
+def _extra(data, known):
+    if len(data) <= len(known) and known.issuperset(data):
+        return None
+    return {k: v for k, v in data.items() if k not in known}
+
+
+class Problem:
+    __slots__ = ("description", "confidence", "subjects", "skills", "next_review", "completed_reviews", "extra")
+
+    def __init__(self, description, confidence=1, subjects=(), skills=(), next_review=None, completed_reviews=None,
+                 extra=None):
+        self.description = description
+        self.confidence = confidence
+        self.subjects = _tags(subjects)
+        self.skills = _tags(skills)
+        self.next_review = next_review
+        self.completed_reviews = completed_reviews if completed_reviews is not None else history()
+        self.extra = extra
+
+    @classmethod
+    def from_dict(cls, data):
+        review_dates = data.get("review_dates")
+        reviews = data.get("completed_reviews", ())
+        return cls(data["description"], data.get("confidence", 1), data.get("subjects", ()), data.get("skills", ()),
+                   review_dates[0] if review_dates else None,
+                   reviews if isinstance(reviews, array) else history(reviews), _extra(data, PROBLEM_KEYS))
+
+    @property
+    def review_dates(self):
+        return [self.next_review] if self.next_review is not None else []
+
+    def to_dict(self):
+        data = dict(self.extra) if self.extra else {}
+        data.update(description=self.description, confidence=self.confidence, subjects=list(self.subjects),
+                    skills=list(self.skills), review_dates=self.review_dates,
+                    completed_reviews=self.completed_reviews)
+        return data
+
+
+class Concept:
+    __slots__ = ("subjects", "skills", "extra")
+
+    def __init__(self, subjects=(), skills=(), extra=None):
+        self.subjects = _tags(subjects)
+        self.skills = _tags(skills)
+        self.extra = extra
+
+    @classmethod
+    def from_dict(cls, data):
+        return cls(data.get("subjects", ()), data.get("skills", ()), _extra(data, CONCEPT_KEYS))
+
+    def to_dict(self):
+        data = dict(self.extra) if self.extra else {}
+        data.update(subjects=list(self.subjects), skills=list(self.skills))
+        return data
+
+
+class Subject:
+    __slots__ = ("name", "created", "daily_note", "practice_exam_scores", "ers_score", "problems", "concepts",
+                 "extra")
+
+    def __init__(self, name, created=None, daily_note="", practice_exam_scores=None, ers_score=0, concepts=None,
+                 extra=None):
+        self.name = name
+        self.created = created
+        self.daily_note = daily_note
+        self.practice_exam_scores = practice_exam_scores if practice_exam_scores is not None else []
+        self.ers_score = ers_score
+        self.problems = {}
+        self.concepts = concepts if concepts is not None else []
+        self.extra = extra
+
+    @classmethod
+    def from_dict(cls, data):
+        subject = cls(data["name"], data.get("created"), data.get("daily_note", ""),
+                      list(data.get("practice_exam_scores", [])), data.get("ers_score", 0),
+                      [Concept.from_dict(c) for c in data.get("concepts", [])], _extra(data, SUBJECT_KEYS))
+        for item in data.get("problems", []):
+            problem = Problem.from_dict(item)
+            if problem.description in subject.problems:
+                print(f"主题 '{subject.name}' 中有重复题目 '{problem.description}'，仅保留第一条")
+                continue
+            subject.problems[problem.description] = problem
+        return subject
+
+    def add_problem(self, problem):
+        self.problems[problem.description] = problem
+
+    def remove_problem(self, problem):
+        del self.problems[problem.description]
+
+    def meta_dict(self):
+        data = dict(self.extra) if self.extra else {}
+        data.update(name=self.name, created=self.created, daily_note=self.daily_note,
+                    practice_exam_scores=self.practice_exam_scores, ers_score=self.ers_score)
+        return data
+
+    def to_dict(self):
+        data = self.meta_dict()
+        data["problems"] = [p.to_dict() for p in self.problems.values()]
+        data["concepts"] = [c.to_dict() for c in self.concepts]
+        return data
+
+
+class Catalog:
+    # Subjects in insertion order, indexed by name.
+
+    def __init__(self, subjects=()):
+        self._by_name = {}
+        for subject in subjects:
+            self.add(subject)
+
+    @classmethod
+    def from_dicts(cls, items):
+        return cls(Subject.from_dict(item) for item in items)
+
+    def to_dicts(self):
+        return [s.to_dict() for s in self._by_name.values()]
+
+    def __iter__(self):
+        return iter(self._by_name.values())
+
+    def __len__(self):
+        return len(self._by_name)
+
+    def get(self, name):
+        return self._by_name.get(name)
+
+    def add(self, subject):
+        self._by_name[subject.name] = subject
+
+    def remove(self, subject):
+        del self._by_name[subject.name]
+
+    def problem(self, subject_name, description):
+        subject = self._by_name.get(subject_name)
+        return subject.problems.get(description) if subject is not None else None
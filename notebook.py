@@ -0,0 +1,719 @@
+import json
+import os
+import time
+from datetime import datetime
+from pathlib import Path
+
+import days
+import metrics
+from datasets import Dataset, DatasetCache, DATASET_ATTRIBUTES, DATASET_CACHE_MB, DEFAULT_PROFILE
+from history import ErsHistory
+from indexes import DueIndex, ErsAggregates
+from model import Catalog, Subject, Problem
+from notes import NoteIndex, problem_section
+from persistence import PersistenceWorker
+from scheduler import schedule_problem, reschedule_subject, spread_backlog, tolerance_days, LOAD_TOLERANCE
+from search import SearchIndex, RESULT_LIMIT
+from session import DELETE
+from snapshot import DEFAULT_FORMAT, BACKUP_COUNT, export_document
+from storage import (open_store, migrate_subjects, SCHEMA_VERSION, subject_record, problem_record,
+                     review_record, delete_record, reschedule_record)
+from sync import (Baseline, FileStamps, diff, merge_problems, merge_subject_meta, problem_state,
+                  subject_state)
+from vault import VaultIndex
+
+# --- Qt-free notebook core ---
+#
+# Everything TaskNotebook does to the data set, without any widgets, so the
+# same logic can run headless (bulk import, benchmarks). TaskNotebook mixes
+# this in and layers the UI refreshes on top.
+
+DEFAULT_CONFIG_DIR = Path.home() / ".task_notebook"
+DEFAULT_DATA_FILE = DEFAULT_CONFIG_DIR / "tasks.json"
+DEFAULT_NOTES_DIR = r"C:\Users\HuoZihang\Desktop\笔记"
+SETTINGS_FILE = DEFAULT_CONFIG_DIR / "settings.json"
+VAULT_CACHE_DIR = DEFAULT_CONFIG_DIR / "vault_cache"
+# Without a daily capacity, rebalancing spreads the backlog over this many days.
+BACKLOG_SPREAD_DAYS = 7
+
+
+def parse_tags(tags):
+    subjects, skills = [], []
+    if tags and '-' in tags:
+        subject_part, skill_part = tags.split('-', 1)
+        subjects = [s.strip() for s in subject_part.split(',') if s.strip()]
+        skills = [s.strip() for s in skill_part.split(',') if s.strip()]
+    elif tags:
+        subjects = [s.strip() for s in tags.split(',') if s.strip()]
+    return subjects, skills
+
+
+class Notebook:
+    def __init__(self, **kwargs):
+        super().__init__(**kwargs)
+        self.reset_dataset()
+        self.dataset_cache = DatasetCache()
+        self.persistence = PersistenceWorker()
+        # The hooks look the data set up on each call, since switching
+        # profiles swaps it.
+        self.persistence.after_batch.append(self.apply_note_removals)
+        self.persistence.after_batch.append(self.remember_written)
+        self.persistence.after_batch.append(self.flush_history)
+        self.persistence.start()
+        self.data_file = str(DEFAULT_DATA_FILE)
+        self.notes_dir = str(DEFAULT_NOTES_DIR)
+        self.profile = DEFAULT_PROFILE
+        self.profiles = {}
+        self.daily_capacity = 0
+        self.load_tolerance = LOAD_TOLERANCE
+        self.snapshot_format = DEFAULT_FORMAT
+        self.snapshot_backups = BACKUP_COUNT
+
+    def reset_dataset(self):
+        # Everything that belongs to one data file; see datasets.Dataset.
+        self.subjects = Catalog()
+        self.store = None
+        self.due_index = DueIndex()
+        self.aggregates = ErsAggregates()
+        self.note_index = NoteIndex()
+        self.vault = VaultIndex(VAULT_CACHE_DIR)
+        self.ers_history = ErsHistory()
+        self.search_index = SearchIndex()
+        self.baseline = Baseline()
+        self.stamps = FileStamps()
+
+    def dataset_key(self):
+        return self.data_file, self.notes_dir
+
+    def activate_profile(self, name):
+        # Parks the current data set in the cache and makes `name` current.
+        # Returns True when its data set came back from the cache, still
+        # matching the files on disk; otherwise the caller loads it.
+        profile = self.profiles[name]
+        with metrics.span("switch_profile") as span:
+            self.persistence.flush()
+            if self.persistence.error is not None:
+                self.save_subjects()
+            self.ers_history.flush()
+            parked_key = self.dataset_key()
+            parked = Dataset(**{n: getattr(self, n) for n in DATASET_ATTRIBUTES})
+            self.reset_dataset()
+            self.profile = name
+            self.data_file, self.notes_dir = profile["data_file"], profile["notes_dir"]
+            # Take before parking, so the eviction cannot pick the target.
+            dataset = self.dataset_cache.take(self.dataset_key())
+            self.dataset_cache.put(parked_key, parked)
+            if dataset is not None and (dataset.store is None or dataset.stamps.changed(dataset.store.files)):
+                # Edited while parked (e.g. synced from another machine).
+                dataset.close()
+                dataset = None
+            if dataset is not None:
+                self.attach_dataset(dataset)
+            span.count("cache_hit", dataset is not None)
+        return dataset is not None
+
+    def attach_dataset(self, dataset):
+        for n in DATASET_ATTRIBUTES:
+            setattr(self, n, getattr(dataset, n))
+
+    def read_dataset(self):
+        # A detached Dataset of the data file, built without writing anything
+        # (no migration save, compaction, journal repair or ERS history), for
+        # readers running next to the app such as query_server.py.
+        with metrics.span("read_dataset") as span:
+            reader = open_store(self.data_file, read_only=True)
+            stamps = FileStamps()
+            # Stamped before reading: an edit landing mid-read then shows up
+            # as a change on the next check instead of being missed.
+            stamps.remember(*reader.files)
+            try:
+                data = reader.read()
+                migrate_subjects(data, reader.schema_version)
+            finally:
+                reader.close()
+            subjects = Catalog.from_dicts(data)
+            del data
+            due_index, aggregates, search_index = DueIndex(), ErsAggregates(), SearchIndex()
+            due_index.build(subjects)
+            aggregates.build(subjects)
+            search_index.reset(subjects)
+            span.count("problems", aggregates.total_problems)
+        return Dataset(store=None, subjects=subjects, due_index=due_index, aggregates=aggregates,
+                       search_index=search_index, note_index=NoteIndex(), baseline=Baseline(), stamps=stamps,
+                       ers_history=ErsHistory(), vault=VaultIndex(VAULT_CACHE_DIR))
+
+    def switch_profile(self, name):
+        if not self.activate_profile(name):
+            self.load_subjects()
+
+    def load_subjects(self):
+        with metrics.span("load_subjects") as span:
+            try:
+                if self.store is not None:
+                    self.persistence.flush()
+                    self.store.close()
+                cached = self.dataset_cache.take(self.dataset_key())
+                if cached is not None:
+                    cached.close()
+                started = time.perf_counter()
+                self.store = open_store(self.data_file, self.snapshot_format, self.snapshot_backups)
+                data = self.store.load()
+                version = self.store.schema_version
+                migrated = migrate_subjects(data, version)
+                self.subjects = Catalog.from_dicts(data)
+                del data
+                loaded = time.perf_counter()
+                if migrated:
+                    print(f"数据模型已从 v{version} 升级到 v{SCHEMA_VERSION}，正在保存...")
+                    self.save_subjects()
+                    print(f"加载数据 {(loaded - started) * 1000:.1f} ms，"
+                          f"迁移并保存 {(time.perf_counter() - loaded) * 1000:.1f} ms")
+                else:
+                    if self.store.needs_compaction:
+                        self.save_subjects()
+                    print(f"加载数据 {(loaded - started) * 1000:.1f} ms（schema v{version}，已跳过迁移）")
+                self.stamps.remember(*self.store.files)
+            except Exception as e:
+                print(f"加载或迁移主题数据时出错: {e}")
+                self.subjects = Catalog()
+            self.due_index.build(self.subjects)
+            self.aggregates.build(self.subjects)
+            self.search_index.reset(self.subjects)
+            self.baseline.capture(self.subjects)
+            try:
+                self.ers_history.load(self.data_file)
+                self.track_history(*self.subjects)
+                self.ers_history.flush()
+            except Exception as e:
+                print(f"加载 ERS 历史失败: {e}")
+            span.count("problems", self.aggregates.total_problems)
+
+    def export_json(self, path):
+        # Readable JSON copy of the data set, whatever format the data file is.
+        with metrics.span("export_json"):
+            tmp_file = Path(str(path) + ".tmp")
+            with open(tmp_file, "w", encoding="utf-8") as f:
+                json.dump(export_document(self.subjects.to_dicts()), f, ensure_ascii=False, indent=2,
+                          default=days.json_default)
+            os.replace(tmp_file, path)
+
+    def save_subjects(self):
+        self.persistence.flush()
+        with metrics.span("save_subjects") as span:
+            try:
+                self.store.save(self.subjects.to_dicts())
+                self.stamps.remember_written(self.store.take_written())
+                self.baseline.saved(self.subjects)
+                self.persistence.error = None
+                if span:
+                    span.count("bytes_written", os.path.getsize(self.data_file))
+            except Exception as e:
+                print(f"保存主题数据失败: {e}")
+
+    def record_change(self, *records):
+        if self.persistence.error is not None:
+            # A background append failed; rewrite the snapshot from memory so
+            # nothing is lost, then continue journaling.
+            self.save_subjects()
+        seq = self.persistence.submitted + 1
+        self.baseline.mark(records, self.subjects, seq)
+        self.persistence.submit(self.store, *records)
+
+    def apply_note_removals(self):
+        self.note_index.apply_removals()
+
+    def flush_history(self):
+        self.ers_history.flush()
+
+    def remember_written(self):
+        # Runs after each persistence batch, so our own journal appends do not
+        # look like external edits to the file watcher. Compaction rebuilds
+        # the snapshot from disk, so it waits while the files hold records
+        # from another client that are not merged yet.
+        store = self.store
+        if store is None:
+            return
+        self.baseline.written(self.persistence.written, self.persistence.error is None)
+        self.stamps.remember_written(store.take_written())
+        if store.needs_compaction and not self.stamps.has_foreign(store.files):
+            store.compact()
+            self.stamps.remember_written(store.take_written())
+
+    def shutdown(self):
+        self.persistence.stop()
+        self.ers_history.flush()
+        if self.persistence.error is not None:
+            self.save_subjects()
+        if self.store is not None:
+            self.store.close()
+        self.dataset_cache.clear()
+
+    def find_subject(self, subject_name):
+        return self.subjects.get(subject_name)
+
+    def daily_problems(self):
+        with metrics.span("daily_problems") as span:
+            daily_problems = self.due_index.due(days.today())
+            daily_problems.sort(key=lambda x: x[0].confidence)
+            span.count("problems_scanned", len(daily_problems))
+        return daily_problems
+
+    def forecast(self, length):
+        # Cumulative due counts for the next `length` days: the total, then
+        # [(subject name, counts)] for subjects with anything due in the window.
+        today = days.today()
+        with metrics.span("forecast") as span:
+            total = self.due_index.due_counts(today, length)
+            rows = []
+            for subject in self.subjects:
+                counts = self.due_index.due_counts(today, length, subject.name)
+                if counts[-1]:
+                    rows.append((subject.name, counts))
+            span.count("subjects", len(rows))
+        return total, rows
+
+    def search(self, text, limit=RESULT_LIMIT):
+        with metrics.span("search") as span:
+            total, results = self.search_index.search(text, limit, problems_only=True)
+            span.count("matches", total)
+        return total, results
+
+    def insert_problem(self, description, subject_name, tags):
+        subjects, skills = parse_tags(tags)
+        today_str = datetime.now().strftime("%Y-%m-%d")
+        subject = self.find_subject(subject_name)
+        if not subject:
+            daily_note_path = self.create_daily_note(today_str, subject_name)
+            subject = Subject(subject_name, today_str, str(daily_note_path) if daily_note_path else "")
+            self.subjects.add(subject)
+            self.aggregates.add_subject(subject)
+        today = days.today()
+        new_problem = Problem(description, 1, subjects, skills, today + 1, days.history([today]))
+        place = self.placer(subject, today)
+        if place is not None:
+            new_problem.next_review = place(new_problem, today + 1, 1)
+        old_problem = subject.problems.get(description)
+        if old_problem is not None:
+            # Re-adding a description replaces the entry, as the journal does.
+            self.aggregates.remove_problem(subject, old_problem)
+        self.replace_problem(subject, old_problem, new_problem)
+        self.aggregates.add_problem(subject, new_problem)
+        self.refresh_ers(subject)
+        return new_problem, subject
+
+    def add_problem(self, description, subject_name, tags):
+        problem, subject = self.insert_problem(description, subject_name, tags)
+        self.persistence.submit_task(self.update_daily_note_problem, description, problem.subjects,
+                                     problem.skills, subject.daily_note)
+        self.record_change(subject_record(subject), problem_record(subject, problem))
+        return problem, subject
+
+    def review_problem(self, problem, subject, new_confidence):
+        self.aggregates.change_confidence(subject, problem.confidence, new_confidence)
+        self.search_index.change_confidence(problem, problem.confidence, new_confidence)
+        problem.confidence = new_confidence
+        self.adjust_problem_review_interval(problem, new_confidence, subject)
+        self.refresh_ers(subject)
+        self.record_change(review_record(subject, problem), subject_record(subject))
+
+    def replace_problem(self, subject, old, new):
+        # Swaps a problem in the subject, the due index and the search index;
+        # either side may be None. ERS aggregates are left to the caller.
+        if old is not None:
+            subject.remove_problem(old)
+            self.due_index.remove(old)
+            self.search_index.remove(old)
+        if new is not None:
+            subject.add_problem(new)
+            self.due_index.add(new, subject)
+            self.search_index.add(new, subject)
+
+    def commit_reviews(self, reviews):
+        # Applies a ReviewSession queue of (problem, subject, confidence or
+        # DELETE): one journal submission, note removals spliced once per note
+        # after that batch, and ERS recomputed once per touched subject.
+        # Entries whose problem was replaced meanwhile (an external merge) are
+        # skipped. Returns the number applied.
+        today = days.today()
+        records, touched, applied = [], {}, 0
+        with metrics.span("commit_reviews") as span:
+            for problem, subject, action in reviews:
+                if subject.problems.get(problem.description) is not problem:
+                    continue
+                if action == DELETE:
+                    self.aggregates.remove_problem(subject, problem)
+                    self.replace_problem(subject, problem, None)
+                    if subject.daily_note and Path(subject.daily_note).exists():
+                        self.note_index.queue_removal(subject.daily_note, problem.description)
+                    records.append(delete_record(subject, problem.description))
+                else:
+                    self.aggregates.change_confidence(subject, problem.confidence, action)
+                    self.search_index.change_confidence(problem, problem.confidence, action)
+                    problem.confidence = action
+                    schedule_problem(problem, action, subject.ers_score, today, place=self.placer(subject, today))
+                    self.due_index.update(problem, subject)
+                    records.append(review_record(subject, problem))
+                touched[subject.name] = subject
+                applied += 1
+            self.refresh_ers(*touched.values())
+            records.extend(subject_record(subject) for subject in touched.values())
+            if records:
+                self.record_change(*records)
+            span.count("reviews", applied)
+        return applied
+
+    def delete_problem(self, problem, subject):
+        self.aggregates.remove_problem(subject, problem)
+        self.replace_problem(subject, problem, None)
+        self.persistence.submit_task(self.remove_problem_from_daily_note, problem.description,
+                                     subject.daily_note)
+        self.refresh_ers(subject)
+        self.record_change(delete_record(subject, problem.description), subject_record(subject))
+
+    def insert_exam_score(self, subject, score):
+        subject.practice_exam_scores.append(score)
+        self.aggregates.add_score(subject, score)
+        stats = self.aggregates.stats[subject.name]
+        self.ers_history.add_score(subject.name, days.today(), score, stats.ers(), stats.mastery())
+        self.refresh_ers(subject)
+
+    def add_exam_score(self, subject_name, score):
+        subject = self.find_subject(subject_name)
+        if subject:
+            self.insert_exam_score(subject, score)
+            self.record_change(subject_record(subject))
+            self.reschedule_subject(subject)
+        return subject
+
+    def refresh_ers(self, *subjects):
+        # Every change to a subject's problems or scores ends here, so the
+        # stored ERS, the overview average and the history stay in step with
+        # the aggregates.
+        for subject in subjects:
+            self.aggregates.set_ers(subject, self.calculate_ers(subject))
+        self.track_history(*subjects)
+
+    def track_history(self, *subjects):
+        today = days.today()
+        for subject in subjects:
+            stats = self.aggregates.stats[subject.name]
+            self.ers_history.record(subject.name, today, stats.ers(), stats.mastery())
+
+    def subject_trend(self, subject_name, length, weekly):
+        # ERS history buckets for the last `length` days (None: everything).
+        today = days.today()
+        first = today - length + 1 if length else (self.ers_history.first_day(subject_name) or today)
+        with metrics.span("subject_trend") as span:
+            buckets = self.ers_history.series(subject_name, first, today, weekly)
+            span.count("buckets", len(buckets))
+        return first, today, buckets
+
+    @metrics.timed("calculate_ers")
+    def calculate_ers(self, subject):
+        return self.aggregates.subject_ers(subject)
+
+    def adjust_problem_review_interval(self, problem, confidence, subject):
+        schedule_problem(problem, confidence, subject.ers_score, place=self.placer(subject))
+        self.due_index.update(problem, subject)
+
+    def reschedule_subject(self, subject):
+        changed = reschedule_subject(subject, place=self.placer(subject))
+        for problem in changed:
+            self.due_index.update(problem, subject)
+        if changed:
+            self.record_change(reschedule_record(subject, changed))
+        return changed
+
+    def placer(self, subject, today=None):
+        # The scheduler's placement hook when a daily capacity is set: each
+        # placement is a segment-tree lookup over the per-day due counts.
+        if self.daily_capacity <= 0:
+            return None
+        earliest = (today or days.today()) + 1
+
+        def place(problem, ideal, interval):
+            return self.due_index.place(problem, subject, ideal, tolerance_days(interval, self.load_tolerance),
+                                        self.daily_capacity, earliest)
+        return place
+
+    def rebalance_backlog(self):
+        # Moves whatever is due beyond today's capacity to the following days.
+        # Returns the number of problems moved.
+        today = days.today()
+        backlog = self.due_index.due(today)
+        capacity = self.daily_capacity or max(1, -(-len(backlog) // BACKLOG_SPREAD_DAYS))
+        moves = spread_backlog(backlog, capacity, self.due_index.load_at, today)
+        moved = {}
+        for problem, subject, day in moves:
+            problem.next_review = day
+            self.due_index.update(problem, subject)
+            moved.setdefault(subject.name, (subject, []))[1].append(problem)
+        if moved:
+            self.record_change(*(reschedule_record(subject, problems) for subject, problems in moved.values()))
+        return len(moves)
+
+    def read_external_changes(self):
+        # Off the GUI thread: re-reads the data file if it changed behind our
+        # back and diffs it against the baseline. None means nothing to merge.
+        store = self.store
+        if store is None:
+            return None
+        # Checked before our queued records are written, and those are only
+        # stamped as ours if nothing else landed in between (see
+        # FileStamps.remember_written), so what is found here is foreign.
+        if not self.stamps.changed(store.files) or not Path(self.data_file).exists():
+            # Sync clients often delete and rewrite; the rewrite fires again.
+            return None
+        # The re-read below should include our own records too.
+        self.persistence.flush()
+        found = self.stamps.changed(store.files)
+        if not found:
+            return None
+        with metrics.span("external_read") as span:
+            reader = open_store(self.data_file, read_only=True)
+            try:
+                data = reader.read()
+                version = reader.schema_version
+            finally:
+                reader.close()
+            migrate_subjects(data, version)
+            changes = diff(self.baseline, Catalog.from_dicts(data), found)
+            span.count("problems_changed", len(changes.problems))
+        return changes
+
+    def merge_external(self, changes):
+        # Applies read_external_changes() on the thread that owns the data.
+        # Only the keys changed on disk or locally since the baseline are
+        # visited. When the result differs from the file it is saved back.
+        with metrics.span("external_merge") as span:
+            theirs, baseline = changes.theirs, self.baseline
+            subject_names = changes.subjects | baseline.dirty_subjects
+            problem_keys = changes.problems | baseline.dirty_problems
+            stats = {"applied": 0, "merged": 0, "saved": False}
+            touched, diverged = {}, False
+            for name in subject_names:
+                mine, other = self.subjects.get(name), theirs.get(name)
+                base, mine_state, other_state = baseline.subjects.get(name), subject_state(mine), subject_state(other)
+                if mine_state == other_state:
+                    continue
+                if mine is None:
+                    mine = Subject(other.name, other.created, other.daily_note, list(other.practice_exam_scores),
+                                   other.ers_score, extra=other.extra)
+                    self.subjects.add(mine)
+                    self.replace_concepts(mine, other.concepts)
+                elif other is None:
+                    # Removed there; dropped below if nothing of ours is left.
+                    diverged = diverged or mine_state != base
+                elif mine_state == base:
+                    mine.created, mine.daily_note, mine.extra = other.created, other.daily_note, other.extra
+                    mine.practice_exam_scores = list(other.practice_exam_scores)
+                    self.replace_concepts(mine, other.concepts)
+                else:
+                    merge_subject_meta(mine, other, base)
+                    if base is not None and mine_state[3] == base[3]:
+                        self.replace_concepts(mine, other.concepts)
+                    diverged = diverged or subject_state(mine) != other_state
+                touched[name] = mine
+            for name, description in problem_keys:
+                subject = self.subjects.get(name)
+                mine = subject.problems.get(description) if subject is not None else None
+                other = theirs.problem(name, description)
+                base, mine_state, other_state = (baseline.problem(name, description), problem_state(mine),
+                                                 problem_state(other))
+                if mine_state == other_state:
+                    continue
+                if mine_state == base or mine is None:
+                    # Untouched here, or deleted here but edited there.
+                    result = other
+                    stats["applied" if mine_state == base else "merged"] += 1
+                elif other is None or other_state == base:
+                    # Only ours changed (or theirs was deleted): keep ours.
+                    diverged = True
+                    continue
+                else:
+                    result = merge_problems(mine, other)
+                    stats["merged"] += 1
+                    diverged = diverged or problem_state(result) != other_state
+                if subject is None:
+                    continue
+                touched.setdefault(name, subject)
+                self.replace_problem(subject, mine, result)
+            for name, subject in touched.items():
+                # Recount touched subjects once instead of per problem.
+                self.aggregates.remove_subject(subject)
+                removed = theirs.get(name) is None and subject_state(subject) == baseline.subjects.get(name)
+                if removed and not subject.problems:
+                    self.replace_concepts(subject, [])
+                    self.subjects.remove(subject)
+                    continue
+                self.aggregates.add_subject(subject)
+                self.refresh_ers(subject)
+            self.stamps.accept(changes.found)
+            if diverged:
+                self.save_subjects()
+                stats["saved"] = True
+            baseline.settle(self.subjects, subject_names, problem_keys)
+            span.count("problems_applied", stats["applied"] + stats["merged"])
+        return stats
+
+    def replace_concepts(self, subject, concepts):
+        for concept in subject.concepts:
+            self.search_index.remove(concept)
+        subject.concepts = list(concepts)
+        for concept in subject.concepts:
+            self.search_index.add(concept, subject)
+
+    def update_daily_note_problem(self, description, subjects, skills, note_path):
+        note_path = Path(note_path) if note_path else self.create_daily_note(datetime.now().strftime("%Y-%m-%d"),
+                                                                             "Default")
+        try:
+            self.note_index.append_section(note_path, problem_section(description, subjects, skills))
+        except Exception as e:
+            print(f"更新笔记中的题目失败: {e}")
+
+    def remove_problem_from_daily_note(self, description, note_path):
+        # Removals are collected and spliced out once per note at the end of the
+        # persistence batch (see NoteIndex.apply_removals).
+        if not note_path or not Path(note_path).exists():
+            return
+        self.note_index.queue_removal(note_path, description)
+
+    def vault_root(self):
+        return Path(self.notes_dir) / "daily_notes"
+
+    def scan_vault(self):
+        return self.vault.scan(self.vault_root())
+
+    def note_sections(self, problem):
+        # Every daily-note section titled with this problem, oldest note first.
+        return self.vault.sections_for(problem.description)
+
+    def unfinished_notes(self):
+        # [(problem, subject, section)] for note sections whose 图片解析 or 心得
+        # is still a placeholder, as of the last scan_vault().
+        entries = []
+        for section in self.vault.pending_sections():
+            for subject in self.subjects:
+                problem = subject.problems.get(section.description)
+                if problem is not None:
+                    entries.append((problem, subject, section))
+        return entries
+
+    def create_daily_note(self, date_str, subject_name):
+        notes_dir_path = Path(self.notes_dir) / "daily_notes"
+        if not notes_dir_path.is_dir():
+            return ""
+        notes_dir_path.mkdir(parents=True, exist_ok=True)
+        daily_note_file_path = notes_dir_path / f"{date_str}.md"
+        content = f"# Daily Note - {date_str}\n"
+        try:
+            if not os.access(notes_dir_path, os.W_OK):
+                print(f"笔记目录不可写: {notes_dir_path}")
+                return ""
+            if not daily_note_file_path.exists():
+                with open(daily_note_file_path, "w", encoding="utf-8") as f:
+                    f.write(content)
+            return daily_note_file_path
+        except Exception as e:
+            print(f"创建笔记失败: {e}")
+            return ""
+
+    def load_settings(self):
+        try:
+            if SETTINGS_FILE.exists():
+                with open(SETTINGS_FILE, "r", encoding="utf-8") as f:
+                    settings = json.load(f)
+                self.data_file = settings.get("data_file", str(DEFAULT_DATA_FILE))
+                self.notes_dir = settings.get("notes_dir", str(DEFAULT_NOTES_DIR))
+                self.daily_capacity = int(settings.get("daily_capacity", 0))
+                self.load_tolerance = float(settings.get("load_tolerance", LOAD_TOLERANCE))
+                self.snapshot_format = settings.get("snapshot_format", DEFAULT_FORMAT)
+                self.snapshot_backups = int(settings.get("snapshot_backups", BACKUP_COUNT))
+                self.profiles = settings.get("profiles", {})
+                self.profile = settings.get("profile", DEFAULT_PROFILE)
+                self.dataset_cache.capacity = int(settings.get("cached_datasets", self.dataset_cache.capacity))
+                self.dataset_cache.memory_cap = int(settings.get("dataset_cache_mb", DATASET_CACHE_MB)) << 20
+        except Exception as e:
+            print(f"加载设置失败: {e}")
+        # data_file / notes_dir stay the source of truth for the current
+        # profile, so settings written before profiles existed keep working.
+        self.profiles[self.profile] = {"data_file": self.data_file, "notes_dir": self.notes_dir}
+
+    def save_profiles(self):
+        self.profiles[self.profile] = {"data_file": self.data_file, "notes_dir": self.notes_dir}
+        try:
+            settings = {}
+            if SETTINGS_FILE.exists():
+                with open(SETTINGS_FILE, "r", encoding="utf-8") as f:
+                    settings = json.load(f)
+            settings.update(profiles=self.profiles, profile=self.profile, data_file=self.data_file,
+                            notes_dir=self.notes_dir)
+            SETTINGS_FILE.parent.mkdir(parents=True, exist_ok=True)
+            with open(SETTINGS_FILE, "w", encoding="utf-8") as f:
+                json.dump(settings, f, ensure_ascii=False, indent=2)
+        except Exception as e:
+            print(f"保存设置失败: {e}")
+
+    def import_entries(self, entries):
+        # Applies problem / exam score rows in memory, then persists them with a
+        # single journal append and one note write per daily note. Rows are
+        # read in full first, so a file that fails to parse changes nothing;
+        # whatever was applied before a bad row is still persisted. That holds
+        # the parsed rows in memory, not a stream: a row costs about what the
+        # problem it creates does, which the catalog keeps anyway, and undoing
+        # half-applied batches would need a reverse for every index update.
+        entries = list(entries)
+        stats = {"problems": 0, "scores": 0, "skipped": 0}
+        touched, scored, problem_records, note_sections = {}, {}, [], {}
+        try:
+            for entry in entries:
+                if not isinstance(entry, dict):
+                    stats["skipped"] += 1
+                    continue
+                description = str(entry.get("description") or "").strip()
+                subject_name = str(entry.get("subject") or "").strip()
+                score = entry.get("score")
+                if score not in (None, ""):
+                    subject = self.find_subject(subject_name)
+                    try:
+                        score = int(score)
+                    except (TypeError, ValueError):
+                        score = -1
+                    if subject is None or not 0 <= score <= 100:
+                        stats["skipped"] += 1
+                        continue
+                    self.insert_exam_score(subject, score)
+                    touched[subject.name] = scored[subject.name] = subject
+                    stats["scores"] += 1
+                elif description and subject_name:
+                    problem, subject = self.insert_problem(description, subject_name,
+                                                           str(entry.get("tags") or "").strip())
+                    touched[subject.name] = subject
+                    problem_records.append(problem_record(subject, problem))
+                    note_sections.setdefault(subject.daily_note, []).append(
+                        problem_section(description, problem.subjects, problem.skills))
+                    stats["problems"] += 1
+                else:
+                    stats["skipped"] += 1
+        finally:
+            records = [subject_record(s) for s in touched.values()] + problem_records
+            if records:
+                self.persistence.flush()
+                self.baseline.mark(records, self.subjects, self.persistence.submitted)
+                try:
+                    self.store.append(*records)
+                    self.remember_written()
+                except Exception as e:
+                    print(f"写入变更日志失败: {e}")
+                    self.save_subjects()
+            for note_path, sections in note_sections.items():
+                note_path = note_path or self.create_daily_note(datetime.now().strftime("%Y-%m-%d"), "Default")
+                try:
+                    self.note_index.append_section(note_path, "".join(sections))
+                except Exception as e:
+                    print(f"更新笔记中的题目失败: {e}")
+            # New scores move ERS, and with it the intervals, as in
+            # add_exam_score; once per subject, after the problem records.
+            for subject in scored.values():
+                self.reschedule_subject(subject)
+        return stats
@@ -0,0 +1,150 @@
+import os
+import threading
+from pathlib import Path
+
+import metrics
+
+# --- Daily-note section index ---
+#
+# Each "### 题目:" block of a daily note is indexed by byte offsets. The index is
+# cached per file and invalidated by mtime/size, so edits splice only the bytes
+# from the first affected section onwards instead of reading and regex-rewriting
+# the whole note.
+
+SECTION_MARKER = b"\n###"
+PROBLEM_MARKER = b"\n### \xe9\xa2\x98\xe7\x9b\xae: "  # "\n### 题目: "
+INSIGHT_MARKER = "\n心得:".encode("utf-8")
+# Notes written in text mode on Windows use CRLF; the first bytes tell.
+NEWLINE_PROBE = 4096
+
+
+def problem_section(description, subjects, skills):
+    return (f"\n### 题目: {description}\n主题: {', '.join(subjects)}\n技巧: {', '.join(skills)}\n"
+            f"图片解析: [待补充图片]\n心得: [待补充技巧或心得]\n")
+
+
+class NoteSection:
+    __slots__ = ("description", "start", "end")
+
+    def __init__(self, description, start, end):
+        self.description = description
+        self.start = start
+        self.end = end
+
+
+def scan_sections(data, base=0):
+    sections = []
+    pos = data.find(SECTION_MARKER)
+    while pos != -1:
+        nxt = data.find(SECTION_MARKER, pos + 1)
+        end = nxt if nxt != -1 else len(data)
+        if data.startswith(PROBLEM_MARKER, pos):
+            title_end = data.find(b"\n", pos + len(PROBLEM_MARKER))
+            title_end = end if title_end == -1 or title_end > end else title_end
+            if data.find(INSIGHT_MARKER, title_end, end) != -1:
+                title = data[pos + len(PROBLEM_MARKER):title_end].rstrip(b"\r")
+                description = title.decode("utf-8", "replace")
+                sections.append(NoteSection(description, base + pos, base + end))
+        pos = nxt
+    return sections
+
+
+def newline_of(path):
+    with open(path, "rb") as f:
+        head = f.read(NEWLINE_PROBE)
+    return b"\r\n" if b"\r\n" in head else b"\n"
+
+
+class NoteIndex:
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.cache = {}
+        self.pending_removals = {}
+
+    def _stamp(self, path):
+        st = os.stat(path)
+        return st.st_mtime_ns, st.st_size
+
+    def sections(self, path):
+        path = str(path)
+        stamp = self._stamp(path)
+        cached = self.cache.get(path)
+        if cached is not None and cached[0] == stamp:
+            return cached[1]
+        with metrics.span("note_read") as span, open(path, "rb") as f:
+            data = f.read()
+            sections = scan_sections(data)
+            span.count("bytes_read", len(data))
+        self.cache[path] = (stamp, sections)
+        return sections
+
+    def invalidate(self, *paths):
+        # A watcher saw these files change. Sync clients may restore the old
+        # mtime and size, so the cached offsets cannot be trusted either way.
+        for path in paths:
+            self.cache.pop(str(path), None)
+
+    def append_section(self, path, text):
+        path = str(path)
+        self.apply_removals(path)
+        exists = Path(path).exists()
+        sections = self.sections(path) if exists else []
+        data = text.encode("utf-8")
+        if exists and newline_of(path) == b"\r\n":
+            # Keep the note's own line endings rather than mixing in LF.
+            data = data.replace(b"\n", b"\r\n")
+        with metrics.span("note_write") as span, open(path, "ab") as f:
+            offset = f.seek(0, os.SEEK_END)
+            f.write(data)
+            span.count("bytes_written", len(data))
+        self.cache[path] = (self._stamp(path), sections + scan_sections(data, offset))
+
+    def queue_removal(self, path, description):
+        with self.lock:
+            self.pending_removals.setdefault(str(path), set()).add(description)
+
+    def apply_removals(self, path=None):
+        with self.lock:
+            if path is None:
+                batches, self.pending_removals = self.pending_removals, {}
+            else:
+                batches = {path: self.pending_removals.pop(path)} if path in self.pending_removals else {}
+        for note_path, descriptions in batches.items():
+            try:
+                self.remove_sections(note_path, descriptions)
+            except Exception as e:
+                print(f"从笔记中移除题目失败: {e}")
+
+    def remove_sections(self, path, descriptions):
+        path = str(path)
+        if not Path(path).exists():
+            return
+        sections = self.sections(path)
+        doomed = [s for s in sections if s.description in descriptions]
+        if not doomed:
+            return
+        first = doomed[0].start
+        with metrics.span("note_write") as span, open(path, "r+b") as f:
+            f.seek(first)
+            tail = f.read()
+            span.count("bytes_read", len(tail))
+            kept, cursor = [], first
+            for section in doomed:
+                kept.append(tail[cursor - first:section.start - first])
+                cursor = section.end
+            kept.append(tail[cursor - first:])
+            f.seek(first)
+            rewritten = b"".join(kept)
+            f.write(rewritten)
+            f.truncate()
+            span.count("bytes_written", len(rewritten))
+        remaining, shift = [], 0
+        doomed_ids = {id(s) for s in doomed}
+        for section in sections:
+            if id(section) in doomed_ids:
+                shift += section.end - section.start
+            elif shift:
+                remaining.append(NoteSection(section.description, section.start - shift, section.end - shift))
+            else:
+                remaining.append(section)
+        self.cache[path] = (self._stamp(path), remaining)
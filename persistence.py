@@ -0,0 +1,120 @@
+import json
+import threading
+import time
+
+from days import json_default
+
+# --- Background persistence ---
+#
+# Journal records and note-file edits are queued from the GUI thread and
+# written by a single worker thread. Bursts are coalesced: the worker waits
+# DEBOUNCE_SECONDS after the last change, but never longer than
+# MAX_LATENCY_SECONDS after the first unwritten one, then writes the whole
+# batch with one journal append per store.
+
+DEBOUNCE_SECONDS = 0.5
+MAX_LATENCY_SECONDS = 3.0
+
+
+class PersistenceWorker(threading.Thread):
+    def __init__(self, debounce=DEBOUNCE_SECONDS, max_latency=MAX_LATENCY_SECONDS):
+        super().__init__(name="persistence", daemon=True)
+        self.debounce = debounce
+        self.max_latency = max_latency
+        self.cond = threading.Condition()
+        self.pending = []
+        self.submitted = 0
+        self.completed = 0
+        # Submit number of the last item written, for the after_batch hooks.
+        self.written = 0
+        self.first_change = 0.0
+        self.last_change = 0.0
+        self.flush_requested = False
+        self.stopping = False
+        self.error = None
+        self.after_batch = []
+
+    def _enqueue(self, item):
+        with self.cond:
+            now = time.monotonic()
+            if not self.pending:
+                self.first_change = now
+            self.last_change = now
+            self.pending.append(item)
+            self.submitted += 1
+            self.cond.notify_all()
+            return self.submitted
+
+    def submit(self, store, *records):
+        # Records may reference live problem dicts; detach them now so the
+        # worker never reads data the GUI thread is still mutating.
+        return self._enqueue(("records", store, json.loads(json.dumps(records, ensure_ascii=False, default=json_default))))
+
+    def submit_task(self, fn, *args):
+        self._enqueue(("task", fn, args))
+
+    def flush(self):
+        if not self.is_alive():
+            return
+        with self.cond:
+            target = self.submitted
+            self.flush_requested = True
+            self.cond.notify_all()
+            while self.completed < target and self.is_alive():
+                self.cond.wait(0.1)
+
+    def stop(self):
+        if not self.is_alive():
+            return
+        with self.cond:
+            self.stopping = True
+            self.cond.notify_all()
+        self.join()
+
+    def run(self):
+        while True:
+            with self.cond:
+                while not self.pending and not self.stopping:
+                    self.cond.wait()
+                while self.pending and not (self.stopping or self.flush_requested):
+                    deadline = min(self.last_change + self.debounce, self.first_change + self.max_latency)
+                    remaining = deadline - time.monotonic()
+                    if remaining <= 0:
+                        break
+                    self.cond.wait(remaining)
+                batch, self.pending = self.pending, []
+                self.flush_requested = False
+                stopping = self.stopping
+            self._write(batch)
+            self.written = self.completed + len(batch)
+            for hook in self.after_batch:
+                try:
+                    hook()
+                except Exception as e:
+                    print(f"后台任务失败: {e}")
+            with self.cond:
+                self.completed += len(batch)
+                self.cond.notify_all()
+                if stopping and not self.pending:
+                    return
+
+    def _write(self, batch):
+        idx = 0
+        while idx < len(batch):
+            kind, target, payload = batch[idx]
+            idx += 1
+            if kind == "task":
+                try:
+                    target(*payload)
+                except Exception as e:
+                    print(f"后台写入笔记失败: {e}")
+                continue
+            records = list(payload)
+            while idx < len(batch) and batch[idx][0] == "records" and batch[idx][1] is target:
+                records.extend(batch[idx][2])
+                idx += 1
+            try:
+                target.append(*records)
+            except Exception as e:
+                print(f"后台保存主题数据失败: {e}")
+                self.error = e
@@ -0,0 +1,316 @@
+import argparse
+import asyncio
+import json
+import sys
+import time
+from collections import OrderedDict
+from pathlib import Path
+from urllib.parse import parse_qs, urlsplit
+
+import days
+import metrics
+from notebook import Notebook
+from search import RESULT_LIMIT
+
+# --- Local read-only query server ---
+#
+# python query_server.py [--port 8765 | --unix /tmp/task_notebook.sock]
+#
+# Serves the review queue and stats as JSON to other local tools (an Obsidian
+# plugin, a desktop widget, shell scripts) without starting the window:
+#
+#   GET /due[?subject=主题&limit=N]   today's due problems, lowest confidence first
+#   GET /subjects                     per-subject ERS, mastery and counts (as in 学习主题概览)
+#   GET /search?q=查询[&limit=N]      same query syntax as the search box
+#   GET /stats                        the overview card numbers
+#
+# The data file is read once and never written. Its (mtime, size) stamps are
+# polled; once a change has settled the file is re-read on a worker thread and
+# the new data set swapped in whole. Encoded responses are cached per request
+# target until then (or until the day rolls over), so a crowd of readers on
+# the event loop mostly costs a dict lookup each.
+
+DEFAULT_HOST = "127.0.0.1"
+DEFAULT_PORT = 8765
+POLL_SECONDS = 1.0
+RESPONSE_CACHE_SIZE = 256
+IDLE_TIMEOUT = 30
+MAX_HEADERS = 64
+FORECAST_DAYS = 7
+# Browsers send the page's host; anything else is a DNS-rebinding attempt.
+LOCAL_HOSTS = ("127.0.0.1", "localhost", "[::1]")
+REASONS = {200: "OK", 304: "Not Modified", 400: "Bad Request", 403: "Forbidden", 404: "Not Found",
+           405: "Method Not Allowed"}
+
+
+class QueryError(Exception):
+    def __init__(self, status, message):
+        super().__init__(message)
+        self.status = status
+
+
+def problem_json(problem, subject):
+    reviews = problem.completed_reviews
+    return {"description": problem.description, "subject": subject.name, "confidence": problem.confidence,
+            "subjects": list(problem.subjects), "skills": list(problem.skills),
+            "next_review": days.to_text(problem.next_review) if problem.next_review is not None else None,
+            "reviews": len(reviews), "last_review": days.to_text(reviews[-1]) if reviews else None}
+
+
+def limit_param(params, default=RESULT_LIMIT):
+    try:
+        limit = int(params.get("limit", default))
+    except ValueError:
+        raise QueryError(400, "limit 必须是整数")
+    if limit < 0:
+        raise QueryError(400, "limit 不能为负数")
+    return min(limit, RESULT_LIMIT)
+
+
+def request_host(value):
+    if value.startswith("["):
+        return value[:value.find("]") + 1]
+    return value.partition(":")[0]
+
+
+class QueryServer:
+    def __init__(self, notebook, check_host=True):
+        self.notebook = notebook
+        self.check_host = check_host
+        self.routes = {"/due": self.due, "/subjects": self.subject_summaries, "/search": self.search,
+                       "/stats": self.stats}
+        self.responses = OrderedDict()
+        self.generation = 0
+        self.loaded_at = time.time()
+        self.today = days.today()
+
+    def changed_files(self):
+        stamps = self.notebook.stamps
+        if not Path(self.notebook.data_file).exists():
+            # Sync clients often delete and rewrite; wait for the rewrite.
+            return None
+        return stamps.changed(stamps.paths())
+
+    async def reload(self):
+        loop = asyncio.get_running_loop()
+        started = time.perf_counter()
+        try:
+            dataset = await loop.run_in_executor(None, self.notebook.read_dataset)
+            # Built off the loop too, so the first search does not stall it.
+            await loop.run_in_executor(None, dataset.search_index.ensure_built)
+        except Exception as e:
+            print(f"重新加载数据失败: {e}")
+            return False
+        self.notebook.attach_dataset(dataset)
+        self.generation += 1
+        self.loaded_at = time.time()
+        self.responses.clear()
+        print(f"数据文件已变化，重新加载 {(time.perf_counter() - started) * 1000:.1f} ms"
+              f"（{dataset.aggregates.total_problems} 道题）")
+        return True
+
+    async def watch(self, interval=POLL_SECONDS):
+        # Reloads only when two polls in a row see the same change, so a file
+        # being rewritten or a burst of journal appends costs one reload.
+        loop = asyncio.get_running_loop()
+        seen = None
+        while True:
+            await asyncio.sleep(interval)
+            found = await loop.run_in_executor(None, self.changed_files)
+            if not found or found != seen:
+                seen = found
+                continue
+            seen = None
+            await self.reload()
+
+    def due(self, params):
+        due = self.notebook.daily_problems()
+        subject_name = params.get("subject")
+        if subject_name is not None:
+            if self.notebook.find_subject(subject_name) is None:
+                raise QueryError(404, f"没有主题: {subject_name}")
+            due = [(problem, subject) for problem, subject in due if subject.name == subject_name]
+        limit = limit_param(params, len(due))
+        return {"date": days.to_text(self.today), "total": len(due),
+                "problems": [problem_json(problem, subject) for problem, subject in due[:limit]]}
+
+    def subject_summaries(self, params):
+        _, rows = self.notebook.forecast(FORECAST_DAYS)
+        counts = dict(rows)
+        summaries = []
+        for subject in self.notebook.subjects:
+            stats = self.notebook.aggregates.stats[subject.name]
+            upcoming = counts.get(subject.name)
+            summaries.append({"name": subject.name, "ers": subject.ers_score, "mastery": stats.mastery(),
+                              "problems": len(subject.problems), "concepts": len(subject.concepts),
+                              "confident": stats.confident, "due_today": upcoming[0] if upcoming else 0,
+                              f"due_{FORECAST_DAYS}_days": upcoming[-1] if upcoming else 0,
+                              "exam_scores": list(subject.practice_exam_scores)})
+        return {"date": days.to_text(self.today), "subjects": summaries}
+
+    def search(self, params):
+        text = params.get("q", "").strip()
+        if not text:
+            raise QueryError(400, "缺少查询参数 q")
+        total, results = self.notebook.search(text, limit_param(params))
+        return {"query": text, "total": total,
+                "problems": [problem_json(problem, subject) for problem, subject in results]}
+
+    def stats(self, params):
+        total, _ = self.notebook.forecast(FORECAST_DAYS)
+        aggregates = self.notebook.aggregates
+        return {"date": days.to_text(self.today), "subjects": len(aggregates.stats),
+                "problems": aggregates.total_problems, "average_ers": round(aggregates.average_ers(), 2),
+                "due_today": total[0], f"due_{FORECAST_DAYS}_days": total[-1],
+                "data_file": str(self.notebook.data_file),
+                "loaded_at": time.strftime("%Y-%m-%d %H:%M:%S", time.localtime(self.loaded_at))}
+
+    def respond(self, target):
+        # Returns (status, body) for a GET of `target`, from the cache when
+        # the data set and the day are unchanged since it was encoded.
+        today = days.today()
+        if today != self.today:
+            self.today = today
+            self.responses.clear()
+        with metrics.span("query") as span:
+            cached = self.responses.get(target)
+            span.count("cache_hit", cached is not None)
+            if cached is not None:
+                self.responses.move_to_end(target)
+                return 200, cached
+            url = urlsplit(target)
+            handler = self.routes.get(url.path.rstrip("/") or "/")
+            if handler is None:
+                return 404, error_body(f"没有这个接口: {url.path}")
+            params = {key: values[-1] for key, values in parse_qs(url.query).items()}
+            try:
+                body = encode_body(handler(params))
+            except QueryError as e:
+                return e.status, error_body(str(e))
+            self.responses[target] = body
+            if len(self.responses) > RESPONSE_CACHE_SIZE:
+                self.responses.popitem(last=False)
+            return 200, body
+
+    async def handle(self, reader, writer):
+        try:
+            while True:
+                try:
+                    line = await asyncio.wait_for(reader.readline(), IDLE_TIMEOUT)
+                except asyncio.TimeoutError:
+                    break
+                if not line:
+                    break
+                headers = await read_headers(reader)
+                parts = line.decode("latin-1").split()
+                if len(parts) != 3 or headers is None:
+                    await send(writer, 400, error_body("请求格式错误"), keep_alive=False)
+                    break
+                method, target, version = parts
+                keep_alive = version == "HTTP/1.1" and headers.get("connection", "").lower() != "close"
+                if self.check_host and request_host(headers.get("host", "")) not in LOCAL_HOSTS:
+                    status, body, extra = 403, error_body("只接受本机请求"), ()
+                elif method not in ("GET", "HEAD"):
+                    status, body, extra = 405, error_body("只支持 GET"), (("Allow", "GET, HEAD"),)
+                else:
+                    status, body = self.respond(target)
+                    etag = f'"{self.generation}-{self.today}"'
+                    extra = (("ETag", etag), ("Cache-Control", "no-cache")) if status == 200 else ()
+                    if status == 200 and headers.get("if-none-match") == etag:
+                        status, body = 304, b""
+                await send(writer, status, body, keep_alive, extra, head=method == "HEAD")
+                if not keep_alive:
+                    break
+        except (ConnectionError, ValueError, asyncio.TimeoutError):
+            # A client hung up mid-request, sent an oversized line or stalled
+            # partway through its headers.
+            pass
+        finally:
+            writer.close()
+
+    async def serve(self, host=DEFAULT_HOST, port=DEFAULT_PORT, unix=None):
+        if unix:
+            server = await asyncio.start_unix_server(self.handle, unix)
+            address = unix
+        else:
+            server = await asyncio.start_server(self.handle, host, port)
+            address = "http://" + ", ".join(f"{s.getsockname()[0]}:{s.getsockname()[1]}" for s in server.sockets)
+        print(f"查询服务已启动: {address}（{self.notebook.aggregates.total_problems} 道题，Ctrl+C 退出）")
+        watcher = asyncio.create_task(self.watch())
+        try:
+            async with server:
+                await server.serve_forever()
+        finally:
+            watcher.cancel()
+
+
+def encode_body(document):
+    return json.dumps(document, ensure_ascii=False, separators=(",", ":")).encode("utf-8")
+
+
+def error_body(message):
+    return encode_body({"error": message})
+
+
+async def read_headers(reader):
+    # {lowercase name: value}, or None when there are too many.
+    headers = {}
+    for _ in range(MAX_HEADERS):
+        line = await asyncio.wait_for(reader.readline(), IDLE_TIMEOUT)
+        if line in (b"\r\n", b"\n", b""):
+            return headers
+        name, _, value = line.decode("latin-1").partition(":")
+        headers[name.strip().lower()] = value.strip()
+    return None
+
+
+async def send(writer, status, body, keep_alive, extra=(), head=False):
+    lines = [f"HTTP/1.1 {status} {REASONS[status]}", "Content-Type: application/json; charset=utf-8",
+             f"Content-Length: {len(body)}", "Connection: " + ("keep-alive" if keep_alive else "close")]
+    lines.extend(f"{name}: {value}" for name, value in extra)
+    writer.write(("\r\n".join(lines) + "\r\n\r\n").encode("latin-1") + (b"" if head else body))
+    await writer.drain()
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="本地只读查询服务：以 JSON 提供今日待复习、主题统计和搜索")
+    parser.add_argument("--data-file", help="任务数据文件路径（默认读取设置）")
+    parser.add_argument("--profile", help="使用的数据档案名称（默认读取设置）")
+    parser.add_argument("--host", default=DEFAULT_HOST, help=f"监听地址（默认 {DEFAULT_HOST}）")
+    parser.add_argument("--port", type=int, default=DEFAULT_PORT, help=f"监听端口（默认 {DEFAULT_PORT}）")
+    parser.add_argument("--unix", metavar="PATH", help="改为监听 Unix 套接字")
+    args = parser.parse_args(argv)
+    if args.unix and not hasattr(asyncio, "start_unix_server"):
+        parser.error("此系统不支持 Unix 套接字")
+
+    notebook = Notebook()
+    notebook.load_settings()
+    if args.profile:
+        if args.profile not in notebook.profiles:
+            parser.error(f"没有数据档案: {args.profile}")
+        notebook.profile = args.profile
+        notebook.data_file = notebook.profiles[args.profile]["data_file"]
+    if args.data_file:
+        notebook.data_file = args.data_file
+    if not Path(notebook.data_file).is_file():
+        print(f"数据文件不存在: {notebook.data_file}")
+        notebook.shutdown()
+        return 1
+    try:
+        try:
+            notebook.attach_dataset(notebook.read_dataset())
+        except Exception as e:
+            print(f"加载数据失败: {e}")
+            return 1
+        server = QueryServer(notebook, check_host=not args.unix)
+        try:
+            asyncio.run(server.serve(args.host, args.port, args.unix))
+        except KeyboardInterrupt:
+            pass
+    finally:
+        notebook.shutdown()
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
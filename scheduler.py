@@ -0,0 +1,109 @@
+import days
+
+# --- Spaced-repetition scheduling ---
+#
+# interval_days() is the per-problem rule; next_intervals() applies the same
+# rule to whole arrays at once (vectorized with NumPy when it is installed) so a
+# subject can be re-planned in one pass when its ERS moves.
+#
+# With a daily capacity set, callers pass a `place(problem, ideal, interval)`
+# hook that may move the ideal day within tolerance_days() of it to a lighter
+# day (see indexes.DueIndex.place).
+
+BASE_INTERVALS = (1, 2, 4, 7, 15, 30, 60)
+LOAD_TOLERANCE = 0.2
+
+_numpy = None
+
+
+def _load_numpy():
+    # NumPy is optional and slow to import, so it is only loaded for the first
+    # batch computation rather than at startup.
+    global _numpy
+    if _numpy is None:
+        try:
+            import numpy
+            _numpy = numpy
+        except ImportError:
+            _numpy = False
+    return _numpy
+
+
+def interval_days(review_count, confidence, ers):
+    interval = BASE_INTERVALS[min(review_count, len(BASE_INTERVALS) - 1)]
+    if ers > 0:
+        ers_factor = min(1.5, max(0.5, 100 / ers))
+        interval *= ers_factor
+    if confidence >= 4:
+        interval *= 1.5
+    elif confidence <= 2:
+        interval *= 0.7
+    return max(1, int(round(interval)))
+
+
+def next_intervals(review_counts, confidences, ers_scores):
+    np = _load_numpy()
+    if not np:
+        return [interval_days(n, c, e) for n, c, e in zip(review_counts, confidences, ers_scores)]
+    counts = np.asarray(review_counts, dtype=np.int64)
+    confidences = np.asarray(confidences, dtype=np.int64)
+    ers = np.broadcast_to(np.asarray(ers_scores, dtype=np.float64), counts.shape)
+    base = np.asarray(BASE_INTERVALS, dtype=np.float64)
+    interval = base[np.minimum(counts, len(BASE_INTERVALS) - 1)]
+    ers_factor = np.clip(np.divide(100.0, ers, out=np.ones_like(ers), where=ers > 0), 0.5, 1.5)
+    interval = interval * np.where(ers > 0, ers_factor, 1.0)
+    interval = interval * np.where(confidences >= 4, 1.5, np.where(confidences <= 2, 0.7, 1.0))
+    return np.maximum(1, np.rint(interval)).astype(np.int64).tolist()
+
+
+def tolerance_days(interval, fraction=LOAD_TOLERANCE):
+    return max(1, int(round(interval * fraction)))
+
+
+def schedule_problem(problem, confidence, ers, today=None, place=None):
+    today = today or days.today()
+    interval = interval_days(len(problem.completed_reviews), confidence, ers)
+    ideal = today + interval
+    problem.next_review = ideal if place is None else place(problem, ideal, interval)
+    problem.completed_reviews.append(today)
+
+
+def reschedule_subject(subject, today=None, place=None):
+    # Re-plans every problem from its last completed review using the subject's
+    # current ERS. Returns the problems whose next review date changed.
+    today = today or days.today()
+    problems = list(subject.problems.values())
+    if not problems:
+        return []
+    counts, confidences, bases = [], [], []
+    for problem in problems:
+        completed = problem.completed_reviews
+        counts.append(max(len(completed) - 1, 0))
+        confidences.append(problem.confidence)
+        bases.append(completed[-1] if completed else today)
+    intervals = next_intervals(counts, confidences, [subject.ers_score] * len(problems))
+    changed = []
+    for problem, base, interval in zip(problems, bases, intervals):
+        next_day = base + interval if place is None else place(problem, base + interval, interval)
+        if problem.next_review != next_day:
+            problem.next_review = next_day
+            changed.append(problem)
+    return changed
+
+
+def spread_backlog(backlog, capacity, load_at, today=None):
+    # One pass over the due pile, most urgent first (lowest confidence, then
+    # longest overdue): the first `capacity` stay due today and the rest fill
+    # the following days up to capacity. load_at(day) is the load already
+    # planned for that day. Returns [(problem, subject, day)] to move.
+    today = today or days.today()
+    backlog = sorted(backlog, key=lambda entry: (entry[0].confidence, entry[0].next_review))
+    moves, day, room = [], today, capacity
+    for problem, subject in backlog:
+        while room <= 0:
+            day += 1
+            room = capacity - load_at(day)
+        room -= 1
+        if day != today:
+            moves.append((problem, subject, day))
+    return moves
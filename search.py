@@ -0,0 +1,224 @@
+import itertools
+import operator
+import re
+import threading
+import unicodedata
+from array import array
+from operator import itemgetter
+
+# --- Search index over problems and concepts ---
+#
+# Chinese has no word boundaries, so descriptions and tags are indexed as
+# single characters plus overlapping bigrams (the same scheme also gives
+# substring matches on codes such as "P301-15"). One- and two-character terms
+# are answered straight from their posting; longer terms intersect their
+# bigrams and confirm candidates with a plain substring test. Exact
+# subject/skill tags have their own index for "#tag" filters.
+#
+# Query syntax: free words, "#洛必达法则" for an exact tag and a confidence
+# filter such as "信心<=2" (also "c<=2", "confidence>=4").
+
+RESULT_LIMIT = 500
+REBUILD_MIN_DEAD = 1000
+POSTING_TYPECODE = "I"
+
+_CONFIDENCE_FILTER = re.compile(r"(?:^|(?<=\s))(?:信心|confidence|conf|c)\s*(<=|>=|≤|≥|<|>|=)\s*(\d)", re.IGNORECASE)
+_COMPARE = {"<=": operator.le, "≤": operator.le, ">=": operator.ge, "≥": operator.ge, "<": operator.lt,
+            ">": operator.gt, "=": operator.eq}
+
+
+def normalize(text):
+    # Full-width letters/digits fold to ASCII, and matching is case-insensitive.
+    return unicodedata.normalize("NFKC", text).casefold()
+
+
+def bigrams(text):
+    return {text[i:i + 2] for i in range(len(text) - 1)}
+
+
+def ngrams(text):
+    return set(text) | bigrams(text)
+
+
+class Query:
+    def __init__(self, terms=(), tags=(), confidence=None):
+        self.terms = list(terms)
+        self.tags = list(tags)
+        self.confidence = confidence
+
+    def __bool__(self):
+        return bool(self.terms or self.tags or self.confidence)
+
+    def accepts_confidence(self, value):
+        if self.confidence is None:
+            return True
+        compare, bound = self.confidence
+        return compare(value, bound)
+
+
+def parse_query(text):
+    confidence = None
+    match = None
+    for match in _CONFIDENCE_FILTER.finditer(text):
+        confidence = (_COMPARE[match.group(1)], int(match.group(2)))
+    if match is not None:
+        text = _CONFIDENCE_FILTER.sub(" ", text)
+    terms, tags = [], []
+    for word in text.split():
+        if word.startswith("#") and len(word) > 1:
+            tags.append(normalize(word[1:]))
+        else:
+            terms.append(normalize(word))
+    return Query(terms, tags, confidence)
+
+
+class SearchIndex:
+    # Documents get sequential numbers and postings are append-only
+    # array('I') lists of them (4 bytes per entry instead of a set slot).
+    # Removing a document only drops it from its confidence group; every
+    # query ends with a group intersection, which filters the stale numbers
+    # out, and the index is rebuilt once they outnumber the live ones.
+    # Built on first use or by ensure_built() on a background thread; until
+    # then add/remove are no-ops because the build picks the change up. The
+    # build snapshots the catalog under the lock, so edits made meanwhile wait
+    # and are applied on top.
+
+    def __init__(self):
+        self.lock = threading.RLock()
+        self.source = ()
+        self.built = False
+        self.ids = {}
+        self.docs = []
+        self.texts = []
+        self.grams = {}
+        self.tags = {}
+        self.levels = {}
+        self.concepts = set()
+        self.dead = 0
+
+    def reset(self, subjects):
+        with self.lock:
+            self.source = subjects
+            self.built = False
+            for index in (self.ids, self.grams, self.tags, self.levels):
+                index.clear()
+            self.docs = []
+            self.texts = []
+            self.concepts.clear()
+            self.dead = 0
+
+    def ensure_built(self):
+        with self.lock:
+            if self.built:
+                return
+            self.built = True
+            for subject in list(self.source):
+                for problem in list(subject.problems.values()):
+                    self._add(problem, subject)
+                for concept in list(subject.concepts):
+                    self._add(concept, subject)
+
+    def _group(self, item):
+        confidence = getattr(item, "confidence", None)
+        if confidence is None:
+            return self.concepts
+        return self.levels.setdefault(confidence, set())
+
+    def add(self, item, subject):
+        with self.lock:
+            if self.built:
+                self._add(item, subject)
+
+    def _add(self, item, subject):
+        if id(item) in self.ids:
+            self._remove(item)
+        number = len(self.docs)
+        fields = [normalize(t) for t in (*item.subjects, *item.skills)]
+        text = "\n".join([normalize(getattr(item, "description", ""))] + fields)
+        self.ids[id(item)] = number
+        self.docs.append((getattr(item, "description", ""), item, subject))
+        self.texts.append(text)
+        for gram in ngrams(text):
+            posting = self.grams.get(gram)
+            if posting is None:
+                posting = self.grams[gram] = array(POSTING_TYPECODE)
+            posting.append(number)
+        for tag in set(fields):
+            posting = self.tags.get(tag)
+            if posting is None:
+                posting = self.tags[tag] = array(POSTING_TYPECODE)
+            posting.append(number)
+        self._group(item).add(number)
+
+    def remove(self, item):
+        with self.lock:
+            if self.built:
+                self._remove(item)
+
+    def _remove(self, item):
+        number = self.ids.pop(id(item), None)
+        if number is None:
+            return
+        self._group(item).discard(number)
+        self.docs[number] = None
+        self.texts[number] = None
+        self.dead += 1
+        if self.dead > REBUILD_MIN_DEAD and self.dead > len(self.ids):
+            self.reset(self.source)
+
+    def change_confidence(self, item, old_confidence, new_confidence):
+        with self.lock:
+            number = self.ids.get(id(item)) if self.built else None
+            if number is None:
+                return
+            self.levels.get(old_confidence, set()).discard(number)
+            self.levels.setdefault(new_confidence, set()).add(number)
+
+    def _candidates(self, query):
+        postings = [self.tags.get(tag, ()) for tag in query.tags]
+        for term in query.terms:
+            grams = (term,) if len(term) <= 2 else bigrams(term)
+            postings.extend(self.grams.get(gram, ()) for gram in grams)
+        if not postings:
+            return None
+        postings.sort(key=len)
+        candidates = set(postings[0])
+        for posting in postings[1:]:
+            if not candidates:
+                break
+            candidates.intersection_update(posting)
+        return candidates
+
+    def search(self, query, limit=RESULT_LIMIT, problems_only=False):
+        # Returns (total, [(item, subject), ...]) with at most `limit` entries,
+        # lowest confidence first, then by description within what is shown.
+        # Concepts come last and only match queries without a confidence filter.
+        if isinstance(query, str):
+            query = parse_query(query)
+        if not query:
+            return 0, []
+        with self.lock:
+            self.ensure_built()
+            return self._search(query, limit, problems_only)
+
+    def _search(self, query, limit, problems_only):
+        candidates = self._candidates(query)
+        checks = [term for term in query.terms if len(term) > 2]
+        groups = [self.levels[c] for c in sorted(self.levels) if query.accepts_confidence(c)]
+        if not problems_only and query.confidence is None:
+            groups.append(self.concepts)
+        texts, docs = self.texts, self.docs
+        total, results = 0, []
+        for group in groups:
+            keys = group if candidates is None else candidates & group
+            for term in checks:
+                keys = [n for n in keys if term in texts[n]]
+            total += len(keys)
+            room = limit - len(results)
+            if room <= 0 or not keys:
+                continue
+            # Past the limit only the count matters, so an overfull level is cut
+            # before sorting rather than ranked in full.
+            picked = sorted((docs[n] for n in itertools.islice(keys, room)), key=itemgetter(0))
+            results.extend((item, subject) for _, item, subject in picked)
+        return total, results
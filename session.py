@@ -0,0 +1,63 @@
+# --- Batch review session ---
+#
+# Steps through a fixed list of due problems and queues each rating or
+# deletion in memory; nothing touches the data set until commit(), which hands
+# the queue to Notebook.commit_reviews() in one go. Only queued actions can be
+# undone, so a checkpoint commit also fixes everything before it.
+
+DELETE = 0
+CHECKPOINT_EVERY = 25
+
+
+class ReviewSession:
+    def __init__(self, notebook, entries, checkpoint_every=CHECKPOINT_EVERY):
+        self.notebook = notebook
+        self.entries = list(entries)
+        self.checkpoint_every = checkpoint_every
+        self.position = 0
+        self.pending = []
+        self.committed = 0
+
+    def __len__(self):
+        return len(self.entries)
+
+    @property
+    def finished(self):
+        return self.position >= len(self.entries)
+
+    def current(self):
+        return None if self.finished else self.entries[self.position]
+
+    def counts(self):
+        deletions = sum(1 for _, _, action in self.pending if action == DELETE)
+        return len(self.pending) - deletions, deletions
+
+    def rate(self, confidence):
+        self._queue(confidence)
+
+    def delete(self):
+        self._queue(DELETE)
+
+    def _queue(self, action):
+        if self.finished:
+            return
+        problem, subject = self.entries[self.position]
+        self.pending.append((problem, subject, action))
+        self.position += 1
+        if len(self.pending) >= self.checkpoint_every:
+            self.commit()
+
+    def undo(self):
+        if not self.pending:
+            return False
+        self.pending.pop()
+        self.position -= 1
+        return True
+
+    def commit(self):
+        if not self.pending:
+            return 0
+        applied = self.notebook.commit_reviews(self.pending)
+        self.committed += applied
+        self.pending = []
+        return applied
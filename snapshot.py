@@ -0,0 +1,139 @@
+import gzip
+import json
+import os
+import struct
+import time
+
+from days import to_text, json_default
+
+# --- Snapshot file formats ---
+#
+# The data file is either the original indented JSON or a binary snapshot:
+# an 8-byte header (magic, format version, codec, reserved) followed by the
+# same document as compact UTF-8 JSON, stored as is or compressed with gzip
+# or zstd. Loading goes by the magic bytes, never the file name, so switching
+# formats keeps the configured data_file. zstd needs the optional zstandard
+# package; without it zstd snapshots are written with gzip instead.
+#
+# After a save, the new snapshot is also written to "<data_file>.backups/"
+# under a timestamped name, at most once per BACKUP_EVERY seconds, keeping the
+# newest BACKUP_COUNT.
+
+MAGIC = b"ERSB"
+FORMAT_VERSION = 1
+HEADER = struct.Struct("<4sBBxx")
+CODECS = {"binary": 0, "gzip": 1, "zstd": 2}
+SNAPSHOT_FORMATS = ("json",) + tuple(CODECS)
+DEFAULT_FORMAT = "json"
+GZIP_LEVEL = 6
+ZSTD_LEVEL = 3
+
+BACKUP_SUFFIX = ".backups"
+BACKUP_STAMP = "%Y%m%d-%H%M%S"
+BACKUP_COUNT = 5
+BACKUP_EVERY = 3600
+
+_zstd = None
+
+
+def _load_zstd():
+    global _zstd
+    if _zstd is None:
+        try:
+            import zstandard
+            _zstd = zstandard
+        except ImportError:
+            _zstd = False
+    return _zstd
+
+
+def effective_format(snapshot_format):
+    return "gzip" if snapshot_format == "zstd" and not _load_zstd() else snapshot_format
+
+
+def encode(document, snapshot_format=DEFAULT_FORMAT):
+    if snapshot_format == "json":
+        return json.dumps(document, ensure_ascii=False, indent=2, default=json_default).encode("utf-8")
+    if snapshot_format not in CODECS:
+        raise ValueError(f"未知的数据格式: {snapshot_format}")
+    body = json.dumps(document, ensure_ascii=False, separators=(",", ":"), default=json_default).encode("utf-8")
+    snapshot_format = effective_format(snapshot_format)
+    if snapshot_format == "gzip":
+        body = gzip.compress(body, GZIP_LEVEL, mtime=0)
+    elif snapshot_format == "zstd":
+        body = _zstd.ZstdCompressor(level=ZSTD_LEVEL, write_checksum=True).compress(body)
+    return HEADER.pack(MAGIC, FORMAT_VERSION, CODECS[snapshot_format]) + body
+
+
+def decode(data):
+    if not data.startswith(MAGIC):
+        return json.loads(data)
+    _, version, codec = HEADER.unpack_from(data)
+    if version > FORMAT_VERSION:
+        raise ValueError(f"数据文件格式 v{version} 比本程序支持的 v{FORMAT_VERSION} 新，请升级程序")
+    body = memoryview(data)[HEADER.size:]
+    if codec == CODECS["gzip"]:
+        body = gzip.decompress(body)
+    elif codec == CODECS["zstd"]:
+        if not _load_zstd():
+            raise ValueError("数据文件使用 zstd 压缩，请先安装 zstandard")
+        body = _zstd.ZstdDecompressor().decompress(body)
+    elif codec != CODECS["binary"]:
+        raise ValueError(f"未知的压缩方式: {codec}")
+    return json.loads(bytes(body))
+
+
+def detect_format(data):
+    # Name of the format the bytes were written in, for display.
+    if not data.startswith(MAGIC):
+        return "json"
+    codec = data[len(MAGIC) + 1]
+    return next((name for name, value in CODECS.items() if value == codec), "unknown")
+
+
+def backup_folder(data_file):
+    return data_file.with_name(data_file.name + BACKUP_SUFFIX)
+
+
+def backup_snapshot(data_file, data, keep=BACKUP_COUNT, every=BACKUP_EVERY, now=None):
+    # Returns the backup written, or None when the newest one is recent enough.
+    if keep <= 0:
+        return None
+    now = time.time() if now is None else now
+    folder = backup_folder(data_file)
+    prefix, suffix = data_file.stem + ".", data_file.suffix
+    existing = sorted(p for p in folder.glob(f"{prefix}*{suffix}")) if folder.is_dir() else []
+    if existing and existing[-1].name[len(prefix):] > time.strftime(BACKUP_STAMP, time.localtime(now - every)):
+        return None
+    folder.mkdir(exist_ok=True)
+    backup = folder / f"{prefix}{time.strftime(BACKUP_STAMP, time.localtime(now))}{suffix}"
+    tmp_file = backup.with_name(backup.name + ".tmp")
+    with open(tmp_file, "wb") as f:
+        f.write(data)
+    os.replace(tmp_file, backup)
+    if backup not in existing:
+        existing.append(backup)
+    for old in existing[:-keep]:
+        try:
+            old.unlink()
+        except OSError as e:
+            print(f"删除旧备份失败: {e}")
+    return backup
+
+
+def export_document(subjects):
+    # Readable JSON for other tools: dates as YYYY-MM-DD in the schema v1
+    # shape, which the loader migrates back to v2 if the export is opened as
+    # a data file.
+    exported = []
+    for subject in subjects:
+        subject = dict(subject)
+        problems = []
+        for problem in subject.get("problems", []):
+            problem = dict(problem)
+            problem["review_dates"] = [to_text(day) for day in problem.get("review_dates", [])]
+            problem["completed_reviews"] = [{"date": to_text(day)} for day in problem.get("completed_reviews", [])]
+            problems.append(problem)
+        subject["problems"] = problems
+        exported.append(subject)
+    return {"schema_version": 1, "subjects": exported}
@@ -0,0 +1,295 @@
+import argparse
+import json
+import sqlite3
+from pathlib import Path
+
+from days import history, json_default
+from model import PROBLEM_KEYS, SUBJECT_KEYS
+from storage import JournalStore, SCHEMA_VERSION, migrate_subjects
+
+# --- SQLite storage backend ---
+#
+# Same interface as storage.JournalStore (load / save / append), but journal
+# records are applied as row-level statements, so rating a problem is a single
+# UPDATE instead of a rewrite of the whole dataset. Selected by open_store()
+# when the data file has one of SQLITE_SUFFIXES. Review days are stored as
+# INTEGER day ordinals; databases written before schema v2 (TEXT dates) are
+# read in the old shape and rebuilt by the first save after migration.
+# Keys a subject or problem has beyond its columns (see model.py) go to a JSON
+# `extra` column, added in place to databases created without it.
+
+TABLES = ("concepts", "exam_scores", "completed_reviews", "problems", "subjects")
+
+SCHEMA = """
+    CREATE TABLE IF NOT EXISTS subjects (
+        id INTEGER PRIMARY KEY,
+        name TEXT NOT NULL,
+        created TEXT,
+        daily_note TEXT NOT NULL DEFAULT '',
+        ers_score REAL NOT NULL DEFAULT 0,
+        extra TEXT
+    );
+    CREATE UNIQUE INDEX IF NOT EXISTS idx_subjects_name ON subjects(name);
+    CREATE TABLE IF NOT EXISTS problems (
+        id INTEGER PRIMARY KEY,
+        subject_id INTEGER NOT NULL REFERENCES subjects(id) ON DELETE CASCADE,
+        position INTEGER NOT NULL,
+        description TEXT NOT NULL,
+        confidence INTEGER NOT NULL DEFAULT 1,
+        subjects TEXT NOT NULL DEFAULT '[]',
+        skills TEXT NOT NULL DEFAULT '[]',
+        next_review INTEGER,
+        extra TEXT,
+        UNIQUE (subject_id, description)
+    );
+    CREATE INDEX IF NOT EXISTS idx_problems_next_review ON problems(next_review);
+    CREATE TABLE IF NOT EXISTS completed_reviews (
+        problem_id INTEGER NOT NULL REFERENCES problems(id) ON DELETE CASCADE,
+        seq INTEGER NOT NULL,
+        day INTEGER NOT NULL,
+        PRIMARY KEY (problem_id, seq)
+    ) WITHOUT ROWID;
+    CREATE TABLE IF NOT EXISTS exam_scores (
+        subject_id INTEGER NOT NULL REFERENCES subjects(id) ON DELETE CASCADE,
+        seq INTEGER NOT NULL,
+        score REAL NOT NULL,
+        PRIMARY KEY (subject_id, seq)
+    ) WITHOUT ROWID;
+    CREATE TABLE IF NOT EXISTS concepts (
+        id INTEGER PRIMARY KEY,
+        subject_id INTEGER NOT NULL REFERENCES subjects(id) ON DELETE CASCADE,
+        position INTEGER NOT NULL,
+        body TEXT NOT NULL
+    );
+"""
+
+
+class SqliteStore:
+    needs_compaction = False
+
+    def __init__(self, data_file, read_only=False):
+        self.data_file = Path(data_file)
+        if read_only:
+            # mode=ro fails on a missing file instead of creating it, and
+            # the schema script is skipped; load() is all this is used for.
+            self.conn = sqlite3.connect(self.data_file.resolve().as_uri() + "?mode=ro", uri=True,
+                                        check_same_thread=False)
+        else:
+            self.conn = sqlite3.connect(str(self.data_file), check_same_thread=False)
+            self.conn.execute("PRAGMA foreign_keys = ON")
+            fresh = not self._columns("completed_reviews")
+            self.conn.executescript(SCHEMA)
+            if fresh:
+                self.conn.execute(f"PRAGMA user_version = {SCHEMA_VERSION}")
+            for table in ("subjects", "problems"):
+                if "extra" not in self._columns(table):
+                    self.conn.execute(f"ALTER TABLE {table} ADD COLUMN extra TEXT")
+        self.data_version = self._data_version()
+        self.written = []
+
+    @property
+    def files(self):
+        return self.data_file,
+
+    def take_written(self):
+        # Page bytes cannot be predicted, so writes are reported as "unknown"
+        # unless another connection committed since our last write.
+        written, self.written = self.written, []
+        return written
+
+    def _data_version(self):
+        # Only changes when another connection commits.
+        return self.conn.execute("PRAGMA data_version").fetchone()[0]
+
+    def _note_write(self):
+        version = self._data_version()
+        self.written.append(("unknown" if version == self.data_version else "foreign", self.data_file))
+        self.data_version = version
+
+    def close(self):
+        self.conn.close()
+
+    @property
+    def schema_version(self):
+        version = self.conn.execute("PRAGMA user_version").fetchone()[0]
+        if version < SCHEMA_VERSION and "day" in self._columns("completed_reviews"):
+            # Created from the current SCHEMA but never stamped (a new file
+            # that was only appended to); its rows are already current.
+            return SCHEMA_VERSION
+        return version
+
+    def _columns(self, table):
+        return {row[1] for row in self.conn.execute(f"PRAGMA table_info({table})")}
+
+    def load(self):
+        legacy = self.schema_version < 2
+        # A read-only connection may see a file from before the column.
+        subject_extra = "extra" if "extra" in self._columns("subjects") else "NULL"
+        problem_extra = "extra" if "extra" in self._columns("problems") else "NULL"
+        subjects = []
+        by_id = {}
+        for sid, name, created, daily_note, ers_score, extra in self.conn.execute(
+                f"SELECT id, name, created, daily_note, ers_score, {subject_extra} FROM subjects ORDER BY id"):
+            subject = json.loads(extra) if extra else {}
+            subject.update(name=name, created=created, daily_note=daily_note, practice_exam_scores=[],
+                           ers_score=_as_number(ers_score), problems=[], concepts=[])
+            by_id[sid] = subject
+            subjects.append(subject)
+        for sid, score in self.conn.execute("SELECT subject_id, score FROM exam_scores ORDER BY subject_id, seq"):
+            by_id[sid]["practice_exam_scores"].append(_as_number(score))
+        problems = {}
+        for pid, sid, description, confidence, subs, skills, next_review, extra in self.conn.execute(
+                f"SELECT id, subject_id, description, confidence, subjects, skills, next_review, {problem_extra} "
+                "FROM problems ORDER BY subject_id, position"):
+            problem = json.loads(extra) if extra else {}
+            problem.update(description=description, confidence=confidence, subjects=json.loads(subs),
+                           skills=json.loads(skills), review_dates=[next_review] if next_review else [],
+                           completed_reviews=[] if legacy else history())
+            problems[pid] = problem
+            by_id[sid]["problems"].append(problem)
+        day_column = "date" if legacy else "day"
+        for pid, day in self.conn.execute(
+                f"SELECT problem_id, {day_column} FROM completed_reviews ORDER BY problem_id, seq"):
+            problems[pid]["completed_reviews"].append({"date": day} if legacy else day)
+        for sid, body in self.conn.execute("SELECT subject_id, body FROM concepts ORDER BY subject_id, position"):
+            by_id[sid]["concepts"].append(json.loads(body))
+        return subjects
+
+    # load() has no side effects here, so it doubles as the read-only reload.
+    read = load
+
+    def save(self, subjects):
+        with self.conn:
+            if self.schema_version < SCHEMA_VERSION:
+                self._create_tables()
+            else:
+                self.conn.execute("DELETE FROM subjects")
+            for subject in subjects:
+                sid = self._put_subject(subject)
+                for position, problem in enumerate(subject.get("problems", [])):
+                    self._put_problem(sid, problem, position)
+                for position, concept in enumerate(subject.get("concepts", [])):
+                    self.conn.execute("INSERT INTO concepts (subject_id, position, body) VALUES (?, ?, ?)",
+                                      (sid, position, json.dumps(concept, ensure_ascii=False)))
+            self.conn.execute(f"PRAGMA user_version = {SCHEMA_VERSION}")
+        self._note_write()
+
+    def append(self, *records):
+        with self.conn:
+            for record in records:
+                self._apply(record)
+        self._note_write()
+
+    def _create_tables(self):
+        # Runs inside save()'s transaction, so statements go one by one rather
+        # than through executescript(), which would commit first.
+        for table in TABLES:
+            self.conn.execute(f"DROP TABLE IF EXISTS {table}")
+        for statement in SCHEMA.split(";"):
+            if statement.strip():
+                self.conn.execute(statement)
+
+    def _subject_id(self, name):
+        row = self.conn.execute("SELECT id FROM subjects WHERE name = ?", (name,)).fetchone()
+        return row[0] if row else None
+
+    def _problem_id(self, sid, description):
+        row = self.conn.execute("SELECT id FROM problems WHERE subject_id = ? AND description = ?",
+                                (sid, description)).fetchone()
+        return row[0] if row else None
+
+    def _put_subject(self, subject):
+        self.conn.execute(
+            "INSERT INTO subjects (name, created, daily_note, ers_score, extra) VALUES (?, ?, ?, ?, ?) "
+            "ON CONFLICT(name) DO UPDATE SET created = excluded.created, daily_note = excluded.daily_note, "
+            "ers_score = excluded.ers_score, extra = excluded.extra",
+            (subject["name"], subject.get("created"), subject.get("daily_note", ""), subject.get("ers_score", 0),
+             _extra_json(subject, SUBJECT_KEYS)))
+        sid = self._subject_id(subject["name"])
+        self.conn.execute("DELETE FROM exam_scores WHERE subject_id = ?", (sid,))
+        self.conn.executemany("INSERT INTO exam_scores (subject_id, seq, score) VALUES (?, ?, ?)",
+                              [(sid, seq, score) for seq, score in
+                               enumerate(subject.get("practice_exam_scores", []))])
+        return sid
+
+    def _put_problem(self, sid, problem, position=None):
+        if position is None:
+            position = self.conn.execute("SELECT COALESCE(MAX(position) + 1, 0) FROM problems WHERE subject_id = ?",
+                                         (sid,)).fetchone()[0]
+        review_dates = problem.get("review_dates") or [None]
+        self.conn.execute(
+            "INSERT INTO problems (subject_id, position, description, confidence, subjects, skills, next_review, "
+            "extra) VALUES (?, ?, ?, ?, ?, ?, ?, ?) "
+            "ON CONFLICT(subject_id, description) DO UPDATE SET confidence = excluded.confidence, "
+            "subjects = excluded.subjects, skills = excluded.skills, next_review = excluded.next_review, "
+            "extra = excluded.extra",
+            (sid, position, problem["description"], problem.get("confidence", 1),
+             json.dumps(problem.get("subjects", []), ensure_ascii=False),
+             json.dumps(problem.get("skills", []), ensure_ascii=False), review_dates[0],
+             _extra_json(problem, PROBLEM_KEYS)))
+        pid = self._problem_id(sid, problem["description"])
+        self.conn.execute("DELETE FROM completed_reviews WHERE problem_id = ?", (pid,))
+        self.conn.executemany("INSERT INTO completed_reviews (problem_id, seq, day) VALUES (?, ?, ?)",
+                              [(pid, seq, day) for seq, day in enumerate(problem.get("completed_reviews", []))])
+
+    def _apply(self, record):
+        op = record.get("op")
+        if op == "put_subject":
+            self._put_subject(record["subject"])
+            return
+        sid = self._subject_id(record.get("subject"))
+        if sid is None:
+            return
+        if op == "put_problem":
+            self._put_problem(sid, record["problem"])
+        elif op == "review_problem":
+            pid = self._problem_id(sid, record["description"])
+            if pid is None:
+                return
+            review_dates = record["review_dates"] or [None]
+            self.conn.execute("UPDATE problems SET confidence = ?, next_review = ? WHERE id = ?",
+                              (record["confidence"], review_dates[0], pid))
+            count = record["review_count"]
+            self.conn.execute("DELETE FROM completed_reviews WHERE problem_id = ? AND seq >= ?",
+                              (pid, max(count - 1, 0)))
+            if record.get("completed") is not None:
+                self.conn.execute("INSERT INTO completed_reviews (problem_id, seq, day) VALUES (?, ?, ?)",
+                                  (pid, count - 1, record["completed"]))
+        elif op == "delete_problem":
+            self.conn.execute("DELETE FROM problems WHERE subject_id = ? AND description = ?",
+                              (sid, record["description"]))
+        elif op == "reschedule":
+            self.conn.executemany("UPDATE problems SET next_review = ? WHERE subject_id = ? AND description = ?",
+                                  [((dates or [None])[0], sid, description)
+                                   for description, dates in record["review_dates"].items()])
+
+
+def _as_number(value):
+    return int(value) if float(value).is_integer() else value
+
+
+def _extra_json(data, known):
+    extra = {k: v for k, v in data.items() if k not in known}
+    return json.dumps(extra, ensure_ascii=False, default=json_default) if extra else None
+
+
+def import_json(json_file, db_file):
+    # read() leaves the source untouched, even a torn journal tail.
+    source = JournalStore(json_file)
+    subjects = source.read()
+    migrate_subjects(subjects, source.schema_version)
+    store = SqliteStore(db_file)
+    try:
+        store.save(subjects)
+    finally:
+        store.close()
+    return subjects
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="将 JSON 题库一次性导入 SQLite 数据库")
+    parser.add_argument("json_file")
+    parser.add_argument("db_file")
+    args = parser.parse_args()
+    imported = import_json(args.json_file, args.db_file)
+    print(f"已导入 {len(imported)} 个主题，{sum(len(s['problems']) for s in imported)} 道题目到 {args.db_file}")
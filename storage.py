@@ -0,0 +1,303 @@
+import json
+import os
+from datetime import datetime, timedelta
+from pathlib import Path
+
+from days import to_day, history, json_default
+from snapshot import (encode, decode, detect_format, effective_format, backup_snapshot, DEFAULT_FORMAT,
+                      BACKUP_COUNT)
+
+# --- Journal-backed storage ---
+#
+# The data file is a snapshot of the subject list (JSON or one of the binary
+# formats in snapshot.py). Every mutation
+# is appended as one JSON line to "<data_file>.journal" and fsync'ed; on load
+# the journal tail is replayed over the snapshot. Records describe the
+# resulting state rather than the user action, so replaying a record twice
+# (e.g. after a crash between snapshot replace and journal truncation) is
+# harmless.
+
+SCHEMA_VERSION = 2
+JOURNAL_SUFFIX = ".journal"
+COMPACT_EVERY = 200
+SQLITE_SUFFIXES = (".db", ".sqlite", ".sqlite3")
+
+
+def is_sqlite_path(data_file):
+    return Path(data_file).suffix.lower() in SQLITE_SUFFIXES
+
+
+def open_store(data_file, snapshot_format=DEFAULT_FORMAT, backups=BACKUP_COUNT, read_only=False):
+    # read_only stores are only read() from (JournalStore.read never writes).
+    if is_sqlite_path(data_file):
+        from sqlite_store import SqliteStore
+        return SqliteStore(data_file, read_only=read_only)
+    return JournalStore(data_file, snapshot_format=snapshot_format, backups=backups)
+
+
+def split_tags(tags):
+    subjects, skills = [], []
+    for tag in tags:
+        if '-' in tag:
+            sub, sk = tag.split('-', 1)
+            subjects.append(sub.strip())
+            skills.append(sk.strip())
+        else:
+            subjects.append(tag.strip())
+    return subjects, skills
+
+
+def _migrate_tags(item):
+    if 'subjects' in item and 'skills' in item:
+        return
+    if 'tags' in item:
+        item['subjects'], item['skills'] = split_tags(item['tags'])
+        del item['tags']
+    else:
+        item['subjects'] = []
+        item['skills'] = []
+
+
+def _upgrade_to_1(subjects):
+    # Legacy list-only files: fill missing fields and split "主题-技巧" tags.
+    for subject in subjects:
+        for key, default in (('practice_exam_scores', []), ('ers_score', 0), ('daily_note', ""),
+                             ('problems', []), ('concepts', [])):
+            subject.setdefault(key, default)
+        for problem in subject.get("problems", []):
+            if 'review_dates' not in problem:
+                problem['review_dates'] = [(datetime.now() + timedelta(days=1)).strftime("%Y-%m-%d")]
+            problem.setdefault('completed_reviews', [])
+            if 'confidence' not in problem:
+                problem['confidence'] = problem.pop('mastery_level', 1)
+            _migrate_tags(problem)
+        for concept in subject.get("concepts", []):
+            _migrate_tags(concept)
+
+
+def _upgrade_to_2(subjects):
+    # "%Y-%m-%d" strings and {"date": ...} dicts become day ordinals.
+    for subject in subjects:
+        for problem in subject.get("problems", []):
+            problem['review_dates'] = [to_day(d) for d in problem.get('review_dates', [])]
+            problem['completed_reviews'] = history(to_day(r['date']) for r in problem.get('completed_reviews', []))
+
+
+# UPGRADES[n] upgrades data at schema version n to version n + 1.
+UPGRADES = [_upgrade_to_1, _upgrade_to_2]
+
+
+def migrate_subjects(subjects, version=0):
+    for upgrade in UPGRADES[version:SCHEMA_VERSION]:
+        upgrade(subjects)
+    return version < SCHEMA_VERSION
+
+
+# Record builders take model objects (model.py); records themselves are plain
+# dicts in the on-disk shape.
+
+def subject_record(subject):
+    return {"op": "put_subject", "subject": subject.meta_dict()}
+
+
+def problem_record(subject, problem):
+    return {"op": "put_problem", "subject": subject.name, "problem": problem.to_dict()}
+
+
+def review_record(subject, problem):
+    completed = problem.completed_reviews
+    return {
+        "op": "review_problem",
+        "subject": subject.name,
+        "description": problem.description,
+        "confidence": problem.confidence,
+        "review_dates": problem.review_dates,
+        "review_count": len(completed),
+        "completed": completed[-1] if completed else None
+    }
+
+
+def delete_record(subject, description):
+    return {"op": "delete_problem", "subject": subject.name, "description": description}
+
+
+def reschedule_record(subject, problems):
+    return {"op": "reschedule", "subject": subject.name,
+            "review_dates": {p.description: p.review_dates for p in problems}}
+
+
+def _find_subject(subjects, name):
+    return next((s for s in subjects if s.get('name') == name), None)
+
+
+def _find_problem_index(subject, description):
+    for idx, problem in enumerate(subject.get("problems", [])):
+        if problem.get("description") == description:
+            return idx
+    return None
+
+
+def apply_record(subjects, record):
+    op = record.get("op")
+    if op == "put_subject":
+        meta = record["subject"]
+        subject = _find_subject(subjects, meta["name"])
+        if subject is None:
+            subjects.append(dict(meta, problems=[], concepts=[]))
+        else:
+            subject.update(meta)
+        return
+    subject = _find_subject(subjects, record.get("subject"))
+    if subject is None:
+        return
+    problems = subject.setdefault("problems", [])
+    if op == "put_problem":
+        idx = _find_problem_index(subject, record["problem"]["description"])
+        if idx is None:
+            problems.append(record["problem"])
+        else:
+            problems[idx] = record["problem"]
+    elif op == "review_problem":
+        idx = _find_problem_index(subject, record["description"])
+        if idx is None:
+            return
+        problem = problems[idx]
+        problem["confidence"] = record["confidence"]
+        problem["review_dates"] = record["review_dates"]
+        count = record["review_count"]
+        completed = problem.get("completed_reviews", [])[:max(count - 1, 0)]
+        if record.get("completed") is not None:
+            completed.append(record["completed"])
+        problem["completed_reviews"] = completed
+    elif op == "delete_problem":
+        idx = _find_problem_index(subject, record["description"])
+        if idx is not None:
+            del problems[idx]
+    elif op == "reschedule":
+        review_dates = record["review_dates"]
+        for problem in problems:
+            if problem.get("description") in review_dates:
+                problem["review_dates"] = review_dates[problem["description"]]
+
+
+class JournalStore:
+    def __init__(self, data_file, compact_every=COMPACT_EVERY, snapshot_format=DEFAULT_FORMAT, backups=0):
+        self.data_file = Path(data_file)
+        self.journal_file = self.data_file.with_name(self.data_file.name + JOURNAL_SUFFIX)
+        self.compact_every = compact_every
+        self.snapshot_format = snapshot_format
+        self.file_format = None
+        self.backups = backups
+        self.pending = 0
+        self.schema_version = SCHEMA_VERSION
+        self.written = []
+
+    @property
+    def needs_compaction(self):
+        # Also true after the configured format changed, so the next
+        # compaction rewrites the file in it.
+        return (self.pending >= self.compact_every or
+                self.file_format not in (None, effective_format(self.snapshot_format)))
+
+    @property
+    def files(self):
+        return self.data_file, self.journal_file
+
+    def take_written(self):
+        # This store's writes since the last call, in order, as
+        # ("replace", path, data), ("remove", path) or ("append", path,
+        # offset, data); see sync.FileStamps.remember_written.
+        written, self.written = self.written, []
+        return written
+
+    def close(self):
+        pass
+
+    def load(self):
+        if not self.data_file.exists():
+            self.save([])
+        subjects, records = self._read(repair=True)
+        self.pending = len(records)
+        return subjects
+
+    def read(self):
+        # Like load(), but never writes, so it is safe next to a live store: a
+        # torn journal tail is skipped rather than truncated.
+        return self._read(repair=False)[0]
+
+    def _read(self, repair):
+        with open(self.data_file, "rb") as f:
+            raw = f.read()
+        data = decode(raw)
+        self.file_format = detect_format(raw)
+        if isinstance(data, list):
+            self.schema_version, subjects = 0, data
+        else:
+            self.schema_version, subjects = data.get("schema_version", 0), data.get("subjects", [])
+        records = self._read_journal(repair)
+        for record in records:
+            apply_record(subjects, record)
+        return subjects, records
+
+    def compact(self):
+        # Rebuilds the snapshot from disk alone, so it can run off the GUI thread
+        # without touching the in-memory subject list. A file still in an older
+        # schema (its post-migration save failed) is migrated first, since
+        # save() labels whatever it writes with SCHEMA_VERSION.
+        subjects = self.load()
+        migrate_subjects(subjects, self.schema_version)
+        self.save(subjects)
+
+    def _read_journal(self, repair=True):
+        if not self.journal_file.exists():
+            return []
+        records = []
+        good_offset = 0
+        with open(self.journal_file, "rb") as f:
+            for line in f:
+                if not line.endswith(b"\n"):
+                    break
+                try:
+                    records.append(json.loads(line))
+                except ValueError:
+                    break
+                good_offset += len(line)
+            torn = f.seek(0, os.SEEK_END) != good_offset
+        if torn and repair:
+            # Drop a half-written tail so the next append starts on a clean line.
+            with open(self.journal_file, "r+b") as f:
+                f.truncate(good_offset)
+                f.flush()
+                os.fsync(f.fileno())
+        return records
+
+    def append(self, *records):
+        data = "".join(json.dumps(r, ensure_ascii=False, separators=(",", ":"), default=json_default) + "\n"
+                       for r in records)
+        data = data.encode("utf-8")
+        with open(self.journal_file, "ab") as f:
+            offset = f.seek(0, os.SEEK_END)
+            f.write(data)
+            f.flush()
+            os.fsync(f.fileno())
+        self.pending += len(records)
+        self.written.append(("append", self.journal_file, offset, data))
+
+    def save(self, subjects):
+        data = encode({"schema_version": SCHEMA_VERSION, "subjects": subjects}, self.snapshot_format)
+        tmp_file = self.data_file.with_name(self.data_file.name + ".tmp")
+        with open(tmp_file, "wb") as f:
+            f.write(data)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp_file, self.data_file)
+        self.file_format = effective_format(self.snapshot_format)
+        self.schema_version = SCHEMA_VERSION
+        if self.journal_file.exists():
+            self.journal_file.unlink()
+        self.pending = 0
+        self.written += [("replace", self.data_file, data), ("remove", self.journal_file)]
+        try:
+            backup_snapshot(self.data_file, data, self.backups)
+        except OSError as e:
+            print(f"写入备份失败: {e}")
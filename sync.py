@@ -0,0 +1,372 @@
+import hashlib
+import os
+import threading
+from collections import Counter
+
+from days import history
+from model import Problem
+
+# --- External change detection and three-way merge ---
+#
+# The data file and the notes folder are often synced between machines, so
+# they can change under a running app. FileStamps remembers the (mtime, size)
+# and content hash of every data file as this process last wrote or read it;
+# a watcher event whose file still hashes the same (our own write, or a sync
+# client touching the file) is ignored. After our own writes a file is only
+# re-stamped when it holds exactly the remembered content plus the bytes we
+# wrote, so edits another client made in between still show up as changes.
+#
+# A real change is re-read into a second Catalog and merged per problem
+# against the Baseline, i.e. the state last seen on disk: a side that still
+# matches the baseline takes the other side's version, an edit beats a
+# delete, and a problem changed on both sides keeps the union of the review
+# histories plus the fields of whichever side was reviewed last (or more
+# often, on a same-day tie). Our own records move the baseline once they are
+# written, so they never count as a local change against the file. Local
+# changes are tracked from the journal records, so finding them costs nothing
+# until a merge happens.
+
+HASH_CHUNK = 1 << 20
+
+
+def new_digest():
+    return hashlib.blake2b(digest_size=16)
+
+
+def file_stamp(path):
+    try:
+        st = os.stat(path)
+    except FileNotFoundError:
+        return None
+    return st.st_mtime_ns, st.st_size
+
+
+def file_digest(path):
+    digest = new_digest()
+    try:
+        with open(path, "rb") as f:
+            for chunk in iter(lambda: f.read(HASH_CHUNK), b""):
+                digest.update(chunk)
+    except FileNotFoundError:
+        return None
+    return digest.digest()
+
+
+def split_digests(path, offset):
+    # (digest of the first `offset` bytes, of the rest, of the whole file).
+    head, tail, whole = new_digest(), new_digest(), new_digest()
+    with open(path, "rb") as f:
+        remaining = offset
+        while remaining > 0:
+            chunk = f.read(min(HASH_CHUNK, remaining))
+            if not chunk:
+                break
+            head.update(chunk)
+            whole.update(chunk)
+            remaining -= len(chunk)
+        for chunk in iter(lambda: f.read(HASH_CHUNK), b""):
+            tail.update(chunk)
+            whole.update(chunk)
+    return head.digest(), tail.digest(), whole.digest()
+
+
+def expected_contents(writes):
+    # Folds a store's own writes (see JournalStore.take_written) into what
+    # each file should now hold: ("whole", digest, size) for a file we wrote
+    # entirely (digest None: removed), ("tail", offset, digest, size) for
+    # bytes appended after what was there, "trust" for files whose bytes we
+    # cannot predict (SQLite) and "foreign" when another writer was noticed.
+    expected = {}
+    for kind, path, *args in writes:
+        path = str(path)
+        state = expected.get(path)
+        if kind == "replace":
+            digest = new_digest()
+            digest.update(args[0])
+            state = ("whole", digest, len(args[0]))
+        elif kind == "remove":
+            state = ("whole", None, 0)
+        elif kind == "append":
+            offset, data = args
+            if state is None:
+                state = ("tail", offset, new_digest(), 0)
+            elif state[0] == "whole" and offset == state[2]:
+                state = ("whole", state[1] or new_digest(), state[2])
+            elif not (state[0] == "tail" and offset == state[1] + state[3]):
+                # Someone appended between two of our writes.
+                state = "foreign"
+            if state != "foreign":
+                state[-2].update(data)
+                state = state[:-1] + (state[-1] + len(data),)
+        elif kind == "unknown":
+            if state != "foreign":
+                state = "trust"
+        else:
+            state = "foreign"
+        expected[path] = state
+    return expected
+
+
+class FileStamps:
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.known = {}
+        # Files another writer touched since we last read them. They keep
+        # their old stamp, so changed() reports them until accept()ed.
+        self.foreign = set()
+
+    def remember(self, *paths):
+        # Called after reading the files in full; the hash is only recomputed
+        # for files whose stamp moved since the last call.
+        for path in map(str, paths):
+            stamp = file_stamp(path)
+            with self.lock:
+                cached = self.known.get(path)
+                self.foreign.discard(path)
+            if cached is not None and cached[0] == stamp:
+                continue
+            digest = file_digest(path) if stamp is not None else None
+            with self.lock:
+                self.known[path] = (stamp, digest)
+
+    def remember_written(self, writes):
+        # Called after our own writes. A file is re-stamped only when it holds
+        # exactly what was remembered plus those writes, so another client's
+        # edit that landed in between is never mistaken for ours.
+        for path, state in expected_contents(writes).items():
+            with self.lock:
+                cached = self.known.get(path, (None, None))
+                foreign = path in self.foreign
+            try:
+                result = self._verify(path, state, cached, foreign)
+            except OSError as e:
+                print(f"检查文件失败: {path}: {e}")
+                result = None
+            with self.lock:
+                if result is None:
+                    self.foreign.add(path)
+                else:
+                    self.known[path] = result
+                    self.foreign.discard(path)
+
+    def _verify(self, path, state, cached, foreign):
+        # The (stamp, digest) to remember, or None if the file holds more
+        # than our writes.
+        stamp = file_stamp(path)
+        if state == "trust" and not foreign:
+            return stamp, file_digest(path) if stamp is not None else None
+        if state in ("trust", "foreign"):
+            return None
+        if state[0] == "whole":
+            # Nothing of anyone else's can survive a full rewrite.
+            _, digest, size = state
+            if digest is None:
+                return (None, None) if stamp is None else None
+            if stamp is None or stamp[1] != size:
+                return None
+            whole = file_digest(path)
+            return (stamp, whole) if whole == digest.digest() else None
+        _, offset, digest, size = state
+        if foreign or stamp is None or stamp[1] != offset + size:
+            return None
+        if (cached[0][1] if cached[0] is not None else 0) != offset:
+            return None
+        head, tail, whole = split_digests(path, offset)
+        if (offset and head != cached[1]) or tail != digest.digest():
+            return None
+        return stamp, whole
+
+    def changed(self, paths):
+        # Returns {path: (stamp, digest)} for files whose content differs from
+        # what was remembered. Pass the result to accept() once it is merged.
+        found = {}
+        for path in map(str, paths):
+            try:
+                stamp = file_stamp(path)
+                with self.lock:
+                    cached = self.known.get(path, (None, None))
+                if cached[0] == stamp:
+                    continue
+                digest = file_digest(path) if stamp is not None else None
+            except OSError as e:
+                print(f"检查文件失败: {path}: {e}")
+                continue
+            if digest == cached[1]:
+                with self.lock:
+                    self.known[path] = (stamp, digest)
+            else:
+                found[path] = (stamp, digest)
+        return found
+
+    def accept(self, found):
+        with self.lock:
+            self.known.update(found)
+            self.foreign.difference_update(found)
+
+    def has_foreign(self, paths):
+        with self.lock:
+            return any(str(path) in self.foreign for path in paths)
+
+    def paths(self):
+        with self.lock:
+            return list(self.known)
+
+
+def problem_state(problem):
+    if problem is None:
+        return None
+    return hash((problem.confidence, problem.subjects, problem.skills, problem.next_review,
+                 problem.completed_reviews.tobytes()))
+
+
+def subject_state(subject):
+    if subject is None:
+        return None
+    return (subject.created, subject.daily_note, tuple(subject.practice_exam_scores),
+            tuple((c.subjects, c.skills) for c in subject.concepts))
+
+
+class Baseline:
+    # What the data file held at the last load or merge: subject metadata
+    # states by name and a hash per problem, plus the keys changed locally
+    # since then.
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.subjects = {}
+        self.problems = {}
+        self.dirty_subjects = set()
+        self.dirty_problems = set()
+        # (submit number, subject states, problem states) of records still
+        # queued for the persistence worker.
+        self.unwritten = []
+
+    def capture(self, subjects):
+        with self.lock:
+            self.subjects = {s.name: subject_state(s) for s in subjects}
+            self.problems = {s.name: {d: problem_state(p) for d, p in s.problems.items()} for s in subjects}
+            self.dirty_subjects.clear()
+            self.dirty_problems.clear()
+            self.unwritten.clear()
+
+    def mark(self, records, subjects, seq):
+        # Called as the records are queued, while memory still holds exactly
+        # what they write; `seq` is their submit number (see written()).
+        names, keys = set(), set()
+        for record in records:
+            op = record.get("op")
+            if op == "put_subject":
+                names.add(record["subject"]["name"])
+            elif op == "put_problem":
+                keys.add((record["subject"], record["problem"]["description"]))
+            elif op == "reschedule":
+                keys.update((record["subject"], d) for d in record["review_dates"])
+            elif op in ("review_problem", "delete_problem"):
+                keys.add((record["subject"], record["description"]))
+        self.dirty_subjects |= names
+        self.dirty_problems |= keys
+        states = ({name: subject_state(subjects.get(name)) for name in names},
+                  {key: problem_state(subjects.problem(*key)) for key in keys})
+        with self.lock:
+            self.unwritten.append((seq,) + states)
+
+    def written(self, upto, ok=True):
+        # Records up to submit number `upto` have been appended (or, if not
+        # `ok`, failed and will be covered by a full save).
+        with self.lock:
+            while self.unwritten and self.unwritten[0][0] <= upto:
+                _, subject_states, problem_states = self.unwritten.pop(0)
+                if ok:
+                    self._set(subject_states, problem_states)
+
+    def saved(self, subjects):
+        # After a full save the file matches memory for every local change.
+        with self.lock:
+            self.unwritten.clear()
+            self._set({name: subject_state(subjects.get(name)) for name in self.dirty_subjects},
+                      {key: problem_state(subjects.problem(*key)) for key in self.dirty_problems})
+
+    def _set(self, subject_states, problem_states):
+        for name, state in subject_states.items():
+            if state is None:
+                self.subjects.pop(name, None)
+            else:
+                self.subjects[name] = state
+        for (name, description), state in problem_states.items():
+            if state is None:
+                self.problems.get(name, {}).pop(description, None)
+            else:
+                self.problems.setdefault(name, {})[description] = state
+
+    def problem(self, subject_name, description):
+        return self.problems.get(subject_name, {}).get(description)
+
+    def settle(self, subjects, subject_names, problem_keys):
+        # After a merge the data file matches memory for every merged key.
+        with self.lock:
+            for name in subject_names:
+                if subjects.get(name) is None:
+                    self.problems.pop(name, None)
+            self._set({name: subject_state(subjects.get(name)) for name in subject_names},
+                      {key: problem_state(subjects.problem(*key)) for key in problem_keys})
+            self.dirty_subjects.clear()
+            self.dirty_problems.clear()
+
+
+class ExternalChanges:
+    def __init__(self, theirs, found):
+        self.theirs = theirs
+        self.found = found
+        self.subjects = set()
+        self.problems = set()
+
+    def __bool__(self):
+        return bool(self.subjects or self.problems)
+
+
+def diff(baseline, theirs, found):
+    # Keys where the re-read data file differs from the baseline. Reads the
+    # baseline only, so it can run off the GUI thread.
+    with baseline.lock:
+        return _diff(baseline, theirs, found)
+
+
+def _diff(baseline, theirs, found):
+    changes = ExternalChanges(theirs, found)
+    for subject in theirs:
+        if baseline.subjects.get(subject.name) != subject_state(subject):
+            changes.subjects.add(subject.name)
+        base = baseline.problems.get(subject.name, {})
+        for description, problem in subject.problems.items():
+            if base.get(description) != problem_state(problem):
+                changes.problems.add((subject.name, description))
+        changes.problems.update((subject.name, d) for d in base if d not in subject.problems)
+    for name, base in baseline.problems.items():
+        if theirs.get(name) is None:
+            changes.subjects.add(name)
+            changes.problems.update((name, d) for d in base)
+    return changes
+
+
+def _recency(problem):
+    # Last review day, then how many reviews: two reviews on the same day
+    # beat one, so a same-day edit there is not lost to ours.
+    reviews = problem.completed_reviews
+    return (reviews[-1] if reviews else -1), len(reviews)
+
+
+def merge_problems(mine, theirs):
+    counts = Counter(mine.completed_reviews) | Counter(theirs.completed_reviews)
+    newer = theirs if _recency(theirs) > _recency(mine) else mine
+    return Problem(mine.description, newer.confidence, newer.subjects, newer.skills, newer.next_review,
+                   history(sorted(counts.elements())), newer.extra)
+
+
+def merge_subject_meta(mine, theirs, base):
+    # Both sides edited the subject: keep ours and add the exam scores they
+    # appended after the baseline.
+    base_scores = list(base[2]) if base is not None else []
+    if theirs.practice_exam_scores[:len(base_scores)] == base_scores:
+        mine.practice_exam_scores.extend(theirs.practice_exam_scores[len(base_scores):])
+    mine.created = mine.created or theirs.created
+    mine.daily_note = mine.daily_note or theirs.daily_note
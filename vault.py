@@ -0,0 +1,203 @@
+import hashlib
+import json
+import os
+import re
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+
+import metrics
+
+# --- Daily-notes vault index ---
+#
+# Parses every "### 题目:" section of every note under notes_dir/daily_notes
+# (subfolders included) into a VaultSection: which note it is in, its tags,
+# and whether 图片解析 / 心得 still hold the "[待补充…]" placeholders. Notes
+# are parsed on a thread pool, and the result is cached on disk keyed by each
+# file's (mtime, size), so a rescan stats every note but only re-reads the
+# ones that changed since the last scan. Each notes folder has its own cache
+# file, so switching between profiles keeps both warm.
+
+VAULT_CACHE_VERSION = 1
+SCAN_WORKERS = min(8, (os.cpu_count() or 1) + 2)
+NOTE_SUFFIX = ".md"
+
+HEADING = re.compile(r"^#{1,3} ", re.M)
+FIELD = re.compile(r"^(主题|技巧|图片解析|心得)\s*[:：]\s?(.*)$")
+PLACEHOLDER = re.compile(r"\[待补充[^\]]*\]")
+PROBLEM_TITLE = "### 题目:"
+
+
+def is_placeholder(value):
+    return value is None or not PLACEHOLDER.sub("", value).strip()
+
+
+class VaultSection:
+    __slots__ = ("note", "description", "subjects", "skills", "image_pending", "insight_pending")
+
+    def __init__(self, note, description, subjects, skills, image_pending, insight_pending):
+        self.note = note
+        self.description = description
+        self.subjects = subjects
+        self.skills = skills
+        self.image_pending = image_pending
+        self.insight_pending = insight_pending
+
+    @property
+    def pending(self):
+        return self.image_pending or self.insight_pending
+
+    def to_list(self):
+        return [self.description, self.subjects, self.skills, self.image_pending, self.insight_pending]
+
+    @classmethod
+    def from_list(cls, note, values):
+        description, subjects, skills, image_pending, insight_pending = values
+        return cls(note, description, tuple(subjects), tuple(skills), image_pending, insight_pending)
+
+
+def split_tags(value):
+    return tuple(tag.strip() for tag in (value or "").split(",") if tag.strip())
+
+
+def parse_note(note, text):
+    # `note` is the path relative to the vault root; `text` the note contents.
+    sections = []
+    starts = [m.start() for m in HEADING.finditer(text)] + [len(text)]
+    for start, end in zip(starts, starts[1:]):
+        if not text.startswith(PROBLEM_TITLE, start):
+            continue
+        lines = text[start:end].split("\n")
+        fields, current = {}, None
+        for line in lines[1:]:
+            match = FIELD.match(line)
+            if match:
+                current = match.group(1)
+                fields[current] = match.group(2)
+            elif current is not None:
+                fields[current] += "\n" + line
+        sections.append(VaultSection(note, lines[0][len(PROBLEM_TITLE):].strip(), split_tags(fields.get("主题")),
+                                     split_tags(fields.get("技巧")), is_placeholder(fields.get("图片解析")),
+                                     is_placeholder(fields.get("心得"))))
+    return sections
+
+
+def list_notes(root):
+    # {relative path: (mtime_ns, size)} for every note under root.
+    found = []
+    for folder, _, files in os.walk(root):
+        for name in files:
+            if name.endswith(NOTE_SUFFIX):
+                path = os.path.join(folder, name)
+                try:
+                    st = os.stat(path)
+                except FileNotFoundError:
+                    continue
+                found.append((os.path.relpath(path, root).replace(os.sep, "/"), (st.st_mtime_ns, st.st_size)))
+    return dict(found)
+
+
+def read_note(root, note):
+    with open(os.path.join(root, note), "rb") as f:
+        data = f.read()
+    return len(data), parse_note(note, data.decode("utf-8", "replace"))
+
+
+class VaultIndex:
+    def __init__(self, cache_dir):
+        self.cache_dir = Path(cache_dir)
+        self.lock = threading.Lock()
+        self.scan_lock = threading.Lock()
+        self.root = None
+        self.notes = {}
+        self.stale = set()
+        self.by_problem = {}
+        self.incomplete = []
+
+    def cache_file(self, root):
+        key = hashlib.blake2b(root.encode("utf-8"), digest_size=8).hexdigest()
+        return self.cache_dir / f"{key}.json"
+
+    def load_cache(self, root):
+        try:
+            with open(self.cache_file(root), "r", encoding="utf-8") as f:
+                cache = json.load(f)
+        except FileNotFoundError:
+            return {}
+        except (OSError, ValueError) as e:
+            print(f"读取笔记索引缓存失败: {e}")
+            return {}
+        if cache.get("version") != VAULT_CACHE_VERSION or cache.get("root") != root:
+            return {}
+        return {note: (tuple(stamp), [VaultSection.from_list(note, values) for values in sections])
+                for note, (stamp, sections) in cache["notes"].items()}
+
+    def save_cache(self, root, notes):
+        cache = {"version": VAULT_CACHE_VERSION, "root": root,
+                 "notes": {note: [stamp, [s.to_list() for s in sections]] for note, (stamp, sections) in notes.items()}}
+        cache_file = self.cache_file(root)
+        cache_file.parent.mkdir(parents=True, exist_ok=True)
+        tmp_file = cache_file.with_name(cache_file.name + ".tmp")
+        with open(tmp_file, "w", encoding="utf-8") as f:
+            json.dump(cache, f, ensure_ascii=False, separators=(",", ":"))
+        os.replace(tmp_file, cache_file)
+
+    def invalidate(self, root, *paths):
+        # A watcher saw these notes change; reparse them on the next scan even
+        # if a sync client restored their mtime and size.
+        with self.lock:
+            self.stale.update(os.path.relpath(path, root).replace(os.sep, "/") for path in map(str, paths))
+
+    def scan(self, root, workers=SCAN_WORKERS):
+        root = str(root)
+        with self.scan_lock, metrics.span("vault_scan") as span:
+            with self.lock:
+                notes = self.notes if self.root == root else None
+                stale, self.stale = self.stale, set()
+            if notes is None:
+                notes = self.load_cache(root)
+            stamps = list_notes(root) if os.path.isdir(root) else {}
+            changed = [note for note, stamp in stamps.items()
+                       if note in stale or note not in notes or notes[note][0] != stamp]
+            removed = notes.keys() - stamps.keys()
+            fresh = {note: notes[note] for note in stamps.keys() - set(changed)}
+            bytes_read = 0
+            if changed:
+                with ThreadPoolExecutor(max_workers=workers, thread_name_prefix="vault") as pool:
+                    futures = [(note, pool.submit(read_note, root, note)) for note in changed]
+                    for note, future in futures:
+                        try:
+                            size, sections = future.result()
+                        except OSError as e:
+                            # Deleted or locked mid-scan; the next scan retries it.
+                            print(f"读取笔记失败: {note}: {e}")
+                            continue
+                        bytes_read += size
+                        fresh[note] = (stamps[note], sections)
+            by_problem, incomplete = {}, []
+            for note in sorted(fresh):
+                for section in fresh[note][1]:
+                    by_problem.setdefault(section.description, []).append(section)
+                    if section.pending:
+                        incomplete.append(section)
+            with self.lock:
+                self.root, self.notes = root, fresh
+                self.by_problem, self.incomplete = by_problem, incomplete
+            if changed or removed or not self.cache_file(root).exists():
+                try:
+                    self.save_cache(root, fresh)
+                except OSError as e:
+                    print(f"保存笔记索引缓存失败: {e}")
+            span.count("notes", len(stamps))
+            span.count("notes_parsed", len(changed))
+            span.count("bytes_read", bytes_read)
+        return {"notes": len(stamps), "parsed": len(changed), "removed": len(removed),
+                "sections": sum(len(sections) for _, sections in fresh.values()), "incomplete": len(incomplete)}
+
+    def sections_for(self, description):
+        with self.lock:
+            return list(self.by_problem.get(description, ()))
+
+    def pending_sections(self):
+        with self.lock:
+            return list(self.incomplete)